@@ -0,0 +1,52 @@
+"""Асинхронные обработчики API для core.asgi.Router.
+
+Обработчик выполняет независимые выборки одновременно в пуле ASGI и
+отдаёт тот же JSON, что и синхронный view. Middleware Django его не
+проходят, поэтому так обслуживаются только открытые запросы на чтение.
+"""
+import asyncio
+import json
+from http.cookies import SimpleCookie
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core.asgi import run_in_pool
+
+from . import summary
+
+JSON_HEADERS = [(b'content-type', b'application/json')]
+
+
+def json_response(status, data):
+    content = json.dumps(data, cls=DjangoJSONEncoder).encode()
+    return status, JSON_HEADERS, [content]
+
+
+def session_key(scope):
+    cookie = SimpleCookie()
+    for name, value in scope.get('headers', []):
+        if name == b'cookie':
+            cookie.load(value.decode('latin-1'))
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    return morsel.value if morsel else None
+
+
+def _following(key, username):
+    return summary.following(summary.session_user_id(key), username)
+
+
+async def user_summary(executor, scope, username):
+    author, posts, is_following = await asyncio.gather(
+        run_in_pool(executor, summary.author, username),
+        run_in_pool(executor, summary.recent_posts, username),
+        run_in_pool(executor, _following, session_key(scope), username),
+    )
+    if author is None:
+        return json_response(404, {'errors': [{'detail': 'Не найдено'}]})
+    return json_response(200, summary.document(author, posts, is_following))
+
+
+ROUTES = [
+    (r'/api/v1/users/(?P<username>[\w.@+-]+)/summary/', user_summary),
+]
@@ -0,0 +1,152 @@
+"""Описание ресурсов API и сериализация из строк .values().
+
+Каждый ресурс — модель, её публичные поля и связи с другими ресурсами.
+Документ строится так: основной запрос values() только с запрошенными
+полями (fields=), затем по одному запросу на каждый тип из include= для
+всех id связей страницы сразу. Экземпляры моделей не создаются.
+"""
+from django.core.files.storage import default_storage
+
+from posts.models import Comment, Group, Post, User
+
+
+class BadRequest(Exception):
+    """Ошибка параметров запроса: отдаётся клиенту как 400."""
+
+
+def image_url(name):
+    return default_storage.url(name) if name else None
+
+
+class Resource:
+    def __init__(self, model, fields, relations=None, converters=None):
+        self.model = model
+        self.fields = fields
+        # Имя связи -> (поле внешнего ключа, тип ресурса).
+        self.relations = relations or {}
+        self.converters = converters or {}
+
+    def select(self, requested):
+        """Поля для values(): id, выбранные атрибуты и ключи связей."""
+        if requested is None:
+            requested = self.fields + tuple(self.relations)
+        unknown = set(requested) - set(self.fields) - set(self.relations)
+        if unknown:
+            raise BadRequest(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+        attributes = [name for name in self.fields if name in requested]
+        relations = [name for name in self.relations if name in requested]
+        return attributes, relations
+
+    def columns(self, attributes, relations):
+        return ['id', *attributes, *(
+            self.relations[name][0] for name in relations
+        )]
+
+    def serialize(self, row, attributes, relations):
+        item = {'id': row['id']}
+        for name in attributes:
+            convert = self.converters.get(name)
+            item[name] = convert(row[name]) if convert else row[name]
+        for name in relations:
+            item[name] = row[self.relations[name][0]]
+        return item
+
+
+RESOURCES = {
+    'posts': Resource(
+        Post,
+        ('text', 'pub_date', 'image', 'comments_count'),
+        {'author': ('author_id', 'users'), 'group': ('group_id', 'groups')},
+        {'image': image_url},
+    ),
+    'groups': Resource(Group, ('title', 'slug', 'description')),
+    'comments': Resource(
+        Comment,
+        ('text', 'created'),
+        {'post': ('post_id', 'posts'), 'author': ('author_id', 'users')},
+    ),
+    'users': Resource(User, ('username', 'first_name', 'last_name')),
+}
+
+
+def parse_list(value):
+    return tuple(part for part in value.split(',') if part) if value else ()
+
+
+def requested_fields(params, primary):
+    """{тип: поля} из fields=… (для основного типа) и fields[тип]=…."""
+    fields = {}
+    if 'fields' in params:
+        fields[primary] = parse_list(params['fields'])
+    for key, value in params.items():
+        if key.startswith('fields[') and key.endswith(']'):
+            kind = key[len('fields['):-1]
+            if kind not in RESOURCES:
+                raise BadRequest(f'Неизвестный тип: {kind}')
+            fields[kind] = parse_list(value)
+    return fields
+
+
+def requested_includes(params, resource):
+    includes = parse_list(params.get('include'))
+    unknown = set(includes) - set(resource.relations)
+    if unknown:
+        raise BadRequest(f'Нельзя включить: {", ".join(sorted(unknown))}')
+    return includes
+
+
+class Document:
+    """Сборка ответа: основные строки и включённые ресурсы."""
+
+    def __init__(self, params, kind):
+        self.kind = kind
+        self.resource = RESOURCES[kind]
+        self.fields = requested_fields(params, kind)
+        self.includes = requested_includes(params, self.resource)
+        self.attributes, self.relations = self.resource.select(
+            self.fields.get(kind)
+        )
+        # Связь нужна в строке, даже если её нет в fields, раз её
+        # просят включить.
+        self.relations += [
+            name for name in self.includes if name not in self.relations
+        ]
+
+    def columns(self, *extra):
+        columns = self.resource.columns(self.attributes, self.relations)
+        return columns + [name for name in extra if name not in columns]
+
+    def data(self, rows):
+        return [
+            self.resource.serialize(row, self.attributes, self.relations)
+            for row in rows
+        ]
+
+    def included(self, rows):
+        """Связанные ресурсы: по одному запросу на тип."""
+        wanted = {}
+        for name in self.includes:
+            column, kind = self.resource.relations[name]
+            wanted.setdefault(kind, set()).update(
+                row[column] for row in rows if row[column] is not None
+            )
+        included = {}
+        for kind, ids in wanted.items():
+            resource = RESOURCES[kind]
+            attributes, _ = resource.select(
+                self.fields.get(kind, resource.fields)
+            )
+            queryset = resource.model.objects.filter(id__in=ids).order_by(
+                'id'
+            ).values(*resource.columns(attributes, []))
+            included[kind] = [
+                resource.serialize(row, attributes, []) for row in queryset
+            ]
+        return included
+
+    def render(self, rows, **extra):
+        document = {'data': self.data(rows)}
+        if self.includes:
+            document['included'] = self.included(rows)
+        document.update(extra)
+        return document
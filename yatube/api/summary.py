@@ -0,0 +1,73 @@
+"""Сводка автора: профиль со счётчиками, последние посты и подписка
+зрителя.
+
+Три выборки не зависят друг от друга, поэтому асинхронный обработчик
+(api.asgi) выполняет их одновременно, а view api.views.user_summary — по
+очереди. Результат у обоих одинаковый.
+"""
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+
+from posts.models import Follow, Post, User
+
+# Выборки, которые можно выполнять параллельно.
+FETCHES = ('author', 'recent_posts', 'following')
+
+
+def author(username):
+    return User.objects.filter(username=username).values(
+        'id', 'username', 'first_name', 'last_name',
+        'stats__posts_count', 'stats__followers_count',
+        'stats__following_count',
+    ).first()
+
+
+def recent_posts(username):
+    return list(Post.objects.filter(author__username=username).order_by(
+        '-pub_date', '-id'
+    ).values('id', 'text', 'pub_date', 'group_id')[:settings.API_PAGE_SIZE])
+
+
+def following(user_id, username):
+    if user_id is None:
+        return False
+    return Follow.objects.filter(
+        user_id=user_id, author__username=username
+    ).exists()
+
+
+def session_user_id(session_key):
+    """id пользователя сессии без загрузки самого пользователя."""
+    if not session_key:
+        return None
+    engine = import_module(settings.SESSION_ENGINE)
+    return engine.SessionStore(session_key).get(SESSION_KEY)
+
+
+def document(author, posts, is_following):
+    return {
+        'data': {
+            'id': author['id'],
+            'username': author['username'],
+            'first_name': author['first_name'],
+            'last_name': author['last_name'],
+            'posts_count': author['stats__posts_count'] or 0,
+            'followers_count': author['stats__followers_count'] or 0,
+            'following_count': author['stats__following_count'] or 0,
+            'following': is_following,
+            'posts': [post['id'] for post in posts],
+        },
+        'included': {
+            'posts': [
+                {
+                    'id': post['id'],
+                    'text': post['text'],
+                    'pub_date': post['pub_date'],
+                    'group': post['group_id'],
+                }
+                for post in posts
+            ],
+        },
+    }
@@ -0,0 +1,168 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='writer', first_name='Анна'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Кино', slug='kino', description='О кино'
+        )
+        now = timezone.now()
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(3)
+        ]
+        # pub_date проставляется при создании: задаём порядок явно.
+        for number, post in enumerate(cls.posts):
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=now - timedelta(minutes=number)
+            )
+        cls.comment = Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_post_list_returns_all_fields_by_default(self):
+        """Без fields= пост отдаётся со всеми полями и связями."""
+        data = self.client.get(reverse('api:post_list')).json()['data']
+        self.assertEqual([item['id'] for item in data],
+                         [post.id for post in self.posts])
+        self.assertEqual(set(data[0]), {
+            'id', 'text', 'pub_date', 'image', 'comments_count',
+            'author', 'group',
+        })
+        self.assertEqual(data[0]['author'], self.author.id)
+        self.assertIsNone(data[0]['image'])
+
+    def test_sparse_fields(self):
+        """fields= и fields[тип]= ограничивают поля ответа."""
+        response = self.client.get(reverse('api:post_list'), {
+            'fields': 'text', 'include': 'author',
+            'fields[users]': 'username',
+        })
+        document = response.json()
+        # Включённая связь остаётся в строке, чтобы её можно было найти
+        # в included.
+        self.assertEqual(document['data'][0], {
+            'id': self.posts[0].id, 'text': 'Пост 0',
+            'author': self.author.id,
+        })
+        self.assertEqual(document['included'], {
+            'users': [{'id': self.author.id, 'username': 'writer'}],
+        })
+
+    def test_includes_take_one_query_per_type(self):
+        """Связи страницы загружаются одним запросом на тип."""
+        url = reverse('api:post_list')
+        with self.assertNumQueries(3):
+            document = self.client.get(
+                url, {'include': 'author,group'}
+            ).json()
+        self.assertEqual(
+            [item['id'] for item in document['included']['users']],
+            [self.author.id],
+        )
+        self.assertEqual(document['included']['groups'][0]['slug'], 'kino')
+
+    def test_cursor_links(self):
+        """Ссылка next ведёт на следующую страницу без повторов."""
+        url = reverse('api:post_list')
+        first = self.client.get(url, {'limit': 2}).json()
+        self.assertIsNone(first['links']['prev'])
+        second = self.client.get(first['links']['next']).json()
+        self.assertEqual([item['id'] for item in second['data']],
+                         [self.posts[2].id])
+        self.assertIsNone(second['links']['next'])
+
+    def test_filters(self):
+        url = reverse('api:post_list')
+        for params, count in (
+            ({'group': 'kino'}, 3),
+            ({'group': 'other'}, 0),
+            ({'author': 'reader'}, 0),
+        ):
+            with self.subTest(params=params):
+                data = self.client.get(url, params).json()['data']
+                self.assertEqual(len(data), count)
+
+    def test_bad_parameters(self):
+        """Неизвестные поля, типы и включения — 400."""
+        url = reverse('api:post_list')
+        for params in (
+            {'fields': 'password'},
+            {'fields[secrets]': 'id'},
+            {'include': 'comments'},
+            {'limit': 'много'},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('errors', response.json())
+
+    def test_details(self):
+        for url, expected in (
+            (reverse('api:post_detail', args=[self.posts[0].id]),
+             {'id': self.posts[0].id, 'text': 'Пост 0'}),
+            (reverse('api:group_detail', args=['kino']),
+             {'id': self.group.id, 'title': 'Кино'}),
+            (reverse('api:comment_detail', args=[self.comment.id]),
+             {'id': self.comment.id, 'text': 'Комментарий'}),
+        ):
+            with self.subTest(url=url):
+                fields = ','.join(name for name in expected if name != 'id')
+                data = self.client.get(url, {'fields': fields}).json()
+                self.assertEqual(data['data'], expected)
+
+    def test_not_found(self):
+        for url in (
+            reverse('api:post_detail', args=[0]),
+            reverse('api:comment_list', args=[0]),
+            reverse('api:group_detail', args=['missing']),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_comment_list(self):
+        url = reverse('api:comment_list', args=[self.posts[0].id])
+        document = self.client.get(url, {'include': 'author'}).json()
+        self.assertEqual(document['data'][0]['author'], self.reader.id)
+        self.assertEqual(document['included']['users'][0]['username'],
+                         'reader')
+
+    def test_follow_endpoints_require_login(self):
+        for name in ('api:follow_feed', 'api:follow_list'):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 401)
+
+    def test_follow_feed_and_list(self):
+        feed = self.reader_client.get(reverse('api:follow_feed')).json()
+        self.assertEqual([item['id'] for item in feed['data']],
+                         [post.id for post in self.posts])
+        follows = self.reader_client.get(reverse('api:follow_list')).json()
+        self.assertEqual([item['username'] for item in follows['data']],
+                         ['writer'])
+
+    def test_read_only(self):
+        response = self.client.post(reverse('api:post_list'))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,53 @@
+import json
+import time
+
+from django.test import Client
+from django.urls import reverse
+
+from api.asgi import ROUTES
+from core.asgi import Router
+from core.tests.utils import AsgiTestCase
+from posts import benchmarks
+from posts.models import Follow, User
+
+
+class SummaryRouteTest(AsgiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.application = Router(self.wsgi, ROUTES)
+
+    def summary(self, client=None):
+        client = client or Client()
+        url = reverse('api:user_summary', args=[self.author.username])
+        cookie = '; '.join(
+            f'{key}={morsel.value}' for key, morsel in client.cookies.items()
+        )
+        started = time.perf_counter()
+        sent = self.request(url, headers=[(b'cookie', cookie.encode())])
+        native = time.perf_counter() - started
+        started = time.perf_counter()
+        response = client.get(url)
+        view = time.perf_counter() - started
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        return sent[0]['status'], json.loads(body), response, native, view
+
+    def test_summary_route_matches_view(self):
+        """Асинхронный обработчик отдаёт то же, что и view."""
+        reader = User.objects.create_user(username='читатель')
+        Follow.objects.create(user=reader, author=self.author)
+        client = Client()
+        client.force_login(reader)
+        status, data, response, _, _ = self.summary(client)
+        self.assertEqual(status, 200)
+        self.assertEqual(data, response.json())
+        self.assertTrue(data['data']['following'])
+        self.assertEqual(data['data']['posts_count'], 1)
+        self.assertFalse(self.summary()[1]['data']['following'])
+
+    def test_summary_fetches_run_concurrently(self):
+        """Под ASGI задержка сводки — одна выборка, а не сумма трёх."""
+        latency = 0.1
+        with benchmarks.slow_backend(latency):
+            _, _, _, native, view = self.summary()
+        self.assertGreaterEqual(view, 3 * latency)
+        self.assertLess(native, 2 * latency)
@@ -0,0 +1,165 @@
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.http import JsonResponse
+from django.utils.http import urlencode
+
+from posts import timeline
+from posts.decorators import query_budget
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import CURSOR_PARAM, CursorPaginator
+
+from . import summary
+from .resources import BadRequest, Document
+
+
+def error(status, detail):
+    return JsonResponse({'errors': [{'detail': detail}]}, status=status)
+
+
+def api_view(view):
+    """Только GET, ошибки параметров — 400 в формате API."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return error(405, 'Метод не поддерживается')
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as exc:
+            return error(400, str(exc))
+    return wrapper
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return max(1, min(size, settings.API_MAX_PAGE_SIZE))
+
+
+def page_link(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params[CURSOR_PARAM] = cursor
+    return request.build_absolute_uri(
+        f'{request.path}?{urlencode(params, doseq=True)}'
+    )
+
+
+def paginated(request, kind, queryset, key):
+    """Страница списка с курсором по (key, id), новые сверху."""
+    document = Document(request.GET, kind)
+    rows = queryset.values(*document.columns(key))
+    page = CursorPaginator(rows, page_size(request), key=key).get_page(
+        request.GET.get(CURSOR_PARAM)
+    )
+    return JsonResponse(document.render(page.object_list, links={
+        'next': page_link(request, page.next_cursor),
+        'prev': page_link(request, page.previous_cursor),
+    }))
+
+
+def detail(request, kind, queryset, **lookup):
+    document = Document(request.GET, kind)
+    row = queryset.filter(**lookup).values(*document.columns()).first()
+    if row is None:
+        return error(404, 'Не найдено')
+    rendered = document.render([row])
+    rendered['data'] = rendered['data'][0]
+    return JsonResponse(rendered)
+
+
+@api_view
+@query_budget(3)
+def post_list(request):
+    posts = Post.objects.all()
+    if request.GET.get('group'):
+        posts = posts.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        posts = posts.filter(author__username=request.GET['author'])
+    return paginated(request, 'posts', posts, 'pub_date')
+
+
+@api_view
+@query_budget(3)
+def post_detail(request, post_id):
+    return detail(request, 'posts', Post.objects.all(), id=post_id)
+
+
+@api_view
+@query_budget(1)
+def group_list(request):
+    # Групп немного: список отдаётся целиком.
+    document = Document(request.GET, 'groups')
+    rows = Group.objects.order_by('title').values(*document.columns())
+    return JsonResponse(document.render(rows))
+
+
+@api_view
+@query_budget(1)
+def group_detail(request, slug):
+    return detail(request, 'groups', Group.objects.all(), slug=slug)
+
+
+@api_view
+@query_budget(3)
+def comment_list(request, post_id):
+    if not Post.objects.filter(id=post_id).exists():
+        return error(404, 'Не найдено')
+    comments = Comment.objects.filter(post_id=post_id)
+    return paginated(request, 'comments', comments, 'created')
+
+
+@api_view
+@query_budget(3)
+def comment_detail(request, comment_id):
+    return detail(request, 'comments', Comment.objects.all(), id=comment_id)
+
+
+def login_required_json(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error(401, 'Нужна авторизация')
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+@api_view
+@login_required_json
+@query_budget(6)
+def follow_feed(request):
+    """Посты авторов, на которых подписан пользователь."""
+    return paginated(
+        request, 'posts', timeline.follow_feed(request.user), 'pub_date'
+    )
+
+
+@api_view
+@login_required_json
+@query_budget(3)
+def follow_list(request):
+    """Авторы, на которых подписан пользователь."""
+    document = Document(request.GET, 'users')
+    authors = Follow.objects.filter(user=request.user).values('author_id')
+    rows = User.objects.filter(id__in=authors).order_by(
+        'username'
+    ).values(*document.columns())
+    return JsonResponse(document.render(rows))
+
+
+@api_view
+@query_budget(4)
+def user_summary(request, username):
+    """Сводка автора; выборки по очереди, см. api.summary."""
+    author = summary.author(username)
+    posts = summary.recent_posts(username)
+    is_following = summary.following(
+        request.session.get(SESSION_KEY), username
+    )
+    if author is None:
+        return error(404, 'Не найдено')
+    return JsonResponse(summary.document(author, posts, is_following))
@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from .models import OutboundEmail
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'created', 'attempts',
+                    'next_attempt_at', 'sent_at')
+    search_fields = ('recipients', 'subject')
+    list_filter = ('sent_at',)
+    exclude = ('message',)
+    readonly_fields = ('subject', 'recipients', 'created', 'last_error',
+                       'sent_at')
+    empty_value_display = '-пусто-'
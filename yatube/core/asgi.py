@@ -0,0 +1,215 @@
+"""ASGI-обёртка над WSGI-приложением Django.
+
+Django 2.2 не умеет ни ASGI, ни асинхронные view, а ORM и кеш в нём
+блокирующие. Поэтому граница проходит так: цикл событий только
+принимает тело запроса и отдаёт ответ клиенту, а весь Django — view,
+ORM, кеш, шаблоны — работает в пуле из ASGI_THREADS потоков, как при
+WSGI. Запрос целиком, от request_started до закрытия ответа, выполняется
+в одном потоке пула: ответ дочитывается там же, так что соединения с БД
+и сигналы запроса не расходятся по потокам. Медленный клиент (загрузка
+картинки, чтение длинной ленты) больше не держит поток: пока байты идут
+по сети, поток обслуживает другие запросы.
+
+Медленная БД или кеш занимают поток на всё время выборки. Router
+отдаёт часть путей асинхронным обработчикам: они запускают независимые
+выборки одновременно в том же пуле (run_in_pool), и задержка ответа —
+самая долгая выборка, а не их сумма. Пул ограничивает и число
+одновременных подключений к БД.
+"""
+import asyncio
+import re
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+def _latin1(value):
+    # PEP 3333: строки окружения — байты, прочитанные как latin-1.
+    return value.encode('utf-8').decode('latin-1')
+
+
+def build_environ(scope, body):
+    """Окружение WSGI по области ASGI-запроса."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': _latin1(scope.get('root_path', '')),
+        'PATH_INFO': _latin1(scope['path']),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            value = f'{environ[name]},{value}'
+        environ[name] = value
+    return environ
+
+
+class WsgiToAsgi:
+    """ASGI-приложение, выполняющее WSGI-приложение в пуле потоков."""
+
+    def __init__(self, wsgi_application, workers=None):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers or settings.ASGI_THREADS,
+            thread_name_prefix='asgi',
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f'Неподдерживаемый тип ASGI: {scope["type"]}')
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        """Тело запроса целиком или None, если клиент отключился."""
+        body = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                body.seek(0)
+                return body
+
+    async def http(self, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            status, headers, chunks = await loop.run_in_executor(
+                self.executor, self.start, scope, body
+            )
+        finally:
+            body.close()
+        await send_response(send, status, headers, chunks)
+
+    def start(self, scope, body):
+        """Вызывает WSGI-приложение и дочитывает ответ в том же потоке.
+
+        Возвращает статус, заголовки и части тела. Потоковые ответы
+        (ленты posts.syndication) ограничены по размеру, а их генераторы
+        обращаются к БД — в другом потоке у них было бы чужое соединение.
+        """
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        response = self.wsgi_application(
+            build_environ(scope, body), start_response
+        )
+        try:
+            chunks = [chunk for chunk in response if chunk]
+        finally:
+            # close() закрывает файлы ответа и шлёт request_finished.
+            if hasattr(response, 'close'):
+                response.close()
+        return started['status'], started['headers'], chunks
+
+
+async def send_response(send, status, headers, chunks):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': headers,
+    })
+    for chunk in chunks:
+        await send({
+            'type': 'http.response.body',
+            'body': chunk,
+            'more_body': True,
+        })
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+def run_in_pool(executor, function, *args):
+    """Выполняет блокирующую выборку в пуле; возвращает awaitable.
+
+    Соединения с БД закрываются в том же потоке, как в конце запроса
+    Django.
+    """
+    def call():
+        try:
+            return function(*args)
+        finally:
+            close_old_connections()
+
+    return asyncio.get_running_loop().run_in_executor(executor, call)
+
+
+class Router:
+    """Отдаёт пути из routes асинхронным обработчикам, остальные —
+    WSGI-приложению через WsgiToAsgi.
+
+    routes — пары (регулярное выражение пути, обработчик). Обработчик
+    вызывается как handler(executor, scope, **группы) и возвращает
+    статус, заголовки и части тела. Обрабатываются только GET и HEAD:
+    тело запроса им не нужно.
+    """
+
+    def __init__(self, fallback, routes):
+        self.fallback = fallback
+        self.routes = [
+            (re.compile(pattern), handler) for pattern, handler in routes
+        ]
+
+    def match(self, scope):
+        if scope['type'] != 'http' or scope['method'] not in ('GET', 'HEAD'):
+            return None, None
+        for pattern, handler in self.routes:
+            found = pattern.fullmatch(scope['path'])
+            if found:
+                return handler, found.groupdict()
+        return None, None
+
+    async def __call__(self, scope, receive, send):
+        handler, kwargs = self.match(scope)
+        if handler is None:
+            await self.fallback(scope, receive, send)
+            return
+        status, headers, chunks = await handler(
+            self.fallback.executor, scope, **kwargs
+        )
+        if scope['method'] == 'HEAD':
+            chunks = []
+        await send_response(send, status, headers, chunks)
@@ -0,0 +1,288 @@
+"""Двухуровневый бэкенд кеша.
+
+L1 — ограниченный LRU с TTL в памяти процесса, L2 — любой настроенный
+кеш Django (OPTIONS['L2'], алиас из CACHES). Чтение сначала идёт в L1,
+запись — сквозная в оба уровня.
+
+Согласованность между процессами держится на журнале изменений в L2:
+incr, decr, delete и delete_many увеличивают номер журнала и записывают
+под ним изменённые ключи — одна запись на вызов, сколько бы ключей ни
+удалил delete_many. Каждый процесс сверяет номер в начале запроса
+(и не реже CHECK_INTERVAL секунд вне запросов) и убирает из L1 только
+ключи из пропущенных записей. Весь L1 сбрасывается, лишь если записи уже
+истекли (они живут LOCAL_TIMEOUT — дольше любой копии в L1), пропущено
+больше MAX_REPLAY записей или был вызван clear.
+
+Перезапись ключа через set и set_many журнал не трогает: устаревшая
+копия в чужом L1 живёт до LOCAL_TIMEOUT. Ключам, которые другие процессы
+должны видеть сразу, set запрещён: ключи с префиксами
+OPTIONS['NO_SET_PREFIXES'] (версии областей posts.cache) создаются
+через add и меняются только через incr и delete, а set и set_many с ними
+бросают ValueError.
+"""
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SEQUENCE_KEY = 'two-tier:sequence'
+LOG_KEY = 'two-tier:log:{}'
+# Запись журнала, после которой L1 сбрасывается целиком.
+FLUSH = '*'
+MAX_REPLAY = 1000
+
+_MISSING = object()
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class _LocalStore:
+    """L1 одного процесса, общий для всех потоков."""
+
+    def __init__(self):
+        self.data = OrderedDict()
+        self.lock = threading.RLock()
+        self.sequence = None
+        self.checked_at = None
+        self.stats = Counter()
+
+
+def _initial_sequence():
+    # Номер после вытеснения ключа не совпадает ни с одним из старых.
+    return int(time.time() * 1000)
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = options.get('L2', 'shared')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 30)
+        self._check_interval = options.get('CHECK_INTERVAL', 1)
+        self._no_set_prefixes = tuple(options.get('NO_SET_PREFIXES', ()))
+        with _stores_lock:
+            self._store = _stores.setdefault(name, _LocalStore())
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    # L1
+
+    def _local_get(self, key):
+        store = self._store
+        with store.lock:
+            entry = store.data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, pickled = entry
+            if expires_at <= time.monotonic():
+                del store.data[key]
+                return _MISSING
+            store.data.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def _local_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is not None and timeout <= time.time():
+            self._local_delete(key)
+            return
+        ttl = self._local_timeout
+        if timeout is not None:
+            ttl = min(ttl, timeout - time.time())
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        store = self._store
+        with store.lock:
+            store.data[key] = (time.monotonic() + ttl, pickled)
+            store.data.move_to_end(key)
+            while len(store.data) > self._max_entries:
+                store.data.popitem(last=False)
+
+    def _local_delete(self, key):
+        with self._store.lock:
+            self._store.data.pop(key, None)
+
+    # Журнал изменений
+
+    def _changed_since(self, old, new):
+        """Ключи L1, изменённые после old; None — сбросить весь L1."""
+        if old is None or new is None or not 0 < new - old <= MAX_REPLAY:
+            return None
+        entries = self.l2.get_many(
+            [LOG_KEY.format(number) for number in range(old + 1, new + 1)]
+        )
+        if len(entries) < new - old:
+            return None
+        changed = [key for keys in entries.values() for key in keys]
+        if FLUSH in changed:
+            return None
+        return changed
+
+    def _sync(self):
+        """Убирает из L1 ключи, изменённые другими процессами."""
+        store = self._store
+        now = time.monotonic()
+        checked_at = store.checked_at
+        if checked_at is not None and now - checked_at < self._check_interval:
+            return
+        sequence = self.l2.get(SEQUENCE_KEY)
+        if sequence is None:
+            # Журнал ещё пуст: процесс, который его не видел, начинает
+            # с этого номера без сброса L1.
+            self.l2.add(SEQUENCE_KEY, _initial_sequence(), None)
+            sequence = self.l2.get(SEQUENCE_KEY)
+            if store.sequence is None:
+                store.sequence = sequence
+        if sequence == store.sequence:
+            store.checked_at = now
+            return
+        changed = self._changed_since(store.sequence, sequence)
+        with store.lock:
+            store.checked_at = now
+            if changed is None:
+                if store.data:
+                    store.stats['invalidations'] += 1
+                store.data.clear()
+            else:
+                for local_key in changed:
+                    store.data.pop(local_key, None)
+                store.stats['invalidated_keys'] += len(changed)
+            store.sequence = sequence
+
+    def _log(self, local_keys):
+        """Записывает изменённые ключи в журнал для других процессов."""
+        if not local_keys:
+            return
+        try:
+            sequence = self.l2.incr(SEQUENCE_KEY)
+        except ValueError:
+            # Номер вытеснен или кеш очищен: скачок больше MAX_REPLAY
+            # сбросит L1 процессов со старыми номерами.
+            sequence = _initial_sequence() + MAX_REPLAY + 1
+            self.l2.add(SEQUENCE_KEY, sequence, None)
+        self.l2.set(
+            LOG_KEY.format(sequence), list(local_keys), self._local_timeout
+        )
+        store = self._store
+        with store.lock:
+            # Свои изменения L1 уже учёл; чужие пропущенные записи
+            # разберёт следующая сверка.
+            if store.sequence == sequence - 1:
+                store.sequence = sequence
+
+    def _check_set(self, keys):
+        for key in keys:
+            if key.startswith(self._no_set_prefixes):
+                raise ValueError(
+                    f'Ключ {key!r} нельзя перезаписать через set: другие '
+                    'процессы не узнают об изменении. Используйте add, '
+                    'incr или delete.'
+                )
+
+    # API кеша
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_key(key, version=version)
+        self.validate_key(local_key)
+        self._sync()
+        value = self._local_get(local_key)
+        if value is not _MISSING:
+            self._store.stats['local_hits'] += 1
+            return value
+        value = self.l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self._store.stats['misses'] += 1
+            return default
+        self._store.stats['shared_hits'] += 1
+        self._local_set(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = {}
+        missing = []
+        for key in keys:
+            value = self._local_get(self.make_key(key, version=version))
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        self._store.stats['local_hits'] += len(found)
+        if missing:
+            shared = self.l2.get_many(missing, version=version)
+            for key, value in shared.items():
+                self._local_set(self.make_key(key, version=version), value)
+            self._store.stats['shared_hits'] += len(shared)
+            self._store.stats['misses'] += len(missing) - len(shared)
+            found.update(shared)
+        return found
+
+    def has_key(self, key, version=None):
+        self._sync()
+        local_key = self.make_key(key, version=version)
+        if self._local_get(local_key) is not _MISSING:
+            return True
+        return self.l2.has_key(key, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._check_set([key])
+        self.l2.set(key, value, timeout, version=version)
+        self._local_set(self.make_key(key, version=version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._check_set(data)
+        failed = self.l2.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                local_key = self.make_key(key, version=version)
+                self._local_set(local_key, value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            local_key = self.make_key(key, version=version)
+            self._local_set(local_key, value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version=version)
+        local_key = self.make_key(key, version=version)
+        self._log([local_key])
+        self._local_set(local_key, value)
+        return value
+
+    def delete(self, key, version=None):
+        self.l2.delete(key, version=version)
+        local_key = self.make_key(key, version=version)
+        self._log([local_key])
+        self._local_delete(local_key)
+
+    def delete_many(self, keys, version=None):
+        self.l2.delete_many(keys, version=version)
+        local_keys = [self.make_key(key, version=version) for key in keys]
+        self._log(local_keys)
+        for local_key in local_keys:
+            self._local_delete(local_key)
+
+    def clear(self):
+        self.l2.clear()
+        with self._store.lock:
+            self._store.data.clear()
+        self._log([FLUSH])
+
+    def close(self, **kwargs):
+        # Конец запроса: следующий запрос сверит поколение заново.
+        self._store.checked_at = None
+
+    def stats(self):
+        """Счётчики попаданий этого процесса и размер L1."""
+        with self._store.lock:
+            return {**self._store.stats, 'size': len(self._store.data)}
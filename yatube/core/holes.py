@@ -0,0 +1,115 @@
+"""Дырки в кешируемом HTML (hole punching).
+
+Страница, которую кеширует posts.cache, рендерится с метками
+<!--hole:nonce:имя:аргументы--> вместо частей, зависящих от зрителя:
+CSRF-токен, меню пользователя, кнопки автора, форма комментария. Метки
+сохраняются в кеше и заменяются заново на каждом ответе, поэтому одна
+закешированная копия годится любому зрителю и не содержит чужих данных.
+Вне кеша тег {% hole %} рендерит значение сразу.
+
+nonce случаен для каждого рендера и хранится вместе с копией в заголовке
+NONCE_HEADER, поэтому заполняются только метки, которые вывели шаблоны,
+а не похожий текст из постов и комментариев. Метки с чужим nonce или
+неизвестным именем остаются как есть. Заполняются только ответы
+text/html.
+
+Аргументы метки — id и имена из букв, цифр, '-' и '.'; рендерер
+получает их строками.
+"""
+import re
+import secrets
+
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.html import format_html
+
+HOLE_RE = re.compile(rb'<!--hole:([0-9a-f]+):(\w+)((?::[\w.-]+)*)-->')
+ARG_RE = re.compile(r'^[\w.-]+$')
+NONCE_HEADER = 'X-Hole-Nonce'
+
+_renderers = {}
+
+
+def register(name):
+    def decorator(renderer):
+        _renderers[name] = renderer
+        return renderer
+    return decorator
+
+
+def punch(request):
+    """Включает метки вместо значений для этого запроса."""
+    request._hole_nonce = secrets.token_hex(8)
+
+
+def is_punching(request):
+    return hasattr(request, '_hole_nonce')
+
+
+def marker(request, name, *args):
+    args = [str(arg) for arg in args]
+    for arg in args:
+        if not ARG_RE.match(arg):
+            raise ValueError(f'Недопустимый аргумент дырки {name}: {arg!r}')
+    return '<!--hole:{}-->'.format(
+        ':'.join([request._hole_nonce, name, *args])
+    )
+
+
+def render(name, request, *args):
+    return _renderers[name](request, *args)
+
+
+def _is_html(response):
+    return (not response.streaming
+            and response.get('Content-Type', '').startswith('text/html'))
+
+
+def seal(request, response):
+    """Сохраняет в ответе nonce меток, чтобы заполнить их и в копии
+    из кеша."""
+    if is_punching(request) and _is_html(response):
+        response[NONCE_HEADER] = request._hole_nonce
+    return response
+
+
+def _replace(match, request, nonce):
+    name = match[2].decode()
+    if match[1] != nonce or name not in _renderers:
+        return match[0]
+    args = match[3].decode().split(':')[1:]
+    return str(render(name, request, *args)).encode()
+
+
+def fill(request, response):
+    """Подставляет значения запроса на место меток ответа."""
+    nonce = response.get(NONCE_HEADER)
+    if nonce is None:
+        return response
+    del response[NONCE_HEADER]
+    if _is_html(response):
+        nonce = nonce.encode()
+        response.content = HOLE_RE.sub(
+            lambda match: _replace(match, request, nonce), response.content
+        )
+    return response
+
+
+@register('csrf_token')
+def csrf_token(request):
+    return format_html(
+        '<input type="hidden" name="csrfmiddlewaretoken" value="{}">',
+        get_token(request),
+    )
+
+
+@register('user_nav')
+def user_nav(request):
+    return render_to_string('includes/user_nav.html', request=request)
+
+
+@register('switcher')
+def switcher(request, active):
+    return render_to_string(
+        'includes/switcher.html', {active: True}, request=request
+    )
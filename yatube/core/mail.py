@@ -0,0 +1,207 @@
+"""Очередь исходящей почты.
+
+EMAIL_BACKEND = 'core.mail.OutboxBackend' только сохраняет письма в
+таблицу OutboundEmail — в транзакции запроса, если view её открывает
+(transaction.atomic), так что запрос не ждёт SMTP, а письмо из
+откатившейся транзакции не уходит.
+Отправляет их команда send_queued_mail: пачками по OUTBOX_BATCH_SIZE
+через одно соединение транспорта OUTBOX_EMAIL_BACKEND. Неудачная
+попытка откладывает письмо с экспоненциальной задержкой от
+OUTBOX_RETRY_DELAY; после OUTBOX_MAX_ATTEMPTS попыток письмо остаётся в
+таблице с последней ошибкой и больше не отправляется.
+
+Письмо хранится в JSON (тема, текст, адреса, заголовки, альтернативы и
+вложения), а не в pickle: содержимое таблицы не должно исполнять код
+при чтении. В письмах бывают ссылки сброса пароля, поэтому после
+отправки или последней неудачной попытки текст письма стирается — в
+таблице остаются только тема, получатели и статус.
+"""
+import base64
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# На это время письмо закрепляется за воркером, чтобы параллельный
+# воркер не отправил его второй раз. Срок продлевается перед отправкой
+# каждого письма, так что он рассчитан на одно письмо, а не на пачку.
+LEASE = timedelta(minutes=5)
+MAX_RETRY_DELAY = 60 * 60 * 6
+REDACTED = ''
+
+
+def _dump_attachment(attachment):
+    if not isinstance(attachment, tuple):
+        raise TypeError('В очередь ставятся только вложения '
+                        '(имя, содержимое, тип), а не MIME-части')
+    filename, content, mimetype = attachment
+    if isinstance(content, bytes):
+        return [filename, base64.b64encode(content).decode(), mimetype, True]
+    return [filename, content, mimetype, False]
+
+
+def _dumps(message):
+    """Письмо в JSON; соединение не сохраняется — воркер подставит своё."""
+    return json.dumps({
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'alternatives': getattr(message, 'alternatives', []),
+        'attachments': list(map(_dump_attachment, message.attachments)),
+        'content_subtype': message.content_subtype,
+    })
+
+
+def _loads(payload):
+    """EmailMessage из JSON, сохранённого _dumps."""
+    data = json.loads(payload)
+    attachments = data.pop('attachments')
+    content_subtype = data.pop('content_subtype')
+    data['alternatives'] = list(map(tuple, data['alternatives']))
+    message = EmailMultiAlternatives(**data)
+    message.content_subtype = content_subtype
+    for filename, content, mimetype, encoded in attachments:
+        if encoded:
+            content = base64.b64decode(content)
+        message.attach(filename, content, mimetype)
+    return message
+
+
+class OutboxBackend(BaseEmailBackend):
+    """Ставит письма в очередь вместо отправки."""
+
+    def send_messages(self, email_messages):
+        queued = [
+            OutboundEmail(
+                subject=message.subject[:255],
+                recipients=', '.join(message.recipients()),
+                message=_dumps(message),
+            )
+            for message in email_messages if message.recipients()
+        ]
+        OutboundEmail.objects.bulk_create(queued)
+        return len(queued)
+
+
+def pending():
+    return OutboundEmail.objects.filter(
+        sent_at__isnull=True,
+        attempts__lt=settings.OUTBOX_MAX_ATTEMPTS,
+        next_attempt_at__lte=timezone.now(),
+    )
+
+
+def _due_ids(batch_size):
+    return list(pending().order_by('next_attempt_at', 'id').values_list(
+        'id', flat=True
+    )[:batch_size])
+
+
+def claim(batch_size):
+    """Берёт пачку писем, которые пора отправить, и продлевает их срок.
+
+    Каждое письмо закрепляется условным UPDATE: строку, которую между
+    выборкой и обновлением продлил другой воркер, условие pending() уже
+    не пропустит, и она не попадёт в пачку. Блокировки строк для этого не
+    нужны, так что способ работает и на SQLite.
+    """
+    lease = timezone.now() + LEASE
+    claimed = [
+        email_id for email_id in _due_ids(batch_size)
+        if pending().filter(id=email_id).update(next_attempt_at=lease)
+    ]
+    emails = OutboundEmail.objects.in_bulk(claimed)
+    return [emails[email_id] for email_id in claimed]
+
+
+def _renew(email):
+    """Продлевает срок письма перед отправкой.
+
+    Возвращает False, если срок уже истёк и письмо забрал другой воркер:
+    его next_attempt_at уже не тот, что записал claim().
+    """
+    lease = timezone.now() + LEASE
+    renewed = OutboundEmail.objects.filter(
+        id=email.id,
+        sent_at__isnull=True,
+        next_attempt_at=email.next_attempt_at,
+    ).update(next_attempt_at=lease)
+    email.next_attempt_at = lease
+    return bool(renewed)
+
+
+def retry_delay(attempts):
+    delay = settings.OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, MAX_RETRY_DELAY))
+
+
+def _sent(email):
+    email.sent_at = timezone.now()
+    email.last_error = ''
+    email.message = REDACTED
+    email.save(update_fields=['sent_at', 'last_error', 'message'])
+
+
+def _failed(email, exc):
+    email.attempts += 1
+    email.last_error = f'{type(exc).__name__}: {exc}'
+    email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+    if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        # Больше не отправляется: текст письма хранить незачем.
+        email.message = REDACTED
+    email.save(update_fields=[
+        'attempts', 'last_error', 'next_attempt_at', 'message'
+    ])
+    logger.warning('Письмо %s не отправлено (попытка %s): %s',
+                   email.id, email.attempts, email.last_error)
+
+
+def _reset(connection):
+    # Соединение могло оборваться посреди диалога: следующее письмо
+    # откроет новое.
+    try:
+        connection.close()
+    except Exception:
+        logger.exception('Не удалось закрыть соединение')
+
+
+def send_batch(batch_size=None):
+    """Отправляет одну пачку; возвращает (отправлено, ошибок)."""
+    emails = claim(batch_size or settings.OUTBOX_BATCH_SIZE)
+    if not emails:
+        return 0, 0
+    sent = failed = 0
+    connection = get_connection(settings.OUTBOX_EMAIL_BACKEND)
+    try:
+        for email in emails:
+            if not _renew(email):
+                continue
+            message = _loads(email.message)
+            message.connection = connection
+            try:
+                # open() без открытого соединения переподключается.
+                connection.open()
+                connection.send_messages([message])
+            except Exception as exc:
+                _failed(email, exc)
+                failed += 1
+                _reset(connection)
+            else:
+                _sent(email)
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
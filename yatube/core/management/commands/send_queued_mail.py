@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import mail
+
+
+class Command(BaseCommand):
+    help = (
+        'Отправляет письма из очереди OutboundEmail пачками через одно '
+        'соединение. С --interval работает постоянно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Писем в пачке; по умолчанию OUTBOX_BATCH_SIZE.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Проверять очередь раз в столько секунд; 0 — один проход.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.drain(options['batch_size'])
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def drain(self, batch_size):
+        """Отправляет пачки, пока в очереди есть письма, которым пора."""
+        while True:
+            sent, failed = mail.send_batch(batch_size)
+            if not sent and not failed:
+                return
+            self.stdout.write(
+                f'{time.strftime("%X")}: отправлено {sent}, ошибок {failed}'
+            )
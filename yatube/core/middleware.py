@@ -0,0 +1,50 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+
+from . import metrics, routers
+
+logger = logging.getLogger('yatube.metrics')
+
+
+class RequestMetricsMiddleware:
+    """Отдаёт метрики запроса в Server-Timing и пишет их в лог."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with metrics.collect() as collected:
+            response = self.get_response(request)
+        collected.total_time = time.perf_counter() - start
+        response['Server-Timing'] = collected.server_timing()
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **collected.as_dict(),
+        }))
+        return response
+
+
+class ReplicaPinMiddleware:
+    """Читает с реплик, а после записи закрепляет клиента за основной
+    базой на REPLICA_PIN_SECONDS (см. core.routers)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = routers.PIN_COOKIE in request.COOKIES
+        with routers.replica_reads(pinned) as state:
+            response = self.get_response(request)
+        if state.wrote:
+            response.set_cookie(
+                routers.PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,63 @@
+# Generated by Django 2.2.16 on 2026-10-18 09:40
+
+import base64
+import json
+import pickle
+
+from django.db import migrations, models
+
+
+def _attachment(attachment):
+    filename, content, mimetype = attachment
+    if isinstance(content, bytes):
+        return [filename, base64.b64encode(content).decode(), mimetype, True]
+    return [filename, content, mimetype, False]
+
+
+def to_json(apps, schema_editor):
+    # Неотправленные письма переводятся в JSON один раз: их записал
+    # прежний OutboxBackend этого же приложения. Отправленные стираются.
+    OutboundEmail = apps.get_model('core', 'OutboundEmail')
+    for email in OutboundEmail.objects.filter(
+        sent_at__isnull=True
+    ).iterator():
+        message = pickle.loads(email.message)
+        email.payload = json.dumps({
+            'subject': message.subject,
+            'body': message.body,
+            'from_email': message.from_email,
+            'to': message.to,
+            'cc': message.cc,
+            'bcc': message.bcc,
+            'reply_to': message.reply_to,
+            'headers': message.extra_headers,
+            'alternatives': getattr(message, 'alternatives', []),
+            'attachments': list(map(_attachment, message.attachments)),
+            'content_subtype': message.content_subtype,
+        })
+        email.save(update_fields=['payload'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundemail',
+            name='payload',
+            field=models.TextField(blank=True, verbose_name='Письмо'),
+        ),
+        migrations.RunPython(to_json, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='outboundemail',
+            name='message',
+        ),
+        migrations.RenameField(
+            model_name='outboundemail',
+            old_name='payload',
+            new_name='message',
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class CreatedModel(models.Model):
@@ -10,3 +11,32 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class OutboundEmail(models.Model):
+    """Письмо в очереди на отправку (core.mail)."""
+    subject = models.CharField('Тема', max_length=255)
+    recipients = models.TextField('Получатели')
+    # JSON письма (core.mail); после отправки стирается.
+    message = models.TextField('Письмо', blank=True)
+    created = models.DateTimeField('Дата создания', auto_now_add=True)
+    next_attempt_at = models.DateTimeField(
+        'Следующая попытка',
+        default=timezone.now
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    sent_at = models.DateTimeField('Отправлено', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        indexes = [
+            models.Index(
+                fields=['sent_at', 'next_attempt_at'],
+                name='outbound_email_queue_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} → {self.recipients}'
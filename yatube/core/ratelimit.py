@@ -0,0 +1,134 @@
+"""Ограничение частоты запросов к изменяющим данные view.
+
+Счётчики — скользящее окно, приближённое двумя соседними фиксированными
+окнами: оценка числа запросов за последний период равна счётчику
+текущего окна плюс счётчику прошлого, взвешенному долей периода, которая
+ещё попадает в скользящее окно. На проверку уходят add, incr и get к
+кешу; id пользователя берётся из сессии, а не из request.user, так что
+за пользователем в БД не ходим.
+
+Счётчики лежат в кеше RATELIMIT_CACHE. Это алиас общего кеша, а не
+двухуровневого default: каждый incr в TwoTierCache пишется в журнал
+изменений, который сверяют все процессы (core.cache), а копия счётчика
+в L1 всё равно бесполезна.
+
+Лимиты задаются в RATELIMITS: для каждой области — частота по
+пользователю ('user') и по IP ('ip') в виде 'число/период', где период —
+s, m, h или d, можно с множителем: '5/10m'. Запрос сверх лимита тоже
+учитывается, поэтому клиент, который продолжает слать запросы, остаётся
+заблокированным.
+"""
+import math
+import re
+import time
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import caches
+from django.shortcuts import render
+
+UNITS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+RATE_RE = re.compile(r'^(\d+)/(\d*)([smhd])$')
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'10/m' -> (10, 60): число запросов и период в секундах."""
+    match = RATE_RE.match(rate)
+    if match is None:
+        raise ValueError(f'Неверная частота: {rate!r}')
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * UNITS[unit]
+
+
+def _retry_after(previous, current, limit, period, elapsed):
+    """Через сколько секунд оценка опустится до лимита."""
+    if current <= limit and previous:
+        # Достаточно, чтобы вес прошлого окна уменьшился.
+        wait = period * (1 - (limit - current) / previous) - elapsed
+    else:
+        # Ждём следующего окна и затухания в нём нынешнего счётчика.
+        wait = period - elapsed + period * (1 - limit / current)
+    return max(1, math.ceil(wait))
+
+
+def hit(key, rate, now=None):
+    """Учитывает запрос; возвращает 0 или секунды до следующей попытки."""
+    limit, period = parse_rate(rate)
+    now = time.time() if now is None else now
+    cache = caches[settings.RATELIMIT_CACHE]
+    window, elapsed = divmod(now, period)
+    current_key = f'ratelimit:{key}:{period}:{int(window)}'
+    previous_key = f'ratelimit:{key}:{period}:{int(window) - 1}'
+    cache.add(current_key, 0, period * 2)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        # Ключ успел истечь между add и incr.
+        current = 1
+        cache.set(current_key, current, period * 2)
+    previous = cache.get(previous_key, 0)
+    if previous * (1 - elapsed / period) + current <= limit:
+        return 0
+    return _retry_after(previous, current, limit, period, elapsed)
+
+
+def client_ip(request):
+    return request.META.get(settings.RATELIMIT_IP_META, '')
+
+
+def identities(request):
+    """Ключи клиента: {'user': …, 'ip': …} без обращения к БД за User."""
+    found = {'ip': client_ip(request)}
+    user = getattr(request, '_cached_user', None)
+    if user is not None:
+        user_id = user.pk
+    elif hasattr(request, 'session'):
+        user_id = request.session.get(SESSION_KEY)
+    else:
+        user_id = None
+    if user_id is not None:
+        found['user'] = user_id
+    return found
+
+
+def check(request, scope):
+    """0, если запрос укладывается во все лимиты области, иначе
+    секунды до следующей попытки."""
+    rates = settings.RATELIMITS[scope]
+    retry_after = 0
+    for kind, identity in identities(request).items():
+        rate = rates.get(kind)
+        if rate is not None:
+            retry_after = max(
+                retry_after, hit(f'{scope}:{kind}:{identity}', rate)
+            )
+    return retry_after
+
+
+def limited(request, retry_after):
+    response = render(
+        request, 'core/429.html', {'retry_after': retry_after}, status=429
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(scope, methods=('POST',)):
+    """Ограничивает частоту запросов к view по лимитам RATELIMITS[scope].
+
+    Учитываются только запросы с методами methods. Ставится первым
+    декоратором, чтобы отказ обходился без загрузки пользователя и
+    работы самого view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if settings.RATELIMIT_ENABLE and request.method in methods:
+                retry_after = check(request, scope)
+                if retry_after:
+                    return limited(request, retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,91 @@
+"""Чтение с реплик базы данных.
+
+ReplicaRouter отправляет чтения на случайную базу из DATABASE_REPLICAS, а
+записи — в основную. Реплики используются только внутри запроса, который
+прошёл через ReplicaPinMiddleware; команды, миграции и оболочка работают
+с основной базой. Запрос читает с основной базы, если:
+
+* он уже что-то записал или находится внутри транзакции;
+* у клиента есть cookie закрепления — её ставит ответ на запрос с
+  записью на REPLICA_PIN_SECONDS, чтобы автор сразу видел свои изменения,
+  даже если реплика отстаёт.
+
+Остальные пользователи могут увидеть ленту с отставанием реплики. Чтобы
+такая лента не осела в кеше, чтения для его заполнения идут в блоке
+primary_reads: в течение REPLICA_PIN_SECONDS после изменения областей
+страницы (posts.cache) они тоже уходят в основную базу.
+"""
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'primary_db'
+
+_state = contextvars.ContextVar('replica_state', default=None)
+
+
+class ReplicaState:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+@contextmanager
+def replica_reads(pinned=False):
+    """Разрешает чтение с реплик на время блока."""
+    state = ReplicaState(pinned)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def primary_reads(since=None):
+    """Читает с основной базы, если данные менялись после since.
+
+    since — время последнего изменения, None — неизвестно. Изменения
+    старше REPLICA_PIN_SECONDS считаются дошедшими до реплик.
+    """
+    state = _state.get()
+    if state is None or state.pinned or (
+        since is not None
+        and since <= time.time() - settings.REPLICA_PIN_SECONDS
+    ):
+        yield
+        return
+    state.pinned = True
+    try:
+        yield
+    finally:
+        state.pinned = state.wrote
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None or state.pinned
+            or not settings.DATABASE_REPLICAS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
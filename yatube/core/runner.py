@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class StrictBudgetRunner(DiscoverRunner):
+    """Запуск тестов, в котором превышение бюджета запросов — ошибка.
+
+    Вне test_budget.py бюджеты иначе только пишут в лог, и регрессия
+    прошла бы незамеченной.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGET_STRICT = True
@@ -0,0 +1,15 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core import holes
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, *args):
+    """Часть страницы, которая заполняется заново на каждом ответе."""
+    request = context['request']
+    if holes.is_punching(request):
+        return mark_safe(holes.marker(request, name, *args))
+    return holes.render(name, request, *args)
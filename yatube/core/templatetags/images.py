@@ -0,0 +1,9 @@
+from django import template
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/picture.html')
+def picture(image, css_class='', alt=''):
+    """Разметка picture/srcset для набора {'src', 'sources', 'sizes'}."""
+    return {'image': image, 'css_class': css_class, 'alt': alt}
@@ -0,0 +1,55 @@
+import threading
+
+from django.core.signals import request_finished, request_started
+from django.urls import reverse
+
+from .utils import AsgiTestCase
+
+
+class WsgiToAsgiTest(AsgiTestCase):
+    def test_page_is_served(self):
+        """Страница отдаётся с заголовками и телом."""
+        sent = self.request(reverse('posts:index'))
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn(
+            (b'content-type', b'text/html; charset=utf-8'), sent[0]['headers']
+        )
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertIn('Пост через ASGI'.encode(), body)
+        self.assertFalse(sent[-1].get('more_body', False))
+
+    def test_path_and_query_reach_view(self):
+        """Путь и строка запроса передаются в Django без искажений."""
+        profile = reverse('posts:profile', args=[self.author.username])
+        self.assertEqual(self.request(profile, b'page=1')[0]['status'], 200)
+        self.assertEqual(self.request(profile, b'page=x')[0]['status'], 200)
+        missing = reverse('posts:profile', args=['нет-такого'])
+        self.assertEqual(self.request(missing)[0]['status'], 404)
+
+    def test_disconnect_skips_request(self):
+        """Ушедший до конца тела клиент не занимает поток Django."""
+        sent = self.request(reverse('posts:index'), messages=[
+            {'type': 'http.request', 'body': b'x', 'more_body': True},
+            {'type': 'http.disconnect'},
+        ])
+        self.assertEqual(sent, [])
+
+    def test_request_stays_on_one_thread(self):
+        """Ответ, и потоковый тоже, дочитывается и закрывается в потоке
+        запроса."""
+        threads = []
+
+        def remember(**kwargs):
+            threads.append(threading.get_ident())
+
+        request_started.connect(remember, dispatch_uid='test-asgi-thread')
+        request_finished.connect(remember, dispatch_uid='test-asgi-thread')
+        try:
+            sent = self.request(reverse('posts:index_feed', args=['rss']))
+        finally:
+            request_started.disconnect(dispatch_uid='test-asgi-thread')
+            request_finished.disconnect(dispatch_uid='test-asgi-thread')
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn(b'<rss', b''.join(m.get('body', b'') for m in sent))
+        self.assertEqual(len(threads), 2)
+        self.assertEqual(threads[0], threads[1])
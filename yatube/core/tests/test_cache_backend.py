@@ -0,0 +1,112 @@
+from django.core.cache import caches
+from django.test import TestCase
+
+from core.cache import MAX_REPLAY, SEQUENCE_KEY, TwoTierCache
+
+
+def make_cache(name):
+    return TwoTierCache(name, {'OPTIONS': {'L2': 'shared', 'MAX_ENTRIES': 3}})
+
+
+class TwoTierCacheTest(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        # Два экземпляра с разными L1 изображают два процесса.
+        self.first = make_cache(f'{self.id()}:first')
+        self.second = make_cache(f'{self.id()}:second')
+
+    def test_local_hit_skips_shared_cache(self):
+        """Повторное чтение берётся из L1 без обращения к L2."""
+        self.first.set('key', 'value')
+        caches['shared'].delete('key')
+        self.assertEqual(self.first.get('key'), 'value')
+        self.assertEqual(self.first.stats()['local_hits'], 1)
+
+    def test_shared_hit_fills_local(self):
+        """Промах L1 читается из L2 и запоминается локально."""
+        self.first.set('key', 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        stats = self.second.stats()
+        self.assertEqual(stats['shared_hits'], 1)
+        self.assertEqual(stats['local_hits'], 1)
+
+    def test_incr_invalidates_other_process(self):
+        """Изменение через incr сбрасывает L1 другого процесса."""
+        self.first.set('version', 1, None)
+        self.assertEqual(self.second.get('version'), 1)
+        self.first.incr('version')
+        self.second.close()
+        self.assertEqual(self.second.get('version'), 2)
+
+    def test_delete_invalidates_other_process(self):
+        """Удаление ключа видно другому процессу в следующем запросе."""
+        self.first.set('key', 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.first.delete('key')
+        self.second.close()
+        self.assertIsNone(self.second.get('key'))
+
+    def test_change_keeps_unrelated_local_keys(self):
+        """Изменение ключа убирает из чужого L1 только этот ключ."""
+        self.first.set('version', 1, None)
+        self.first.set('page', 'html')
+        self.second.get_many(['version', 'page'])
+        self.first.incr('version')
+        self.first.delete_many(['missing'])
+        self.second.close()
+        self.assertEqual(self.second.get_many(['version', 'page']),
+                         {'version': 2, 'page': 'html'})
+        stats = self.second.stats()
+        self.assertEqual(stats['invalidated_keys'], 2)
+        self.assertEqual(stats['local_hits'], 1)
+        self.assertNotIn('invalidations', stats)
+
+    def test_delete_many_is_one_log_entry(self):
+        """delete_many любого размера — одна запись журнала."""
+        keys = [f'version:{number}' for number in range(MAX_REPLAY + 1)]
+        self.first.set_many({key: 1 for key in keys}, None)
+        self.first.set('page', 'html')
+        self.second.get_many([*keys, 'page'])
+        sequence = caches['shared'].get(SEQUENCE_KEY)
+        self.first.delete_many(keys)
+        self.assertEqual(caches['shared'].get(SEQUENCE_KEY), sequence + 1)
+        self.second.close()
+        self.assertEqual(self.second.get_many([*keys, 'page']),
+                         {'page': 'html'})
+        self.assertNotIn('invalidations', self.second.stats())
+
+    def test_set_is_refused_for_logged_only_keys(self):
+        """Ключи, изменения которых должны видеть все, set не принимает."""
+        cache = TwoTierCache(f'{self.id()}:strict', {'OPTIONS': {
+            'L2': 'shared', 'NO_SET_PREFIXES': ['version:'],
+        }})
+        with self.assertRaises(ValueError):
+            cache.set('version:index', 1)
+        with self.assertRaises(ValueError):
+            cache.set_many({'page': 'html', 'version:index': 1})
+        self.assertIsNone(caches['shared'].get('version:index'))
+        self.assertTrue(cache.add('version:index', 1))
+        self.assertEqual(cache.incr('version:index'), 2)
+        cache.set('page', 'html')
+
+    def test_clear_flushes_other_process(self):
+        self.first.set('key', 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.first.clear()
+        self.second.close()
+        self.assertIsNone(self.second.get('key'))
+
+    def test_local_tier_is_bounded(self):
+        """L1 вытесняет давно не читанные ключи."""
+        for number in range(5):
+            self.first.set(f'key{number}', number)
+        self.assertEqual(self.first.stats()['size'], 3)
+        self.assertEqual(self.first.get('key0'), 0)
+        self.assertEqual(self.first.stats()['shared_hits'], 1)
+
+    def test_values_are_copies(self):
+        """Изменение прочитанного объекта не портит L1."""
+        self.first.set('key', ['value'])
+        self.first.get('key').append('changed')
+        self.assertEqual(self.first.get('key'), ['value'])
@@ -0,0 +1,41 @@
+import json
+
+from django.http import HttpResponse, JsonResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from core import holes
+
+
+class HolesTest(SimpleTestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+        holes.punch(self.request)
+
+    def page(self, content, response_class=HttpResponse):
+        return holes.seal(self.request, response_class(content))
+
+    def test_only_own_markers_are_filled(self):
+        """Заполняются метки с nonce рендера, остальные остаются текстом."""
+        own = holes.marker(self.request, 'switcher', 'index')
+        response = self.page(
+            f'{own}<!--hole:0123:switcher:index--><!--hole:0123:nope-->'
+        )
+        content = holes.fill(self.request, response).content.decode()
+        self.assertNotIn(own, content)
+        self.assertIn('<!--hole:0123:switcher:index-->', content)
+        self.assertIn('<!--hole:0123:nope-->', content)
+        self.assertNotIn(holes.NONCE_HEADER, response)
+
+    def test_unknown_name_is_left(self):
+        marker = holes.marker(self.request, 'nope')
+        response = holes.fill(self.request, self.page(marker))
+        self.assertEqual(response.content.decode(), marker)
+
+    def test_non_html_is_not_filled(self):
+        marker = holes.marker(self.request, 'switcher', 'index')
+        response = self.page({'text': marker}, JsonResponse)
+        self.assertNotIn(holes.NONCE_HEADER, response)
+        response[holes.NONCE_HEADER] = self.request._hole_nonce
+        response = holes.fill(self.request, response)
+        self.assertEqual(json.loads(response.content), {'text': marker})
+        self.assertNotIn(holes.NONCE_HEADER, response)
@@ -0,0 +1,221 @@
+import json
+import socketserver
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.forms import PasswordResetForm
+from django.core import mail as django_mail
+from django.core.management import call_command
+from django.db import transaction
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
+
+from core import mail
+from core.models import OutboundEmail
+from posts.models import User
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Минимальный SMTP-диалог; адреса с bounce отклоняются."""
+
+    def reply(self, code, text):
+        self.wfile.write(f'{code} {text}\r\n'.encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply(220, 'stand-in')
+        for raw in iter(self.rfile.readline, b''):
+            command = raw.decode()[:4].upper()
+            if command == 'RCPT' and b'bounce' in raw:
+                self.reply(550, 'no such user')
+            elif command == 'DATA':
+                self.reply(354, 'go ahead')
+                lines = iter(self.rfile.readline, b'.\r\n')
+                self.server.messages.append(b''.join(lines))
+                self.reply(250, 'queued')
+            elif command == 'QUIT':
+                self.reply(221, 'bye')
+                return
+            else:
+                self.reply(250, 'ok')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.connections = 0
+        self.messages = []
+
+
+def queue(*recipients):
+    with override_settings(EMAIL_BACKEND='core.mail.OutboxBackend'):
+        for recipient in recipients:
+            django_mail.send_mail('Тема', 'Текст', 'site@yatube.ru',
+                                  [recipient])
+
+
+class OutboxTest(TestCase):
+    def setUp(self):
+        self.smtp = SMTPStandIn()
+        threading.Thread(target=self.smtp.serve_forever, daemon=True).start()
+        self.addCleanup(self.smtp.server_close)
+        self.addCleanup(self.smtp.shutdown)
+        settings = override_settings(
+            OUTBOX_EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.smtp.server_address[1],
+            EMAIL_USE_TLS=False,
+            OUTBOX_RETRY_DELAY=60,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_password_reset_only_enqueues(self):
+        """Запрос сброса пароля ставит письмо в очередь и не шлёт его."""
+        User.objects.create_user(
+            username='forgetful', email='me@yatube.ru', password='secret-1'
+        )
+        with override_settings(EMAIL_BACKEND='core.mail.OutboxBackend'):
+            Client().post('/auth/password_reset/', {'email': 'me@yatube.ru'})
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.recipients, 'me@yatube.ru')
+        self.assertIsNone(email.sent_at)
+        self.assertEqual(self.smtp.connections, 0)
+
+    def test_failed_password_reset_queues_nothing(self):
+        """Письмо сброса пароля откатывается вместе с запросом."""
+        User.objects.create_user(
+            username='forgetful', email='me@yatube.ru', password='secret-1'
+        )
+        original = PasswordResetForm.send_mail
+
+        def send_then_fail(form, *args, **kwargs):
+            original(form, *args, **kwargs)
+            raise RuntimeError
+
+        with override_settings(EMAIL_BACKEND='core.mail.OutboxBackend',
+                               RATELIMIT_ENABLE=False):
+            with mock.patch.object(
+                PasswordResetForm, 'send_mail', send_then_fail
+            ):
+                with self.assertRaises(RuntimeError):
+                    Client().post(
+                        '/auth/password_reset/', {'email': 'me@yatube.ru'}
+                    )
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_claimed_elsewhere_is_skipped(self):
+        """Письмо, которое успел продлить другой воркер, не берётся."""
+        queue('a@yatube.ru', 'b@yatube.ru')
+        due = mail._due_ids(10)
+        OutboundEmail.objects.filter(id=due[0]).update(
+            next_attempt_at=timezone.now() + mail.LEASE
+        )
+        with mock.patch.object(mail, '_due_ids', return_value=due):
+            emails = mail.claim(10)
+        self.assertEqual([email.id for email in emails], due[1:])
+        self.assertEqual(mail.claim(10), [])
+
+    def test_message_survives_queue(self):
+        """Из JSON восстанавливаются адреса, заголовки, HTML и вложения."""
+        message = django_mail.EmailMultiAlternatives(
+            'Тема', 'Текст', 'site@yatube.ru', ['a@yatube.ru'],
+            cc=['b@yatube.ru'], bcc=['c@yatube.ru'],
+            reply_to=['help@yatube.ru'], headers={'X-Tag': 'reset'},
+        )
+        message.attach_alternative('<b>Текст</b>', 'text/html')
+        message.attach('notes.txt', 'заметки', 'text/plain')
+        message.attach('logo.gif', b'GIF89a\x00', 'image/gif')
+        mail.OutboxBackend().send_messages([message])
+        email = OutboundEmail.objects.get()
+        self.assertEqual(json.loads(email.message)['to'], ['a@yatube.ru'])
+        restored = mail._loads(email.message)
+        for field in ('subject', 'body', 'from_email', 'to', 'cc', 'bcc',
+                      'reply_to', 'extra_headers', 'alternatives',
+                      'attachments'):
+            with self.subTest(field=field):
+                self.assertEqual(
+                    getattr(restored, field), getattr(message, field)
+                )
+        self.assertEqual(
+            restored.message().as_bytes().count(b'Content-Disposition'), 2
+        )
+
+    def test_sent_message_is_redacted(self):
+        """После отправки текст письма со ссылками стирается."""
+        queue('a@yatube.ru')
+        mail.send_batch()
+        email = OutboundEmail.objects.get()
+        self.assertIsNotNone(email.sent_at)
+        self.assertEqual(email.message, '')
+        self.assertEqual(email.recipients, 'a@yatube.ru')
+
+    def test_expired_lease_is_not_sent_twice(self):
+        """Письмо, чей срок истёк и которое забрал другой воркер,
+        не отправляется."""
+        queue('a@yatube.ru', 'b@yatube.ru')
+        claim = mail.claim
+
+        def claim_then_lose_first(batch_size):
+            emails = claim(batch_size)
+            OutboundEmail.objects.filter(id=emails[0].id).update(
+                next_attempt_at=timezone.now() + 2 * mail.LEASE
+            )
+            return emails
+
+        with mock.patch.object(mail, 'claim', claim_then_lose_first):
+            self.assertEqual(mail.send_batch(), (1, 0))
+        self.assertEqual(len(self.smtp.messages), 1)
+
+    def test_batch_is_sent_over_one_connection(self):
+        queue('a@yatube.ru', 'b@yatube.ru', 'c@yatube.ru')
+        call_command('send_queued_mail', stdout=StringIO())
+        self.assertEqual(len(self.smtp.messages), 3)
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertFalse(
+            OutboundEmail.objects.filter(sent_at__isnull=True).exists()
+        )
+
+    def test_failure_is_retried_with_backoff(self):
+        queue('bounce@yatube.ru', 'ok@yatube.ru')
+        with self.assertLogs('core.mail', 'WARNING'):
+            sent, failed = mail.send_batch()
+        self.assertEqual((sent, failed), (1, 1))
+        self.assertEqual(len(self.smtp.messages), 1)
+        bounced = OutboundEmail.objects.get(recipients='bounce@yatube.ru')
+        self.assertEqual(bounced.attempts, 1)
+        self.assertIn('SMTPRecipientsRefused', bounced.last_error)
+        delay = bounced.next_attempt_at - timezone.now()
+        self.assertTrue(timedelta(seconds=50) < delay <= timedelta(minutes=1))
+        # Раньше срока письмо не берётся.
+        self.assertEqual(mail.send_batch(), (0, 0))
+
+    def test_retry_delay_doubles(self):
+        self.assertEqual(
+            [mail.retry_delay(attempt).seconds for attempt in (1, 2, 3)],
+            [60, 120, 240],
+        )
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_gives_up_after_max_attempts(self):
+        queue('bounce@yatube.ru')
+        with self.assertLogs('core.mail', 'WARNING') as logs:
+            for _ in range(3):
+                OutboundEmail.objects.update(next_attempt_at=timezone.now())
+                mail.send_batch()
+        self.assertEqual(len(logs.output), 2)
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.attempts, 2)
+        self.assertEqual(email.message, '')
+
+    def test_rolled_back_request_sends_nothing(self):
+        """Письмо сохраняется в транзакции запроса и откатывается с ней."""
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                queue('a@yatube.ru')
+                raise RuntimeError
+        self.assertFalse(OutboundEmail.objects.exists())
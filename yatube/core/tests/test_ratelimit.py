@@ -0,0 +1,119 @@
+from django.core.cache import caches
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core import ratelimit
+from posts.models import Follow, Post, User
+
+RATES = {
+    'post_create': {'user': '2/m', 'ip': '100/m'},
+    'add_comment': {'user': '2/m'},
+    'follow': {'user': '2/m'},
+    'signup': {'ip': '1/h'},
+    'password_reset': {'ip': '1/h'},
+}
+
+
+class SlidingWindowTest(SimpleTestCase):
+    def setUp(self):
+        caches['shared'].clear()
+
+    def test_parse_rate(self):
+        self.assertEqual(ratelimit.parse_rate('10/m'), (10, 60))
+        self.assertEqual(ratelimit.parse_rate('5/10m'), (5, 600))
+        with self.assertRaises(ValueError):
+            ratelimit.parse_rate('10 в минуту')
+
+    def test_limit_within_window(self):
+        """Запросы сверх лимита отклоняются до конца окна."""
+        start = 6000.0
+        self.assertEqual(ratelimit.hit('k', '2/m', now=start), 0)
+        self.assertEqual(ratelimit.hit('k', '2/m', now=start + 1), 0)
+        # Следующее окно + пока 3 * (1 - доля) не опустится до 2.
+        self.assertEqual(ratelimit.hit('k', '2/m', now=start + 2), 78)
+
+    def test_previous_window_decays(self):
+        """Прошлое окно учитывается с весом оставшейся доли периода."""
+        start = 6000.0
+        for second in range(2):
+            ratelimit.hit('k', '2/m', now=start + second)
+        # 2 * 0.75 + 1 > 2: прошлое окно ещё весит слишком много.
+        self.assertGreater(ratelimit.hit('k', '2/m', now=start + 75), 0)
+        # Окном позже: 1 * 0.5 + 1 <= 2.
+        self.assertEqual(ratelimit.hit('k', '2/m', now=start + 150), 0)
+
+    def test_keys_are_independent(self):
+        ratelimit.hit('a', '1/m', now=6000.0)
+        self.assertEqual(ratelimit.hit('b', '1/m', now=6000.0), 0)
+
+
+@override_settings(RATELIMITS=RATES)
+class RateLimitViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='spammer')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_post_create_is_limited_per_user(self):
+        url = reverse('posts:post_create')
+        statuses = [
+            self.client.post(url, {'text': 'Спам'}).status_code
+            for _ in range(3)
+        ]
+        self.assertEqual(statuses, [302, 302, 429])
+        self.assertEqual(Post.objects.count(), 2)
+        response = self.client.post(url, {'text': 'Спам'})
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    def test_get_is_not_limited(self):
+        """Форма создания поста открывается без ограничений."""
+        url = reverse('posts:post_create')
+        for _ in range(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_rejection_skips_view(self):
+        """Отказ не загружает пользователя и не выполняет view."""
+        for author in self.authors[:2]:
+            self.client.get(reverse('posts:profile_follow',
+                                    args=[author.username]))
+        url = reverse('posts:profile_follow', args=[self.authors[2].username])
+        # Только чтение сессии.
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(Follow.objects.filter(
+            user=self.user, author=self.authors[2]
+        ).exists())
+
+    def test_signup_is_limited_per_ip(self):
+        url = reverse('users:signup')
+        guest = Client()
+        first = guest.post(url, {}, REMOTE_ADDR='10.0.0.1')
+        self.assertNotEqual(first.status_code, 429)
+        second = guest.post(url, {}, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(second.status_code, 429)
+        other = guest.post(url, {}, REMOTE_ADDR='10.0.0.2')
+        self.assertNotEqual(other.status_code, 429)
+
+    def test_password_reset_paths_share_limit(self):
+        guest = Client()
+        data = {'email': 'nobody@example.com'}
+        guest.post('/auth/password_reset', data)
+        response = guest.post('/auth/password_reset/', data)
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(RATELIMIT_ENABLE=False)
+    def test_can_be_disabled(self):
+        url = reverse('posts:post_create')
+        for _ in range(3):
+            self.client.post(url, {'text': 'Не спам'})
+        self.assertEqual(Post.objects.count(), 3)
@@ -0,0 +1,109 @@
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import routers
+from core.middleware import ReplicaPinMiddleware
+from posts.cache import (
+    GLOBAL, INDEX, bump, cache_versioned, get_state, version_key,
+)
+from posts.models import Post
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=5)
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+
+    def test_reads_outside_requests_use_primary(self):
+        """Команды и оболочка читают с основной базы."""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_reads_in_request_use_replicas(self):
+        with routers.replica_reads():
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+
+    def test_write_pins_rest_of_request(self):
+        """После записи запрос читает свои изменения с основной базы."""
+        with routers.replica_reads() as state:
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertTrue(state.wrote)
+
+    def test_primary_reads_after_recent_change(self):
+        with routers.replica_reads():
+            with routers.primary_reads(time.time() - 1):
+                self.assertEqual(self.router.db_for_read(Post), 'default')
+            with routers.primary_reads(None):
+                self.assertEqual(self.router.db_for_read(Post), 'default')
+            with routers.primary_reads(time.time() - 60):
+                self.assertEqual(self.router.db_for_read(Post), 'replica')
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+
+    def test_fresh_page_is_cached_from_primary(self):
+        """Страница, чьи области только что изменились, не попадает в кеш
+        с отстающей реплики."""
+        routed = []
+
+        @cache_versioned(INDEX)
+        def view(request):
+            routed.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        cache.clear()
+        bump(INDEX)
+        with routers.replica_reads():
+            view(RequestFactory().get('/fresh/'))
+        # Изменение старше REPLICA_PIN_SECONDS уже дошло до реплик.
+        keys = [version_key(scope) for scope in (GLOBAL, INDEX)]
+        cache.delete_many(keys)
+        for key in keys:
+            cache.add(key, int((time.time() - 60) * 1000000), None)
+        with routers.replica_reads():
+            view(RequestFactory().get('/settled/'))
+        self.assertEqual(routed, ['default', 'replica'])
+
+    def test_change_time_comes_with_version(self):
+        """Время изменения приходит вместе с версией, без отдельных
+        ключей, которые другие процессы могли бы держать в L1."""
+        cache.clear()
+        (old,), _ = get_state([INDEX])
+        bump(INDEX)
+        (new,), last_modified = get_state([INDEX])
+        self.assertNotEqual(new, old)
+        self.assertEqual(last_modified, new / 1000000)
+        self.assertGreater(last_modified, time.time() - 1)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        with routers.replica_reads():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+
+    def middleware(self, write):
+        def view(request):
+            self.routed = self.router.db_for_read(Post)
+            if write:
+                self.router.db_for_write(Post)
+            return HttpResponse()
+        return ReplicaPinMiddleware(view)
+
+    def test_write_sets_pin_cookie(self):
+        """Ответ на запрос с записью закрепляет клиента за основной базой."""
+        response = self.middleware(write=True)(RequestFactory().post('/'))
+        cookie = response.cookies[routers.PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 5)
+        response = self.middleware(write=False)(RequestFactory().get('/'))
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+        self.assertEqual(self.routed, 'replica')
+
+    def test_pinned_client_reads_primary(self):
+        request = RequestFactory().get('/')
+        request.COOKIES[routers.PIN_COOKIE] = '1'
+        self.middleware(write=False)(request)
+        self.assertEqual(self.routed, 'default')
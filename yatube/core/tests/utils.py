@@ -0,0 +1,45 @@
+import asyncio
+from urllib.parse import unquote
+
+from django.core.cache import cache
+from django.core.wsgi import get_wsgi_application
+from django.test import TransactionTestCase
+
+from core.asgi import WsgiToAsgi
+from posts.models import Post, User
+
+
+class AsgiTestCase(TransactionTestCase):
+    """Django в пуле потоков видит только закоммиченные данные, поэтому
+    TransactionTestCase."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='автор')
+        Post.objects.create(author=self.author, text='Пост через ASGI')
+        self.wsgi = WsgiToAsgi(get_wsgi_application(), workers=3)
+        self.application = self.wsgi
+
+    def tearDown(self):
+        self.wsgi.executor.shutdown()
+
+    def request(self, path, query=b'', messages=None, headers=()):
+        sent = []
+        incoming = list(messages or [{'type': 'http.request'}])
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            # Серверы ASGI передают путь уже декодированным.
+            'path': unquote(path),
+            'query_string': query,
+            'headers': [(b'host', b'testserver'), *headers],
+        }
+        asyncio.run(self.application(scope, receive, send))
+        return sent
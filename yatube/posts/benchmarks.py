@@ -0,0 +1,534 @@
+"""Нагрузочные замеры view постов (seed_data / benchmark).
+
+seed() наполняет базу правдоподобными данными: авторы, комментарии и
+подписки распределены по степенному закону, так что есть и знаменитости
+с тысячами подписчиков, и «вирусные» посты. run() прогоняет view через
+тестовый клиент Django и считает перцентили задержки, число запросов к
+БД и пропускную способность; compare() сверяет результат с сохранённым
+базовым замером. concurrency() сравнивает пропускную способность под
+параллельной нагрузкой при WSGI и при ASGI (core.asgi): страницы — с
+медленными клиентами, сводку автора (api.summary) — ещё и с медленными
+выборками, которые асинхронный обработчик выполняет одновременно.
+hydration() сравнивает сборку
+страницы ленты из строк в экземпляры моделей и в карточки posts.feed.
+"""
+import asyncio
+import io
+import random
+import time
+import tracemalloc
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import wraps
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.wsgi import get_wsgi_application
+from django.db import transaction
+from django.db.models import F
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from mixer.backend.django import mixer
+from PIL import Image
+
+from api import summary
+from api.asgi import ROUTES
+from core.asgi import Router, WsgiToAsgi, build_environ
+from core.metrics import collect
+
+from . import feed
+from .models import Comment, Follow, Group, Post, User
+from .transfer import keep_dates, rebuild_derived
+
+BENCH_PASSWORD = 'benchmark'
+PERCENTILES = (50, 95, 99)
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса рангов 1..count по закону Ципфа."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+def _bulk(model, objects):
+    # Размер вставки подбирает Django: у SQLite свои лимиты на запрос.
+    with transaction.atomic():
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+
+
+def _images(count, rnd):
+    names = []
+    for number in range(count):
+        color = tuple(rnd.randrange(256) for _ in range(3))
+        buffer = io.BytesIO()
+        Image.new('RGB', (1600, 900), color).save(buffer, 'JPEG')
+        names.append(default_storage.save(
+            f'posts/bench_{number}.jpg', ContentFile(buffer.getvalue())
+        ))
+    return names
+
+
+def seed(users=200, groups=10, posts=2000, comments=5000, follows=20,
+         images=5, image_share=0.2, exponent=1.2, random_seed=None,
+         batch_size=1000):
+    """Наполняет базу данными для замеров, возвращает число объектов."""
+    rnd = random.Random(random_seed)
+    faker = mixer.faker
+    now = timezone.now()
+    offset = User.objects.count()
+
+    usernames = [f'{faker.user_name()}_{offset + i}' for i in range(users)]
+    password = make_password(BENCH_PASSWORD)
+    _bulk(User, [User(username=name, password=password)
+                 for name in usernames])
+    user_ids = list(User.objects.filter(
+        username__in=usernames
+    ).values_list('id', flat=True))
+    # Порядок в списке — ранг популярности автора.
+    rnd.shuffle(user_ids)
+    author_weights = zipf_weights(len(user_ids), exponent)
+
+    slugs = [f'group-{offset}-{i}' for i in range(groups)]
+    _bulk(Group, [Group(title=faker.sentence(nb_words=3), slug=slug,
+                        description=faker.text(max_nb_chars=200))
+                  for slug in slugs])
+    group_ids = list(Group.objects.filter(
+        slug__in=slugs
+    ).values_list('id', flat=True)) + [None]
+
+    image_names = _images(images, rnd)
+    last_post = Post.objects.order_by('-id').values_list(
+        'id', flat=True
+    ).first() or 0
+    with keep_dates():
+        for start in range(0, posts, batch_size):
+            count = min(batch_size, posts - start)
+            authors = rnd.choices(user_ids, cum_weights=author_weights,
+                                  k=count)
+            _bulk(Post, [
+                Post(
+                    author_id=author_id,
+                    group_id=rnd.choice(group_ids),
+                    text=faker.text(max_nb_chars=rnd.randint(50, 1000)),
+                    pub_date=now - timedelta(seconds=rnd.uniform(0, 3e7)),
+                    image=(rnd.choice(image_names)
+                           if image_names and rnd.random() < image_share
+                           else ''),
+                )
+                for author_id in authors
+            ])
+
+        post_ids = list(Post.objects.filter(
+            id__gt=last_post
+        ).values_list('id', flat=True))
+        rnd.shuffle(post_ids)
+        post_weights = zipf_weights(len(post_ids), exponent)
+        for start in range(0, comments if post_ids else 0, batch_size):
+            count = min(batch_size, comments - start)
+            targets = rnd.choices(post_ids, cum_weights=post_weights,
+                                  k=count)
+            _bulk(Comment, [
+                Comment(
+                    post_id=post_id,
+                    author_id=rnd.choice(user_ids),
+                    text=faker.sentence(),
+                    created=now - timedelta(seconds=rnd.uniform(0, 3e7)),
+                )
+                for post_id in targets
+            ])
+
+    edges = []
+    for user_id in user_ids:
+        count = rnd.randint(1, max(1, 2 * follows))
+        authors = set(rnd.choices(user_ids, cum_weights=author_weights,
+                                  k=count))
+        edges.extend(Follow(user_id=user_id, author_id=author_id)
+                     for author_id in authors - {user_id})
+    _bulk(Follow, edges)
+
+    rebuild_derived()
+    return {
+        'users': users,
+        'groups': groups,
+        'posts': posts,
+        'comments': comments if post_ids else 0,
+        'follows': len(edges),
+    }
+
+
+class Scenario:
+    """Один замеряемый запрос: кто, куда и что делать до него."""
+
+    def __init__(self, name, user, method, url, data=None, setup=None):
+        self.name = name
+        self.user = user
+        self.method = method
+        self.url = url
+        self.data = data or {}
+        self.setup = setup
+
+
+def scenarios():
+    """Сценарии для всех view на самых нагруженных объектах базы."""
+    celebrity = User.objects.order_by(
+        F('stats__followers_count').desc(nulls_last=True)
+    ).first()
+    reader = User.objects.order_by(
+        F('stats__following_count').desc(nulls_last=True)
+    ).first()
+    group = Group.objects.order_by('-id').first()
+    hot_post = Post.objects.order_by('-comments_count').first()
+    own_post = celebrity.posts.order_by('-pub_date').first()
+    follower = User.objects.exclude(
+        pk=celebrity.pk
+    ).exclude(follower__author=celebrity).first() or reader
+
+    def unfollow():
+        Follow.objects.filter(user=follower, author=celebrity).delete()
+
+    def follow():
+        Follow.objects.get_or_create(user=follower, author=celebrity)
+
+    items = [
+        Scenario('index', reader, 'get', reverse('posts:index')),
+        Scenario('profile', reader, 'get',
+                 reverse('posts:profile', args=[celebrity.username])),
+        Scenario('post_detail', reader, 'get',
+                 reverse('posts:post_detail', args=[hot_post.id])),
+        Scenario('follow_index', reader, 'get',
+                 reverse('posts:follow_index')),
+        Scenario('post_create', celebrity, 'post',
+                 reverse('posts:post_create'), {'text': 'Замер'}),
+        Scenario('add_comment', reader, 'post',
+                 reverse('posts:add_comment', args=[hot_post.id]),
+                 {'text': 'Замер'}),
+        Scenario('profile_follow', follower, 'get',
+                 reverse('posts:profile_follow', args=[celebrity.username]),
+                 setup=unfollow),
+        Scenario('profile_unfollow', follower, 'get',
+                 reverse('posts:profile_unfollow',
+                         args=[celebrity.username]),
+                 setup=follow),
+        # Те же данные через JSON API — для сравнения с HTML-страницами.
+        Scenario('api_posts', reader, 'get',
+                 reverse('api:post_list') + '?include=author,group'),
+        Scenario('api_post_comments', reader, 'get',
+                 reverse('api:comment_list', args=[hot_post.id])
+                 + '?include=author'),
+        Scenario('api_follow_feed', reader, 'get',
+                 reverse('api:follow_feed') + '?include=author'),
+    ]
+    if group is not None:
+        items.append(Scenario(
+            'group_posts', reader, 'get',
+            reverse('posts:group_list', args=[group.slug]),
+        ))
+    if own_post is not None:
+        items.append(Scenario(
+            'post_edit', celebrity, 'post',
+            reverse('posts:post_edit', args=[own_post.id]),
+            {'text': own_post.text},
+        ))
+    return items
+
+
+def summary_scenario():
+    """Сводка самого популярного автора — три независимые выборки."""
+    celebrity = User.objects.order_by(
+        F('stats__followers_count').desc(nulls_last=True)
+    ).first()
+    reader = User.objects.exclude(pk=celebrity.pk).first() or celebrity
+    return Scenario('user_summary', reader, 'get',
+                    reverse('api:user_summary', args=[celebrity.username]))
+
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(0, -(-len(ordered) * percent // 100) - 1)
+    return ordered[int(index)]
+
+
+def measure(scenario, requests, warmup=2, cold=False):
+    client = Client()
+    client.force_login(scenario.user)
+    request = getattr(client, scenario.method)
+    timings = []
+    queries = errors = 0
+    for number in range(warmup + requests):
+        if scenario.setup:
+            scenario.setup()
+        if cold:
+            cache.clear()
+        with collect() as metrics:
+            start = time.perf_counter()
+            response = request(scenario.url, scenario.data)
+            elapsed = time.perf_counter() - start
+        if number < warmup:
+            continue
+        timings.append(elapsed)
+        queries += metrics.queries
+        errors += response.status_code >= 400
+    total = sum(timings)
+    result = {
+        f'p{percent}_ms': round(percentile(timings, percent) * 1000, 2)
+        for percent in PERCENTILES
+    }
+    result.update(
+        requests=requests,
+        errors=errors,
+        mean_ms=round(total / requests * 1000, 2),
+        rps=round(requests / total, 1) if total else None,
+        queries=round(queries / requests, 2),
+    )
+    return result
+
+
+def run(requests=50, warmup=2, cold=False, names=None):
+    """Замеряет сценарии, возвращает результат для JSON."""
+    views = {}
+    # Замеряется сам view, а не отказы core.ratelimit.
+    with override_settings(RATELIMIT_ENABLE=False):
+        for scenario in scenarios():
+            if names and scenario.name not in names:
+                continue
+            views[scenario.name] = measure(scenario, requests, warmup, cold)
+    return {
+        'meta': {
+            'users': User.objects.count(),
+            'posts': Post.objects.count(),
+            'comments': Comment.objects.count(),
+            'follows': Follow.objects.count(),
+            'cache': 'cold' if cold else 'warm',
+            'requests': requests,
+        },
+        'views': views,
+    }
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Регрессии относительно базового замера: список описаний."""
+    regressions = []
+    for name, current in results['views'].items():
+        base = baseline.get('views', {}).get(name)
+        if base is None:
+            continue
+        if current['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f'{name}: p95 {base["p95_ms"]} → {current["p95_ms"]} мс'
+            )
+        if current['queries'] > base['queries']:
+            regressions.append(
+                f'{name}: запросов {base["queries"]} → {current["queries"]}'
+            )
+    return regressions
+
+
+@contextmanager
+def slow_backend(latency):
+    """Каждая выборка сводки автора (api.summary.FETCHES) блокирует свой
+    поток на latency секунд, как медленная БД."""
+    def slowed(fetch):
+        @wraps(fetch)
+        def wrapper(*args):
+            time.sleep(latency)
+            return fetch(*args)
+        return wrapper
+
+    originals = {name: getattr(summary, name) for name in summary.FETCHES}
+    if latency:
+        for name, fetch in originals.items():
+            setattr(summary, name, slowed(fetch))
+    try:
+        yield
+    finally:
+        for name, fetch in originals.items():
+            setattr(summary, name, fetch)
+
+
+def _scope(scenario, cookie):
+    path, _, query = scenario.url.partition('?')
+    return {
+        'type': 'http',
+        'method': 'GET',
+        'path': path,
+        'query_string': query.encode(),
+        'headers': [(b'cookie', cookie.encode()), (b'host', b'testserver')],
+        'server': ('testserver', 80),
+    }
+
+
+def _wsgi_server(workers, client_delay):
+    """Модель WSGI-сервера: поток занят и пока клиент передаёт данные."""
+    application = get_wsgi_application()
+    executor = ThreadPoolExecutor(max_workers=workers)
+
+    def handle(scope):
+        time.sleep(client_delay)
+        statuses = []
+        response = application(
+            build_environ(scope, io.BytesIO()),
+            lambda status, headers, exc_info=None: statuses.append(status),
+        )
+        b''.join(response)
+        response.close()
+        return int(statuses[0].split()[0])
+
+    async def request(scope):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, handle, scope)
+
+    return request, executor.shutdown
+
+
+def _asgi_server(workers, client_delay):
+    """ASGI: медленный клиент ждёт в цикле событий, а пути api.asgi
+    обслуживают асинхронные обработчики."""
+    fallback = WsgiToAsgi(get_wsgi_application(), workers=workers)
+    application = Router(fallback, ROUTES)
+
+    async def request(scope):
+        messages = []
+
+        async def receive():
+            await asyncio.sleep(client_delay)
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        await application(scope, receive, send)
+        return messages[0]['status']
+
+    return request, fallback.executor.shutdown
+
+
+async def _drive(request, scope, requests, concurrency):
+    timings = []
+    errors = 0
+
+    async def client(count):
+        nonlocal errors
+        for _ in range(count):
+            start = time.perf_counter()
+            status = await request(scope)
+            timings.append(time.perf_counter() - start)
+            errors += status >= 400
+
+    started = time.perf_counter()
+    shares = [requests // concurrency + (number < requests % concurrency)
+              for number in range(concurrency)]
+    await asyncio.gather(*(client(count) for count in shares if count))
+    return timings, errors, time.perf_counter() - started
+
+
+SERVERS = {'wsgi': _wsgi_server, 'asgi': _asgi_server}
+
+
+def concurrency(requests=50, clients=20, workers=4, latency=0.05,
+                client_delay=0.05, names=None):
+    """Пропускная способность GET-сценариев при WSGI и ASGI.
+
+    latency — задержка каждой выборки сводки автора: под WSGI они идут
+    по очереди, под ASGI одновременно. Потоков пула выборки занимают
+    столько же, так что выигрыш в задержке виден, пока клиентов меньше,
+    чем потоков на их выборки. Страницы Django выполняются в
+    потоке целиком при любом сервере, поэтому их сравнение показывает
+    только выигрыш на медленных клиентах.
+    """
+    views = {}
+    # Только чтение: сценарии с подготовкой меняют данные.
+    readers = [
+        scenario for scenario in [*scenarios(), summary_scenario()]
+        if scenario.method == 'get' and scenario.setup is None
+        and (not names or scenario.name in names)
+    ]
+    with slow_backend(latency):
+        for scenario in readers:
+            client = Client()
+            client.force_login(scenario.user)
+            cookie = '; '.join(
+                f'{key}={morsel.value}'
+                for key, morsel in client.cookies.items()
+            )
+            views[scenario.name] = {}
+            for server, factory in SERVERS.items():
+                request, shutdown = factory(workers, client_delay)
+                timings, errors, total = asyncio.run(_drive(
+                    request, _scope(scenario, cookie), requests, clients
+                ))
+                shutdown()
+                views[scenario.name][server] = {
+                    'errors': errors,
+                    'p95_ms': round(percentile(timings, 95) * 1000, 2),
+                    'rps': round(requests / total, 1),
+                }
+    return {
+        'meta': {
+            'requests': requests,
+            'clients': clients,
+            'workers': workers,
+            'latency_ms': latency * 1000,
+            'client_delay_ms': client_delay * 1000,
+        },
+        'views': views,
+    }
+
+
+def _model_page(rows):
+    """Страница ленты из экземпляров моделей, как до карточек."""
+    users, groups, posts = {}, {}, []
+    for row in rows:
+        fields, author, group = feed._split(row)
+        post = Post(**fields)
+        if post.author_id not in users:
+            users[post.author_id] = User(**author)
+        post.author = users[post.author_id]
+        if group is not None:
+            if post.group_id not in groups:
+                groups[post.group_id] = Group(**group)
+            post.group = groups[post.group_id]
+        posts.append(post)
+    return posts
+
+
+HYDRATORS = {'models': _model_page, 'cards': feed.cards}
+
+
+def _render_fields(post):
+    # Всё, что читает includes/post.html.
+    return (post.id, post.text, post.pub_date, post.author.username,
+            post.author.get_full_name(), str(post.group or ''),
+            bool(post.image))
+
+
+def hydration(size=None, repeat=200):
+    """Время и память на сборку страницы ленты из строк БД."""
+    rows = list(Post.objects.order_by('-pub_date', '-id').values(
+        *feed.POST_LOOKUPS
+    )[:size or settings.PAGINATION])
+    results = {}
+    for name, build in HYDRATORS.items():
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for post in build(rows):
+                _render_fields(post)
+        elapsed = time.perf_counter() - started
+        tracemalloc.start()
+        page = build(rows)
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del page
+        results[name] = {
+            'us_per_page': round(elapsed / repeat * 1e6, 1),
+            'bytes_per_page': allocated,
+        }
+    return {'meta': {'posts': len(rows), 'repeat': repeat},
+            'hydration': results}
@@ -0,0 +1,289 @@
+"""Кеширование страниц с версионными ключами.
+
+Каждая страница зависит от набора областей (scope): 'index',
+'group:<slug>', 'profile:<username>', 'post:<id>', 'follow:<user_id>',
+'author:<user_id>', 'suggestions' и общей 'global'. Ключ кеша страницы включает
+текущие версии этих областей, а сигналы моделей при изменениях сбрасывают
+версии. Поэтому страницы можно хранить часами: после записи старые
+ключи просто перестают читаться.
+
+Сброс — один delete_many по всем областям: пост автора с тысячей
+подписчиков меняет тысячу лент, но это одна запись в журнале
+TwoTierCache (core.cache) и один запрос к кешу, а не incr на каждую.
+Новая версия появляется при следующем чтении.
+
+Версия — отметка времени своего создания, и из неё же берётся время
+изменения области: оно не раньше настоящего изменения и меняется только
+через журналируемые операции, так что другие процессы видят его вместе
+с новой версией.
+
+Части страницы, зависящие от зрителя (CSRF-токен, меню пользователя,
+кнопки автора, форма комментария), кешируются как дырки core.holes и
+заполняются на каждом ответе, так что страницы cache_versioned общие
+для всех зрителей.
+
+Из тех же версий и зрителя строится ETag страницы; клиент с актуальной
+копией получает 304 до рендера и даже до чтения кеша страниц.
+Last-Modified у страниц нет: время изменения областей одинаково для всех
+зрителей, и копия, сохранённая до входа или выхода, прошла бы по нему
+проверку. Его отдают только ленты (posts.syndication), которые от
+зрителя не зависят.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.middleware.cache import CacheMiddleware
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
+
+from core import holes
+from core.routers import primary_reads
+from core.metrics import record_cache
+
+from . import timeline
+from .models import Follow, Group, User
+
+GLOBAL = 'global'
+INDEX = 'index'
+SUGGESTIONS = 'suggestions'
+
+
+def version_key(scope):
+    return f'version:{scope}'
+
+
+def _initial_version():
+    # Версия — отметка времени в микросекундах: после сброса или
+    # вытеснения новая версия не совпадёт ни с одной из старых.
+    return int(time.time() * 1000000)
+
+
+def get_state(scopes):
+    """Версии областей и время последнего изменения любой из них."""
+    keys = [version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial_version(), None)
+            found[key] = cache.get(key)
+    versions = [found[key] for key in keys]
+    return versions, max(versions) / 1000000
+
+
+def _bump(scopes):
+    cache.delete_many([version_key(scope) for scope in scopes])
+
+
+def bump(*scopes):
+    """Инвалидирует страницы, зависящие от областей scopes."""
+    _bump(scopes)
+    # Повтор после коммита не даёт закешировать страницу, собранную
+    # конкурентным запросом до того, как изменения стали видны.
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(scopes))
+
+
+def post_scopes(post):
+    """Области страниц, на которых виден пост."""
+    group_ids = {post.group_id, getattr(post, '_old_group_id', None)}
+    slugs = Group.objects.filter(id__in=group_ids - {None}).values_list(
+        'slug', flat=True
+    )
+    author = User.objects.filter(pk=post.author_id).values_list(
+        'username', flat=True
+    ).first()
+    return [
+        INDEX,
+        f'profile:{author}',
+        f'post:{post.pk}',
+        *(f'group:{slug}' for slug in slugs),
+        *feed_scopes(post.author_id),
+    ]
+
+
+def feed_scopes(author_id):
+    """Области лент подписок, в которых видны посты автора."""
+    # Посты знаменитостей подмешиваются при чтении ленты (см.
+    # posts.timeline), поэтому такие ленты зависят от области автора.
+    if timeline.is_celebrity(author_id):
+        return [f'author:{author_id}']
+    follower_ids = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    return [f'follow:{user_id}' for user_id in follower_ids]
+
+
+def followed_celebrities(user_id):
+    """timeline.followed_celebrities, закешированные до смены подписок."""
+    (version,), last_modified = get_state([f'follow:{user_id}'])
+    key = f'celebrities:{user_id}:{version}'
+    celebrity_ids = cache.get(key)
+    if celebrity_ids is None:
+        with primary_reads(last_modified):
+            celebrity_ids = timeline.followed_celebrities(user_id)
+        cache.set(key, celebrity_ids, settings.PAGE_CACHE_TIMEOUT)
+    return celebrity_ids
+
+
+def follow_scopes(user_id):
+    """Области ленты подписок пользователя."""
+    return [
+        f'follow:{user_id}',
+        *(f'author:{author_id}'
+          for author_id in followed_celebrities(user_id)),
+    ]
+
+
+def followed_celebrity_scopes(request):
+    """Области знаменитостей из ленты подписок пользователя."""
+    return follow_scopes(request.user.pk)[1:]
+
+
+def page_scopes(scopes, kwargs):
+    return [GLOBAL] + [scope.format(**kwargs) for scope in scopes]
+
+
+def page_etag(viewer, request, versions):
+    source = '{}:{}:{}'.format(
+        viewer, request.get_full_path(), '.'.join(map(str, versions))
+    )
+    return 'W/"{}"'.format(hashlib.md5(source.encode()).hexdigest())
+
+
+def not_modified(request, etag, last_modified=None):
+    """304 (или 412), если у клиента текущая версия страницы."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    # Отметка времени точна до секунды: изменение в ту же секунду,
+    # что и ответ, было бы неотличимо по If-Modified-Since.
+    if last_modified is not None and last_modified > time.time() - 1:
+        last_modified = None
+    request._last_modified = last_modified
+    return get_conditional_response(
+        request, etag=etag,
+        last_modified=last_modified and int(last_modified),
+    )
+
+
+def add_validators(request, response, etag):
+    """ETag и Last-Modified; клиент перепроверяет копию при каждом показе."""
+    if (request.method in ('GET', 'HEAD')
+            and response.status_code in (200, 304)):
+        response['ETag'] = etag
+        last_modified = getattr(request, '_last_modified', None)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        del response['Expires']
+        del response['Cache-Control']
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def session_viewer(request):
+    # Общие страницы различаются по сессии (Vary: Cookie), а её cookie
+    # можно сравнить без запроса к базе.
+    return request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')
+
+
+def cache_versioned(*scopes):
+    """Кеширует страницу, пока не изменятся её области."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            versions, last_modified = get_state(page_scopes(scopes, kwargs))
+            etag = page_etag(session_viewer(request), request, versions)
+            response = not_modified(request, etag)
+            if response is not None:
+                patch_vary_headers(response, ('Cookie',))
+                return add_validators(request, response, etag)
+            # Всё, что зависит от зрителя, — дырки core.holes, поэтому
+            # одна копия страницы годится всем.
+            middleware = CacheMiddleware(
+                cache_timeout=settings.PAGE_CACHE_TIMEOUT,
+                key_prefix='.'.join(map(str, versions)),
+            )
+            holes.punch(request)
+            response = middleware.process_request(request)
+            record_cache(response is not None)
+            if response is None:
+                with primary_reads(last_modified):
+                    response = view(request, *args, **kwargs)
+                holes.seal(request, response)
+                response = middleware.process_response(request, response)
+            patch_vary_headers(response, ('Cookie',))
+            return add_validators(
+                request, holes.fill(request, response), etag
+            )
+        return wrapper
+    return decorator
+
+
+def user_scopes(scopes, request, kwargs):
+    names = [GLOBAL]
+    for scope in scopes:
+        if callable(scope):
+            names.extend(scope(request))
+        else:
+            names.append(scope.format(user=request.user.pk or 0, **kwargs))
+    return names
+
+
+def cache_per_user(*scopes):
+    """Кеширует страницу отдельно для каждого пользователя.
+
+    В отличие от cache_versioned ключ строится по id пользователя, а не
+    по cookie, так что все анонимы делят одну копию. Области могут
+    ссылаться на {user}; функция в scopes получает запрос и возвращает
+    дополнительные области.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            versions, last_modified = get_state(
+                user_scopes(scopes, request, kwargs)
+            )
+            etag = page_etag(request.user.pk or 0, request, versions)
+            response = not_modified(request, etag)
+            if response is not None:
+                patch_cache_control(response, private=True)
+                return add_validators(request, response, etag)
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = 'user-page:{}:{}:{}'.format(
+                request.user.pk or 0, path, '.'.join(map(str, versions))
+            )
+            holes.punch(request)
+            page = cache.get(key)
+            record_cache(page is not None)
+            if page is None:
+                with primary_reads(last_modified):
+                    response = view(request, *args, **kwargs)
+                holes.seal(request, response)
+                if response.status_code == 200 and not response.streaming:
+                    page = (
+                        response.content, response['Content-Type'],
+                        response.get(holes.NONCE_HEADER),
+                    )
+                    cache.set(key, page, settings.PAGE_CACHE_TIMEOUT)
+            else:
+                content, content_type, nonce = page
+                response = HttpResponse(content, content_type=content_type)
+                if nonce is not None:
+                    response[holes.NONCE_HEADER] = nonce
+            response = add_validators(
+                request, holes.fill(request, response), etag
+            )
+            patch_cache_control(response, private=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,98 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются сигналами моделей в той же транзакции, что и сама
+запись, поэтому страницы читают готовые числа без COUNT(*).
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core.routers import primary_reads
+
+from .cache import GLOBAL, bump, get_state
+from .models import AuthorStats, Comment, Follow, Post
+
+POSTS = 'posts_count'
+FOLLOWERS = 'followers_count'
+FOLLOWING = 'following_count'
+
+
+def posts_scope(user_id):
+    return f'posts-count:{user_id}'
+
+
+def posts_count(user_id):
+    """Число постов автора, закешированное до его изменения."""
+    versions, last_modified = get_state([GLOBAL, posts_scope(user_id)])
+    key = 'posts-count:{}:{}'.format(user_id, '.'.join(map(str, versions)))
+    count = cache.get(key)
+    if count is None:
+        with primary_reads(last_modified):
+            count = AuthorStats.objects.filter(user_id=user_id).values_list(
+                POSTS, flat=True
+            ).first() or 0
+        cache.set(key, count, settings.PAGE_CACHE_TIMEOUT)
+    return count
+
+
+def recount(user_id):
+    """Пересчитывает счётчики одного пользователя по таблицам."""
+    AuthorStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            POSTS: Post.objects.filter(author_id=user_id).count(),
+            FOLLOWERS: Follow.objects.filter(author_id=user_id).count(),
+            FOLLOWING: Follow.objects.filter(user_id=user_id).count(),
+        },
+    )
+    bump(posts_scope(user_id))
+
+
+def create(user_id):
+    AuthorStats.objects.get_or_create(user_id=user_id)
+
+
+def change(user_id, field, delta):
+    updated = AuthorStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta}
+    )
+    if not updated and delta > 0:
+        # Строки ещё нет: пересчёт уже учитывает текущее изменение.
+        # При удалении строка может исчезать вместе с пользователем.
+        recount(user_id)
+    elif field == POSTS:
+        bump(posts_scope(user_id))
+
+
+def change_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def rebuild():
+    """Пересобирает все счётчики по данным таблиц."""
+    stats = defaultdict(dict)
+    groupings = (
+        (POSTS, Post.objects.values_list('author_id')),
+        (FOLLOWERS, Follow.objects.values_list('author_id')),
+        (FOLLOWING, Follow.objects.values_list('user_id')),
+    )
+    for field, queryset in groupings:
+        rows = queryset.annotate(total=Count('id')).order_by()
+        for user_id, total in rows:
+            stats[user_id][field] = total
+    AuthorStats.objects.all().delete()
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=user_id, **fields)
+         for user_id, fields in stats.items()],
+        batch_size=500,
+    )
+    comments = Comment.objects.filter(post=OuterRef('pk')).order_by(
+    ).values('post').annotate(total=Count('id')).values('total')
+    Post.objects.update(comments_count=Coalesce(Subquery(comments), 0))
+    bump(GLOBAL)
+    return len(stats)
@@ -0,0 +1,45 @@
+import logging
+from functools import wraps
+
+from django.conf import settings
+
+from core import metrics
+
+logger = logging.getLogger('yatube.metrics')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(budget):
+    """Объявляет максимум SQL-запросов для view.
+
+    Превышение пишется в лог, а при QUERY_BUDGET_STRICT (в тестах)
+    приводит к исключению QueryBudgetExceeded.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            collected = metrics.current()
+            if collected is None:
+                with metrics.collect() as collected:
+                    response = view(request, *args, **kwargs)
+                used = collected.queries
+            else:
+                before = collected.queries
+                response = view(request, *args, **kwargs)
+                used = collected.queries - before
+            collected.view = view.__name__
+            collected.budget = budget
+            if used > budget:
+                message = (
+                    f'{view.__name__}: {used} SQL-запросов '
+                    f'при бюджете {budget}'
+                )
+                if settings.QUERY_BUDGET_STRICT:
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+        return wrapper
+    return decorator
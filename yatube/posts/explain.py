@@ -0,0 +1,98 @@
+"""Проверка планов запросов лент через EXPLAIN QUERY PLAN.
+
+feed_queries() вызывает те же функции, что и view лент (список id
+ленты, её COUNT, страницы после кеша и по курсору, загрузка постов
+страницы), но с фиктивными значениями фильтров, а plan() перехватывает
+выполненный ими SQL и спрашивает его план: план SQLite зависит от схемы
+и индексов, а не от данных. Плохим считается план с полным
+сканированием таблицы или сортировкой во временном B-дереве — на
+миллионах постов такие запросы читают и сортируют всю выборку ради
+одной страницы.
+"""
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import feed, timeline
+from .models import Comment, Follow, Post
+from .utils import NEXT, CursorPaginator, encode_cursor
+
+SAMPLE_ID = 1
+
+
+def _feed(name, posts):
+    """Запросы ленты: список id, COUNT, дальняя страница и курсор."""
+    limit = settings.FEED_IDS_LIMIT
+    cursor = encode_cursor(NEXT, timezone.now(), SAMPLE_ID)
+    return {
+        f'{name}: ids': lambda: posts.ids(0, limit),
+        f'{name}: count': posts.count,
+        f'{name}: page': lambda: posts.ids(limit, limit + 10),
+        f'{name}: first cursor page': lambda: posts.cursor_page(None),
+        f'{name}: cursor': lambda: posts.cursor_page(cursor),
+    }
+
+
+def feed_queries():
+    """Функции, которые выполняют запросы лент: {название: функция}."""
+    posts = Post.objects.all()
+    comments = CursorPaginator(
+        Comment.objects.filter(post_id=SAMPLE_ID).select_related('author'),
+        settings.COMMENTS_PER_PAGE, key='created',
+    )
+    cursor = encode_cursor(NEXT, timezone.now(), SAMPLE_ID)
+    return {
+        **_feed('index', feed.QueryFeed(posts)),
+        **_feed('group_list', feed.QueryFeed(
+            posts.filter(group_id=SAMPLE_ID)
+        )),
+        **_feed('profile', feed.QueryFeed(
+            posts.filter(author_id=SAMPLE_ID)
+        )),
+        **_feed('follow_index', feed.MergedFeed(
+            timeline.follow_sources(SAMPLE_ID)
+        )),
+        **_feed('follow_index with celebrities', feed.MergedFeed(
+            timeline.follow_sources(SAMPLE_ID, [SAMPLE_ID, SAMPLE_ID + 1])
+        )),
+        'hydrate': lambda: feed._fetch_posts([SAMPLE_ID, SAMPLE_ID + 1]),
+        'post_detail comments': lambda: comments.get_page(None),
+        'post_comments': lambda: comments.get_page(cursor),
+        'followers': lambda: list(Follow.objects.filter(
+            author_id=SAMPLE_ID
+        ).values_list('user_id', flat=True)),
+        'following': lambda: Follow.objects.filter(
+            user_id=SAMPLE_ID, author_id=SAMPLE_ID
+        ).exists(),
+    }
+
+
+def _explain_sql(sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def explain(queryset):
+    """Строки плана запроса."""
+    return _explain_sql(*queryset.query.sql_with_params())
+
+
+def plan(run):
+    """Строки планов всех запросов, которые выполняет run()."""
+    with CaptureQueriesContext(connection) as context:
+        run()
+    lines = []
+    for query in context.captured_queries:
+        lines.extend(_explain_sql(query['sql']))
+    return lines
+
+
+def problems(plan):
+    """Строки плана с полным сканированием или временной сортировкой."""
+    return [
+        line for line in plan
+        if 'TEMP B-TREE' in line
+        or (line.startswith('SCAN ') and ' USING ' not in line)
+    ]
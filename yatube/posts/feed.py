@@ -0,0 +1,375 @@
+"""Ленты из закешированных списков id и кеша объектов.
+
+Для каждой ленты (index, группа, профиль, подписки) кешируется только
+упорядоченный список id первых FEED_IDS_LIMIT постов под ключом с
+версиями её областей (posts.cache). Посты, авторы и группы страницы
+достаются из кеша объектов get_many, а промахи по постам — одним
+запросом вместе с авторами и группами. В кеше лежат строки полей, а не
+экземпляры моделей, поэтому пост не тащит за собой копию автора.
+Популярный пост из многих лент и страниц хранится один раз, а сигналы
+сбрасывают объект при его изменении (forget).
+
+Из строк собираются не экземпляры моделей, а лёгкие карточки с
+__slots__ (PostCard, AuthorCard, GroupCard): у них только поля, которые
+читают шаблоны лент, нет состояния модели и дескрипторов полей, поэтому
+страница выделяет меньше памяти и собирается быстрее. Карточка равна
+экземпляру своей модели с тем же pk.
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from core.routers import primary_reads
+
+from . import thumbnails, utils
+from .cache import GLOBAL, get_state
+from .models import Group, Post, User
+
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'group_id', 'author_id', 'image',
+    'comments_count',
+)
+# Только поля, которые нужны шаблонам лент.
+USER_FIELDS = ('id', 'username', 'first_name', 'last_name')
+GROUP_FIELDS = ('id', 'title', 'slug', 'description')
+
+MODELS = {
+    'post': (Post, POST_FIELDS),
+    'user': (User, USER_FIELDS),
+    'group': (Group, GROUP_FIELDS),
+}
+
+
+def object_key(model_name, pk):
+    return f'feed:{model_name}:{pk}'
+
+
+class Card:
+    """Строка модели для шаблонов ленты без экземпляра модели."""
+
+    __slots__ = ()
+    model = None
+
+    def __init__(self, **row):
+        for field, value in row.items():
+            setattr(self, field, value)
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __eq__(self, other):
+        if isinstance(other, (type(self), self.model)):
+            return self.pk == other.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f'<{type(self).__name__}: {self.id}>'
+
+
+class AuthorCard(Card):
+    __slots__ = USER_FIELDS
+    model = User
+
+    def get_full_name(self):
+        return f'{self.first_name} {self.last_name}'.strip()
+
+    def __str__(self):
+        return self.username
+
+
+class GroupCard(Card):
+    __slots__ = GROUP_FIELDS
+    model = Group
+
+    def __str__(self):
+        return self.title
+
+
+class CardImage:
+    """Картинка поста: имя файла и адрес, как у FieldFile."""
+
+    __slots__ = ('name',)
+    storage = Post._meta.get_field('image').storage
+
+    def __init__(self, name):
+        self.name = name
+
+    def __bool__(self):
+        return bool(self.name)
+
+    @property
+    def url(self):
+        return self.storage.url(self.name)
+
+
+class PostCard(Card):
+    __slots__ = POST_FIELDS + ('author', 'group', 'image_sets')
+    model = Post
+
+    def __init__(self, author, group, image, **row):
+        super().__init__(**row)
+        self.author = author
+        self.group = group
+        self.image = CardImage(image)
+        # Наборы миниатюр страницы (posts.thumbnails.attach).
+        self.image_sets = None
+
+    def __str__(self):
+        return self.text[:15]
+
+
+def forget(model_name, *pks):
+    """Сбрасывает объекты из кеша, в том числе после коммита."""
+    keys = [object_key(model_name, pk) for pk in pks]
+    cache.delete_many(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _get_many(wanted):
+    """Строки объектов из кеша одним get_many: {модель: {id: строка}}."""
+    keys = {
+        object_key(name, pk): (name, pk)
+        for name, ids in wanted.items() for pk in ids
+    }
+    found = {name: {} for name in MODELS}
+    for key, row in cache.get_many(keys).items():
+        name, pk = keys[key]
+        found[name][pk] = row
+    return found
+
+
+def _store(rows):
+    cache.set_many(
+        {
+            object_key(name, pk): row
+            for name, items in rows.items() for pk, row in items.items()
+        },
+        settings.PAGE_CACHE_TIMEOUT,
+    )
+
+
+RELATED = {'author': USER_FIELDS, 'group': GROUP_FIELDS}
+# Поля поста вместе с полями автора и группы для одного values().
+POST_LOOKUPS = POST_FIELDS + tuple(
+    f'{prefix}__{field}'
+    for prefix, fields in RELATED.items() for field in fields
+)
+
+
+def _split(row):
+    """Строка values(*POST_LOOKUPS) -> строки поста, автора и группы."""
+    post = {field: row[field] for field in POST_FIELDS}
+    author = {field: row[f'author__{field}'] for field in USER_FIELDS}
+    group = None
+    if row['group_id'] is not None:
+        group = {field: row[f'group__{field}'] for field in GROUP_FIELDS}
+    return post, author, group
+
+
+def _fetch_posts(ids):
+    """Посты вместе с авторами и группами одним запросом."""
+    rows = {name: {} for name in MODELS}
+    queryset = Post.objects.filter(id__in=ids).order_by()
+    for row in queryset.values(*POST_LOOKUPS):
+        post, author, group = _split(row)
+        rows['post'][post['id']] = post
+        rows['user'][post['author_id']] = author
+        if group is not None:
+            rows['group'][post['group_id']] = group
+    return rows
+
+
+def _fetch(name, ids):
+    model, fields = MODELS[name]
+    return {
+        row['id']: row
+        for row in model.objects.filter(id__in=ids).values(*fields)
+    }
+
+
+def _load(ids):
+    """Строки постов страницы и их авторов и групп."""
+    rows = _get_many({'post': ids})
+    missing = set(ids) - rows['post'].keys()
+    if missing:
+        fetched = _fetch_posts(missing)
+        _store(fetched)
+        for name, items in fetched.items():
+            rows[name].update(items)
+    wanted = {
+        'user': {row['author_id'] for row in rows['post'].values()},
+        'group': {row['group_id'] for row in rows['post'].values()} - {None},
+    }
+    wanted = {name: ids - rows[name].keys() for name, ids in wanted.items()}
+    for name, items in _get_many(wanted).items():
+        rows[name].update(items)
+    for name, ids in wanted.items():
+        missing = ids - rows[name].keys()
+        if missing:
+            fetched = _fetch(name, missing)
+            _store({name: fetched})
+            rows[name].update(fetched)
+    return rows
+
+
+def hydrate(ids):
+    """Карточки постов по списку id в том же порядке."""
+    rows = _load(ids)
+    users = {pk: AuthorCard(**row) for pk, row in rows['user'].items()}
+    groups = {pk: GroupCard(**row) for pk, row in rows['group'].items()}
+    return [
+        PostCard(
+            author=users[row['author_id']],
+            group=groups.get(row['group_id']),
+            **row,
+        )
+        for row in map(rows['post'].get, ids) if row is not None
+    ]
+
+
+def cards(rows):
+    """Карточки постов из строк values(*POST_LOOKUPS)."""
+    users, groups, posts = {}, {}, []
+    for row in rows:
+        post, author, group = _split(row)
+        if post['author_id'] not in users:
+            users[post['author_id']] = AuthorCard(**author)
+        if group is not None and post['group_id'] not in groups:
+            groups[post['group_id']] = GroupCard(**group)
+        posts.append(PostCard(
+            author=users[post['author_id']],
+            group=groups.get(post['group_id']),
+            **post,
+        ))
+    return posts
+
+
+class QueryFeed:
+    """Лента из одного запроса постов, упорядоченного по индексу."""
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def ids(self, start, stop):
+        return list(self.queryset.values_list('id', flat=True)[start:stop])
+
+    def count(self):
+        return self.queryset.count()
+
+    def cursor_page(self, cursor):
+        paginator = utils.CursorPaginator(
+            self.queryset.values(*POST_LOOKUPS), settings.PAGINATION
+        )
+        page = paginator.get_page(cursor)
+        page.object_list = cards(page.object_list)
+        return page
+
+
+class MergedPaginator(utils.CursorPaginator):
+    def rows(self, decoded, limit):
+        return self.queryset.rows(limit, decoded)
+
+
+class MergedFeed:
+    """Лента из нескольких источников, каждый упорядочен своим индексом.
+
+    Источник — (запрос, поле id поста). Каждый читается уже
+    отсортированным по (pub_date, id) не дальше нужной строки, а
+    heapq.merge сливает их в Python: в базе нет сортировки объединения во
+    временном B-дереве. Источники не должны пересекаться — число постов
+    ленты равно сумме их COUNT.
+    """
+
+    def __init__(self, sources):
+        self.sources = sources
+
+    def rows(self, limit, decoded=None):
+        """Первые limit строк {'pub_date', 'id'} в порядке курсора."""
+        streams = [
+            utils.CursorPaginator(queryset, limit, pk=pk).page_queryset(
+                decoded
+            ).values_list('pub_date', pk)[:limit]
+            for queryset, pk in self.sources
+        ]
+        descending = decoded is None or decoded[0] == utils.NEXT
+        merged = heapq.merge(*streams, reverse=descending)
+        return [
+            {'pub_date': pub_date, 'id': pk}
+            for pub_date, pk in islice(merged, limit)
+        ]
+
+    def ids(self, start, stop):
+        return [row['id'] for row in self.rows(stop)[start:]]
+
+    def count(self):
+        return sum(queryset.count() for queryset, _ in self.sources)
+
+    def cursor_page(self, cursor):
+        page = MergedPaginator(self, settings.PAGINATION).get_page(cursor)
+        page.object_list = hydrate([row['id'] for row in page.object_list])
+        return page
+
+
+class FeedIds:
+    """id постов ленты: начало из кеша, дальние страницы из БД."""
+
+    def __init__(self, posts, head, total):
+        self.posts = posts
+        self.head = head
+        self.total = total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if index.stop is not None and index.stop <= len(self.head):
+            return self.head[index]
+        return self.posts.ids(index.start or 0, index.stop)
+
+
+def feed_ids(scopes, posts):
+    """Список id ленты, закешированный до изменения её областей."""
+    # GLOBAL — как у страниц (posts.cache.page_scopes): общий сброс
+    # после загрузки данных должен достать и списки под страницами.
+    versions, last_modified = get_state([GLOBAL, *scopes])
+    key = 'feed-ids:{}:{}'.format(
+        ','.join(scopes), '.'.join(map(str, versions))
+    )
+    cached = cache.get(key)
+    if cached is None:
+        limit = settings.FEED_IDS_LIMIT
+        with primary_reads(last_modified):
+            head = posts.ids(0, limit)
+            total = posts.count() if len(head) == limit else len(head)
+        cached = (head, total)
+        cache.set(key, cached, settings.PAGE_CACHE_TIMEOUT)
+    return FeedIds(posts, *cached)
+
+
+def paginate(request, scopes, posts):
+    """Страница ленты с постами из кеша объектов.
+
+    posts — запрос постов ленты или MergedFeed.
+    """
+    if not isinstance(posts, MergedFeed):
+        posts = QueryFeed(posts)
+    if utils.is_cursor_request(request):
+        # Курсор ссылается на (pub_date, id), а не на позицию в списке.
+        page = posts.cursor_page(request.GET.get(utils.CURSOR_PARAM))
+    else:
+        paginator = Paginator(feed_ids(scopes, posts), settings.PAGINATION)
+        page = paginator.get_page(request.GET.get('page'))
+        page.object_list = hydrate(list(page.object_list))
+    thumbnails.attach(page.object_list)
+    return page
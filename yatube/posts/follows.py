@@ -0,0 +1,164 @@
+"""Граф подписок: идемпотентные подписка и отписка.
+
+Подписка — один INSERT с игнорированием конфликта (ON CONFLICT DO
+NOTHING / INSERT OR IGNORE), отписка — один DELETE, так что двойной
+клик и параллельные запросы не приводят ни к ошибке, ни к дублю.
+Счётчики, ленты и кеш страниц обновляются обработчиками сигналов
+(posts.signals), поэтому post_save и post_delete отправляются вручную —
+только для строк, которые действительно вставлены или удалены. Где СУБД
+умеет RETURNING, пачка подписок — один запрос; иначе по запросу на
+автора внутри одной транзакции.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models.signals import post_delete, post_save
+
+from core.routers import primary_reads
+
+from .cache import get_state
+from .models import Follow
+
+TABLE = Follow._meta.db_table
+
+
+def _can_return(connection):
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return False
+
+
+def _insert_sql(connection, count, returning):
+    ops = connection.ops
+    return '{} {} ({}, {}) VALUES {} {}{}'.format(
+        ops.insert_statement(ignore_conflicts=True),
+        ops.quote_name(TABLE),
+        ops.quote_name('user_id'),
+        ops.quote_name('author_id'),
+        ', '.join(['(%s, %s)'] * count),
+        ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+        ' RETURNING id, author_id' if returning else '',
+    ).rstrip()
+
+
+def _delete_sql(connection, count, returning):
+    qn = connection.ops.quote_name
+    return 'DELETE FROM {} WHERE {} = %s AND {} IN ({}){}'.format(
+        qn(TABLE), qn('user_id'), qn('author_id'),
+        ', '.join(['%s'] * count),
+        ' RETURNING id, author_id' if returning else '',
+    )
+
+
+def _insert(connection, user_id, author_ids):
+    """Вставляет подписки, возвращает [(id, author_id)] новых строк."""
+    with connection.cursor() as cursor:
+        if _can_return(connection):
+            params = [value for author_id in author_ids
+                      for value in (user_id, author_id)]
+            cursor.execute(
+                _insert_sql(connection, len(author_ids), True), params
+            )
+            return cursor.fetchall()
+        return [
+            (cursor.lastrowid, author_id) for author_id in author_ids
+            if _execute(cursor, _insert_sql(connection, 1, False),
+                        [user_id, author_id])
+        ]
+
+
+def _delete(connection, user_id, author_ids):
+    """Удаляет подписки, возвращает [(id, author_id)] удалённых строк."""
+    with connection.cursor() as cursor:
+        if _can_return(connection):
+            cursor.execute(
+                _delete_sql(connection, len(author_ids), True),
+                [user_id, *author_ids],
+            )
+            return cursor.fetchall()
+        return [
+            (None, author_id) for author_id in author_ids
+            if _execute(cursor, _delete_sql(connection, 1, False),
+                        [user_id, author_id])
+        ]
+
+
+def _execute(cursor, sql, params):
+    """Выполняет запрос, True — если он затронул строку."""
+    cursor.execute(sql, params)
+    return cursor.rowcount == 1
+
+
+def _candidates(user, author_ids):
+    # На себя подписаться нельзя, а SQLite молча пропустил бы и
+    # нарушение CHECK.
+    return sorted({int(author_id) for author_id in author_ids} - {user.pk})
+
+
+@transaction.atomic(savepoint=False)
+def follow_many(user, author_ids):
+    """Подписывает на авторов, возвращает id новых подписок на авторов."""
+    author_ids = _candidates(user, author_ids)
+    if not author_ids:
+        return []
+    # Запись через роутер: запрос закрепляется за основной базой.
+    using = router.db_for_write(Follow)
+    rows = _insert(connections[using], user.pk, author_ids)
+    for pk, author_id in rows:
+        follow = Follow(pk=pk, user_id=user.pk, author_id=author_id)
+        post_save.send(
+            Follow, instance=follow, created=True, raw=False,
+            using=using, update_fields=None,
+        )
+    return [author_id for _, author_id in rows]
+
+
+@transaction.atomic(savepoint=False)
+def unfollow_many(user, author_ids):
+    """Отписывает от авторов, возвращает id авторов снятых подписок."""
+    author_ids = _candidates(user, author_ids)
+    if not author_ids:
+        return []
+    using = router.db_for_write(Follow)
+    rows = _delete(connections[using], user.pk, author_ids)
+    for pk, author_id in rows:
+        follow = Follow(pk=pk, user_id=user.pk, author_id=author_id)
+        post_delete.send(Follow, instance=follow, using=using)
+    return [author_id for _, author_id in rows]
+
+
+def follow(user, author):
+    """Подписывает на автора; True, если подписки ещё не было."""
+    return bool(follow_many(user, [author.pk]))
+
+
+def unfollow(user, author):
+    """Отписывает от автора; True, если подписка была."""
+    return bool(unfollow_many(user, [author.pk]))
+
+
+def following_ids(user):
+    """id всех авторов, на которых подписан пользователь, из кеша."""
+    if not user.is_authenticated:
+        return frozenset()
+    (version,), last_modified = get_state([f'follow:{user.pk}'])
+    key = f'following:{user.pk}:{version}'
+    author_ids = cache.get(key)
+    if author_ids is None:
+        with primary_reads(last_modified):
+            author_ids = frozenset(Follow.objects.filter(
+                user=user
+            ).values_list('author_id', flat=True))
+        cache.set(key, author_ids, settings.PAGE_CACHE_TIMEOUT)
+    return author_ids
+
+
+def following(user, author_ids):
+    """Подмножество author_ids, на которое подписан пользователь."""
+    return following_ids(user) & set(author_ids)
+
+
+def is_following(user, author):
+    return author.pk in following_ids(user)
@@ -0,0 +1,37 @@
+"""Дырки core.holes на страницах постов: то, что видит только автор
+или только вошедший пользователь, и счётчики автора, которые меняются
+без изменения областей страницы."""
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.html import format_html
+
+from core import holes
+
+from . import counters
+from .forms import CommentForm
+
+
+@holes.register('post_edit')
+def post_edit(request, post_id, author_id):
+    if str(request.user.pk) != str(author_id):
+        return ''
+    return format_html(
+        '<a class="btn btn-primary" href="{}">Редактировать запись</a>',
+        reverse('posts:post_edit', args=[post_id]),
+    )
+
+
+@holes.register('comment_form')
+def comment_form(request, post_id):
+    if not request.user.is_authenticated:
+        return ''
+    return render_to_string(
+        'includes/comment_form.html',
+        {'form': CommentForm(), 'post_id': post_id},
+        request=request,
+    )
+
+
+@holes.register('author_posts_count')
+def author_posts_count(request, author_id):
+    return counters.posts_count(author_id)
@@ -0,0 +1,116 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmarks
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку, число запросов и пропускную способность view '
+        'постов и сравнивает с базовым замером.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом.'
+        )
+        parser.add_argument(
+            '--views', nargs='*',
+            help='Замерять только эти сценарии.'
+        )
+        parser.add_argument('--output', help='Сохранить результат в JSON.')
+        parser.add_argument('--baseline', help='JSON базового замера.')
+        parser.add_argument('--tolerance', type=float, default=0.2)
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Завершиться ошибкой при регрессии.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, metavar='CLIENTS',
+            help='Сравнить WSGI и ASGI при стольких параллельных клиентах.'
+        )
+        parser.add_argument(
+            '--hydration', action='store_true',
+            help='Сравнить сборку страницы ленты в модели и в карточки.'
+        )
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument(
+            '--latency', type=float, default=50,
+            help='Задержка каждой выборки сводки автора, мс.'
+        )
+        parser.add_argument(
+            '--client-delay', type=float, default=50,
+            help='Время передачи запроса медленным клиентом, мс.'
+        )
+
+    def handle(self, *args, **options):
+        if not Post.objects.exists():
+            raise CommandError('База пуста: сначала выполните seed_data.')
+        if options['concurrency']:
+            return self.handle_concurrency(options)
+        if options['hydration']:
+            return self.handle_hydration(options)
+        results = benchmarks.run(
+            requests=options['requests'],
+            warmup=options['warmup'],
+            cold=options['cold'],
+            names=options['views'],
+        )
+        for name, result in results['views'].items():
+            self.stdout.write(
+                f'{name:18} p50={result["p50_ms"]:>8} '
+                f'p95={result["p95_ms"]:>8} p99={result["p99_ms"]:>8} мс  '
+                f'{result["rps"]} rps  {result["queries"]} запр.'
+            )
+        self.save(results, options)
+        if options['baseline']:
+            self.check_baseline(results, options)
+
+    def handle_concurrency(self, options):
+        results = benchmarks.concurrency(
+            requests=options['requests'],
+            clients=options['concurrency'],
+            workers=options['workers'],
+            latency=options['latency'] / 1000,
+            client_delay=options['client_delay'] / 1000,
+            names=options['views'],
+        )
+        for name, servers in results['views'].items():
+            for server, result in servers.items():
+                self.stdout.write(
+                    f'{name:18} {server}  p95={result["p95_ms"]:>8} мс  '
+                    f'{result["rps"]} rps  ошибок {result["errors"]}'
+                )
+        self.save(results, options)
+
+    def handle_hydration(self, options):
+        results = benchmarks.hydration(repeat=options['requests'])
+        for name, result in results['hydration'].items():
+            self.stdout.write(
+                f'{name:8} {result["us_per_page"]:>10} мкс  '
+                f'{result["bytes_per_page"]:>10} байт на страницу'
+            )
+        self.save(results, options)
+
+    def save(self, results, options):
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(results, stream, ensure_ascii=False, indent=2)
+
+    def check_baseline(self, results, options):
+        with open(options['baseline'], encoding='utf-8') as stream:
+            baseline = json.load(stream)
+        regressions = benchmarks.compare(
+            results, baseline, options['tolerance']
+        )
+        for line in regressions:
+            self.stdout.write(self.style.WARNING(line))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
+        elif options['fail_on_regression']:
+            raise CommandError(f'Регрессий: {len(regressions)}')
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает рекомендации «на кого подписаться» по графу подписок: '
+        'для всех пользователей или только из очереди изменений.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Пересчитать только пользователей, сменивших подписки.'
+        )
+        parser.add_argument('--top', type=int, help='Сколько хранить.')
+        parser.add_argument(
+            '--sample', type=int,
+            help='Сколько последних подписчиков автора учитывать.'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        compute = (
+            suggestions.refresh_queued if options['incremental']
+            else suggestions.compute
+        )
+        users = compute(top=options['top'], sample=options['sample'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекомендации пересчитаны для {users} польз. '
+            f'за {time.perf_counter() - start:.1f} с'
+        ))
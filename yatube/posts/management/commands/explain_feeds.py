@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import explain
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет через EXPLAIN QUERY PLAN, что запросы лент идут по '
+        'индексам без полного сканирования и временной сортировки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Печатать планы всех запросов, а не только плохих.'
+        )
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, run in explain.feed_queries().items():
+            plan = explain.plan(run)
+            bad = explain.problems(plan)
+            if bad:
+                status = self.style.ERROR('плохой план')
+                failed.append(name)
+            else:
+                status = self.style.SUCCESS('ok')
+            self.stdout.write(f'{name}: {status}')
+            if bad or options['verbose_plans']:
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+        if failed:
+            raise CommandError(
+                'Запросы без подходящего индекса: ' + ', '.join(failed)
+            )
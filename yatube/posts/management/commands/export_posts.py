@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Выгружает группы, посты, комментарии и подписки в каталог.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог для файлов дампа.')
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default=transfer.NDJSON
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        totals = transfer.export(
+            options['directory'],
+            data_format=options['format'],
+            chunk_size=options['chunk_size'],
+        )
+        for name, total in totals.items():
+            self.stdout.write(f'{name}: {total}')
+        self.stdout.write(self.style.SUCCESS('Выгрузка завершена.'))
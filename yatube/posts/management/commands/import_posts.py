@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает дамп export_posts пачками; --resume продолжает '
+        'прерванную загрузку с контрольной точки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог с файлами дампа.')
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default=transfer.NDJSON
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--resume', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        importer = transfer.Importer(
+            options['directory'],
+            data_format=options['format'],
+            batch_size=options['batch_size'],
+            resume=options['resume'],
+        )
+        try:
+            totals = importer.run()
+        except transfer.ImportConflict as error:
+            raise CommandError(f'Загрузка остановлена: {error}.')
+        for name, total in totals.items():
+            self.stdout.write(f'{name}: {total}')
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена.'))
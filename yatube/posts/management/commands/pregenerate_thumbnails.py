@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры картинок постов, которых ещё нет в кеше.'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only('id', 'image')
+        scheduled = 0
+        for post in posts.iterator():
+            if not thumbnails.lookup(post):
+                thumbnails.schedule(post)
+                scheduled += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Отправлено в генерацию: {scheduled}')
+        )
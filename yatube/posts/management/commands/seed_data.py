@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу данными для замеров: авторы, комментарии и '
+        'подписки распределены по степенному закону.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок пользователя.'
+        )
+        parser.add_argument(
+            '--images', type=int, default=5,
+            help='Сколько разных картинок создать.'
+        )
+        parser.add_argument(
+            '--image-share', type=float, default=0.2,
+            help='Доля постов с картинкой.'
+        )
+        parser.add_argument(
+            '--exponent', type=float, default=1.2,
+            help='Показатель закона Ципфа для популярности.'
+        )
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        totals = benchmarks.seed(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            images=options['images'],
+            image_share=options['image_share'],
+            exponent=options['exponent'],
+            random_seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        for name, total in totals.items():
+            self.stdout.write(f'{name}: {total}')
+        self.stdout.write(self.style.SUCCESS('База наполнена.'))
@@ -0,0 +1,44 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики DATABASE_REPLICAS. С '
+        '--interval повторяет копирование, имитируя реплику с отставанием.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Копировать раз в столько секунд; 0 — один раз.'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('DATABASE_REPLICAS пуст.')
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != 'sqlite':
+            raise CommandError(
+                'Команда нужна только для локальных реплик SQLite; '
+                'настоящие реплики догоняет сама СУБД.'
+            )
+        while True:
+            self.copy(source)
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def copy(self, source):
+        source.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+            try:
+                source.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: {time.strftime("%X")}')
@@ -0,0 +1,62 @@
+# Generated by Django 2.2.16 on 2026-10-18 01:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    stats = {}
+    groupings = (
+        ('posts_count', Post.objects.values_list('author_id')),
+        ('followers_count', Follow.objects.values_list('author_id')),
+        ('following_count', Follow.objects.values_list('user_id')),
+    )
+    for field, queryset in groupings:
+        rows = queryset.annotate(total=Count('id')).order_by()
+        for user_id, total in rows:
+            stats.setdefault(user_id, {})[field] = total
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=user_id, **fields)
+         for user_id, fields in stats.items()],
+        batch_size=500,
+    )
+    comments = Comment.objects.filter(post=OuterRef('pk')).order_by(
+    ).values('post').annotate(total=Count('id')).values('total')
+    Post.objects.update(comments_count=Coalesce(Subquery(comments), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0014_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'Счётчики пользователя',
+                'verbose_name_plural': 'Счётчики пользователей',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_suggestions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostThumbnails',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='thumbnails', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('image', models.CharField(max_length=100, verbose_name='Картинка')),
+                ('image_sets', models.TextField(verbose_name='Наборы вариантов (JSON)')),
+            ],
+            options={
+                'verbose_name': 'Миниатюры поста',
+                'verbose_name_plural': 'Миниатюры постов',
+            },
+        ),
+    ]
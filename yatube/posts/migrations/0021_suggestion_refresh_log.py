@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+def copy_queue(apps, schema_editor):
+    Old = apps.get_model('posts', 'OldSuggestionRefresh')
+    New = apps.get_model('posts', 'SuggestionRefresh')
+    New.objects.bulk_create(
+        New(user_id=user_id)
+        for user_id in Old.objects.values_list('user_id', flat=True)
+    )
+
+
+def copy_queue_back(apps, schema_editor):
+    Old = apps.get_model('posts', 'OldSuggestionRefresh')
+    New = apps.get_model('posts', 'SuggestionRefresh')
+    Old.objects.bulk_create(
+        Old(user_id=user_id)
+        for user_id in New.objects.values_list(
+            'user_id', flat=True
+        ).distinct()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_feed_entry_order'),
+    ]
+
+    operations = [
+        migrations.RenameModel('SuggestionRefresh', 'OldSuggestionRefresh'),
+        migrations.CreateModel(
+            name='SuggestionRefresh',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.IntegerField(db_index=True, verbose_name='id пользователя')),
+            ],
+            options={
+                'verbose_name': 'Пересчёт рекомендаций',
+                'verbose_name_plural': 'Пересчёт рекомендаций',
+            },
+        ),
+        migrations.RunPython(copy_queue, copy_queue_back),
+        migrations.DeleteModel('OldSuggestionRefresh'),
+    ]
@@ -61,14 +61,49 @@ class Post(models.Model):
         blank=True
     )
 
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев'
+    )
+
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Порядок лент — (-pub_date, -id), см. posts.utils.CursorPaginator.
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, update_fields=None, **kwargs):
+        # Счётчик меняют только UPDATE с F() (posts.counters): сохранение
+        # прочитанного раньше экземпляра не должно вернуть старое значение.
+        if not self._state.adding:
+            if update_fields is None:
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key
+                ]
+            update_fields = [
+                name for name in update_fields if name != 'comments_count'
+            ]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -93,6 +128,12 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
     def _str_(self) -> str:
         return self.text[:15]
@@ -127,3 +168,149 @@ class Follow(models.Model):
                 name='user_cannot_follow_yourself'
             )
         ]
+        # (user, author) покрывает уникальное ограничение выше.
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Счётчики пользователя, обновляемые вместе с записями."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок'
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+
+class FeedEntry(models.Model):
+    """Материализованная запись ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_user_author_idx'
+            ),
+        ]
+
+
+class Suggestion(models.Model):
+    """Предрасчитанная рекомендация «на кого подписаться»."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+        verbose_name='Пользователь'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    score = models.FloatField(verbose_name='Оценка')
+
+    class Meta:
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_suggestion'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score'],
+                name='suggestion_user_score_idx'
+            ),
+        ]
+
+
+class SuggestionRefresh(models.Model):
+    """Очередь пользователей, чьи рекомендации устарели.
+
+    Каждая постановка — новая строка: расчёт удаляет только строки,
+    прочитанные до него, и подписка во время расчёта не теряется.
+    """
+    # Не внешний ключ: подписки удаляются каскадом вместе с
+    # пользователем и успевают поставить его в очередь.
+    user_id = models.IntegerField(
+        db_index=True,
+        verbose_name='id пользователя'
+    )
+
+    class Meta:
+        verbose_name = 'Пересчёт рекомендаций'
+        verbose_name_plural = 'Пересчёт рекомендаций'
+
+
+class PostThumbnails(models.Model):
+    """Готовые варианты картинки поста (posts.thumbnails)."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='thumbnails',
+        verbose_name='Пост'
+    )
+    # Наборы относятся к этой картинке: после замены они устаревают.
+    image = models.CharField(max_length=100, verbose_name='Картинка')
+    image_sets = models.TextField(verbose_name='Наборы вариантов (JSON)')
+
+    class Meta:
+        verbose_name = 'Миниатюры поста'
+        verbose_name_plural = 'Миниатюры постов'
@@ -0,0 +1,122 @@
+"""Полнотекстовый поиск по постам с подключаемым бэкендом.
+
+Бэкенд задаётся настройкой SEARCH_BACKEND. SQLiteFTSBackend держит
+инвертированный индекс в виртуальной таблице FTS5 и ранжирует
+результаты по bm25; SimpleSearchBackend — запасной вариант для других
+СУБД без индекса.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def get_backend():
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+class SearchBackend:
+    def index(self, post):
+        """Добавляет или обновляет пост в индексе."""
+
+    def remove(self, post_id):
+        """Убирает пост из индекса."""
+
+    def rebuild(self, chunk_size=1000):
+        """Строит индекс заново, возвращает число постов."""
+        return 0
+
+    def matches(self, query):
+        raise NotImplementedError
+
+    def search(self, query, group=None, author=None):
+        """Посты, подходящие под запрос, лучшие сверху."""
+        posts = self.matches(query)
+        if group is not None:
+            posts = posts.filter(group=group)
+        if author is not None:
+            posts = posts.filter(author=author)
+        return posts.select_related('author', 'group')
+
+    def ids(self, query, limit, group=None, author=None):
+        """id не более limit лучших постов одним запросом, без COUNT."""
+        return list(self.search(query, group, author).values_list(
+            'id', flat=True
+        )[:limit])
+
+
+class SimpleSearchBackend(SearchBackend):
+    """Поиск подстроки без индекса."""
+
+    def matches(self, query):
+        return Post.objects.filter(text__icontains=query)
+
+
+class SQLiteFTSBackend(SearchBackend):
+    table = 'posts_post_fts'
+
+    def match_expression(self, query):
+        # Каждое слово — отдельная фраза с поиском по префиксу, чтобы
+        # пользовательский ввод не ломал синтаксис MATCH.
+        return ' '.join(f'"{token}"*' for token in TOKEN_RE.findall(query))
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [post.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {self.table}(rowid, text) VALUES (%s, %s)',
+                [post.pk, post.text],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [post_id]
+            )
+
+    def rebuild(self, chunk_size=1000):
+        total = 0
+        rows = Post.objects.order_by().values_list('id', 'text').iterator(
+            chunk_size=chunk_size
+        )
+        # Поиск не должен видеть пустой или наполовину заполненный индекс.
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunk_size:
+                    total += self._insert(cursor, batch)
+                    batch = []
+            total += self._insert(cursor, batch)
+        return total
+
+    def _insert(self, cursor, rows):
+        if rows:
+            cursor.executemany(
+                f'INSERT INTO {self.table}(rowid, text) VALUES (%s, %s)',
+                rows,
+            )
+        return len(rows)
+
+    def matches(self, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return Post.objects.none()
+        return Post.objects.extra(
+            tables=[self.table],
+            where=[
+                f'{self.table}.rowid = posts_post.id',
+                f'{self.table} MATCH %s',
+            ],
+            params=[expression],
+            select={'rank': f'bm25({self.table})'},
+            order_by=['rank'],
+        )
@@ -0,0 +1,161 @@
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.db import transaction
+from django.dispatch import receiver
+
+from . import (
+    cache, counters, feed, search, suggestions, thumbnails, timeline
+)
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=User)
+def create_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.create(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change(instance.author_id, counters.POSTS, 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.change(instance.author_id, counters.POSTS, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change(instance.author_id, counters.FOLLOWERS, 1)
+        counters.change(instance.user_id, counters.FOLLOWING, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.change(instance.author_id, counters.FOLLOWERS, -1)
+    counters.change(instance.user_id, counters.FOLLOWING, -1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    timeline.trim(instance.user_id, instance.author_id)
+    timeline.unfollowed(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.get_backend().index(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.get_backend().remove(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._old_group_id, instance._old_image = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'image').first() or (None, None)
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnails(sender, instance, raw=False, **kwargs):
+    image = instance.image
+    if raw or not image or image.name == getattr(
+        instance, '_old_image', None
+    ):
+        return
+    transaction.on_commit(lambda: thumbnails.schedule(instance))
+
+
+@receiver(pre_delete, sender=Post)
+def remember_deleted_post_group(sender, instance, **kwargs):
+    instance._old_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        feed.forget('post', instance.pk)
+        cache.bump(*cache.post_scopes(instance))
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post_pages(sender, instance, **kwargs):
+    feed.forget('post', instance.pk)
+    cache.bump(*cache.post_scopes(instance))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # Счётчик комментариев поста хранится в кеше объектов.
+        feed.forget('post', instance.post_id)
+        cache.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        feed.forget('group', instance.pk)
+        cache.bump(cache.GLOBAL)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        username = User.objects.filter(
+            pk=instance.author_id
+        ).values_list('username', flat=True).first()
+        cache.bump(f'profile:{username}', f'follow:{instance.user_id}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def queue_suggestions(sender, instance, raw=False, **kwargs):
+    if not raw:
+        suggestions.enqueue(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_pages(sender, instance, created, raw=False,
+                          update_fields=None, **kwargs):
+    # Новый пользователь ещё не виден на страницах, а вход обновляет
+    # только last_login.
+    if raw or created or update_fields == frozenset({'last_login'}):
+        return
+    feed.forget('user', instance.pk)
+    cache.bump(cache.GLOBAL)
@@ -0,0 +1,228 @@
+"""Ленты для агрегаторов: RSS 2.0, Atom и JSON Feed.
+
+Лента строится одним запросом постов вместе с авторами и группами по
+индексу (…, -pub_date, -id) и отдаётся потоком: документ собирается по
+мере перебора постов. Одновременно байты копятся и после последнего
+элемента кладутся в кеш под ключом с версиями областей ленты (как
+страницы в posts.cache), так что опрос неизменившейся ленты обходится
+без запросов к БД, а клиенту с актуальным ETag отвечаем 304.
+"""
+import hashlib
+import json
+from itertools import chain
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+from django.utils.text import Truncator
+
+from core.metrics import record_cache
+from core.routers import primary_reads
+
+from .cache import (
+    GLOBAL,
+    add_validators,
+    get_state,
+    not_modified,
+    page_etag,
+)
+from .models import Group, User
+
+CONTENT_TYPES = {
+    'rss': 'application/rss+xml; charset=utf-8',
+    'atom': 'application/atom+xml; charset=utf-8',
+    'json': 'application/feed+json; charset=utf-8',
+}
+
+
+class Feed:
+    """Заголовок ленты и адреса для ссылок."""
+
+    def __init__(self, request, title, link):
+        self.request = request
+        self.title = title
+        self.link = request.build_absolute_uri(link)
+        self.url = request.build_absolute_uri(request.path)
+
+    def post_url(self, post):
+        return self.request.build_absolute_uri(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+
+
+def post_title(post):
+    return Truncator(post.text.splitlines()[0] if post.text else '').chars(
+        80
+    )
+
+
+def author_name(post):
+    return post.author.get_full_name() or post.author.username
+
+
+def rss(feed, posts):
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<rss version="2.0" '
+        'xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>'
+        f'<title>{escape(feed.title)}</title>'
+        f'<link>{escape(feed.link)}</link>'
+        f'<description>{escape(feed.title)}</description>'
+        '<language>ru</language>'
+    )
+    for post in posts:
+        url = escape(feed.post_url(post))
+        category = (f'<category>{escape(post.group.title)}</category>'
+                    if post.group_id else '')
+        yield (
+            f'<item><title>{escape(post_title(post))}</title>'
+            f'<link>{url}</link><guid>{url}</guid>'
+            f'<pubDate>{rfc2822_date(post.pub_date)}</pubDate>'
+            f'<dc:creator>{escape(author_name(post))}</dc:creator>'
+            f'{category}'
+            f'<description>{escape(post.text)}</description></item>'
+        )
+    yield '</channel></rss>\n'
+
+
+def atom(feed, posts):
+    # Дата ленты — дата первого (самого свежего) поста.
+    posts = iter(posts)
+    first = next(posts, None)
+    updated = first.pub_date if first else None
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="ru">'
+        f'<title>{escape(feed.title)}</title>'
+        f'<link href={quoteattr(feed.link)} rel="alternate"/>'
+        f'<link href={quoteattr(feed.url)} rel="self"/>'
+        f'<id>{escape(feed.url)}</id>'
+        + (f'<updated>{rfc3339_date(updated)}</updated>' if updated else '')
+    )
+    for post in chain([first] if first else [], posts):
+        url = feed.post_url(post)
+        category = (f'<category term={quoteattr(post.group.title)}/>'
+                    if post.group_id else '')
+        yield (
+            f'<entry><title>{escape(post_title(post))}</title>'
+            f'<link href={quoteattr(url)} rel="alternate"/>'
+            f'<id>{escape(url)}</id>'
+            f'<updated>{rfc3339_date(post.pub_date)}</updated>'
+            f'<author><name>{escape(author_name(post))}</name></author>'
+            f'{category}'
+            f'<content type="text">{escape(post.text)}</content></entry>'
+        )
+    yield '</feed>\n'
+
+
+def json_feed(feed, posts):
+    header = json.dumps({
+        'version': 'https://jsonfeed.org/version/1.1',
+        'title': feed.title,
+        'home_page_url': feed.link,
+        'feed_url': feed.url,
+        'language': 'ru',
+    }, ensure_ascii=False)
+    yield header[:-1] + ', "items": ['
+    for number, post in enumerate(posts):
+        item = {
+            'id': str(post.pk),
+            'url': feed.post_url(post),
+            'title': post_title(post),
+            'content_text': post.text,
+            'date_published': post.pub_date.isoformat(),
+            'authors': [{'name': author_name(post)}],
+        }
+        if post.group_id:
+            item['tags'] = [post.group.title]
+        yield (', ' if number else '') + json.dumps(item, ensure_ascii=False)
+    yield ']}\n'
+
+
+FORMATS = {'rss': rss, 'atom': atom, 'json': json_feed}
+
+
+def _cached(chunks, key):
+    """Отдаёт части потока и кеширует документ, если он дошёл до конца."""
+    parts = []
+    for chunk in chunks:
+        data = chunk.encode()
+        parts.append(data)
+        yield data
+    cache.set(key, b''.join(parts), settings.PAGE_CACHE_TIMEOUT)
+
+
+def feed_response(request, feed_format, scopes, queryset, describe):
+    """Ответ с лентой постов queryset в формате feed_format.
+
+    describe(request, первый пост или None) возвращает Feed или
+    выбрасывает Http404.
+    """
+    if feed_format not in FORMATS:
+        raise Http404('Неизвестный формат ленты')
+    versions, last_modified = get_state([GLOBAL, *scopes])
+    etag = page_etag(feed_format, request, versions)
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        key = 'syndication:{}:{}'.format(path, '.'.join(map(str, versions)))
+        content = cache.get(key)
+        record_cache(content is not None)
+        if content is not None:
+            response = HttpResponse(
+                content, content_type=CONTENT_TYPES[feed_format]
+            )
+        else:
+            # Строки читаются сразу, внутри блока.
+            with primary_reads(last_modified):
+                response = _stream(
+                    request, feed_format, queryset, describe, key
+                )
+    return add_validators(request, response, etag)
+
+
+def _stream(request, feed_format, queryset, describe, key):
+    # Все строки ленты читаются первой же порцией итератора, поэтому
+    # курсор не остаётся открытым, пока документ уходит клиенту.
+    posts = queryset.select_related('author', 'group').order_by(
+        '-pub_date', '-id'
+    )[:settings.SYNDICATION_ITEMS].iterator(
+        chunk_size=settings.SYNDICATION_ITEMS
+    )
+    first = next(posts, None)
+    feed = describe(request, first)
+    items = chain([first], posts) if first else []
+    return StreamingHttpResponse(
+        _cached(FORMATS[feed_format](feed, items), key),
+        content_type=CONTENT_TYPES[feed_format],
+    )
+
+
+def describe_index(request, first):
+    return Feed(request, 'Yatube: последние записи', reverse('posts:index'))
+
+
+def describe_group(slug):
+    def describe(request, first):
+        group = first.group if first else get_object_or_404(Group, slug=slug)
+        return Feed(
+            request, f'Yatube: {group.title}',
+            reverse('posts:group_list', args=[slug]),
+        )
+    return describe
+
+
+def describe_profile(username):
+    def describe(request, first):
+        author = first.author if first else get_object_or_404(
+            User, username=username
+        )
+        return Feed(
+            request, f'Yatube: {author.get_full_name() or username}',
+            reverse('posts:profile', args=[username]),
+        )
+    return describe
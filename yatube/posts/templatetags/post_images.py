@@ -0,0 +1,20 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_image(post, geometry):
+    """Набор вариантов картинки; пока его нет — исходная картинка."""
+    if not post.image:
+        return None
+    # Ленты загружают наборы всей страницы заранее (thumbnails.attach).
+    image_sets = getattr(post, 'image_sets', None)
+    if image_sets is None:
+        image_sets = thumbnails.lookup(post)
+    image_set = image_sets.get(geometry)
+    if image_set is None:
+        return {'src': post.image.url, 'sources': [], 'sizes': ''}
+    return image_set
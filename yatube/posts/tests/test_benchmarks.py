@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts import benchmarks
+from posts.models import Comment, Follow, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_data', users=15, groups=2, posts=40, comments=60,
+            follows=3, images=1, seed=1, stdout=StringIO(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_seed_data(self):
+        """seed_data создаёт посты, комментарии и подписки."""
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(Comment.objects.count(), 60)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(Post.objects.exclude(image='').exists())
+
+    def test_benchmark_writes_results(self):
+        """benchmark замеряет все сценарии и сохраняет JSON."""
+        output = os.path.join(TEMP_MEDIA_ROOT, 'results.json')
+        call_command(
+            'benchmark', requests=3, warmup=1, output=output,
+            stdout=StringIO(),
+        )
+        with open(output, encoding='utf-8') as stream:
+            results = json.load(stream)
+        expected = {
+            'index', 'group_posts', 'profile', 'post_detail',
+            'follow_index', 'post_create', 'post_edit', 'add_comment',
+            'profile_follow', 'profile_unfollow',
+            'api_posts', 'api_post_comments', 'api_follow_feed',
+        }
+        self.assertEqual(set(results['views']), expected)
+        for name, result in results['views'].items():
+            with self.subTest(view=name):
+                self.assertEqual(result['errors'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_compare_reports_regressions(self):
+        """Рост p95 сверх допуска и лишние запросы — регрессия."""
+        baseline = {'views': {'index': {'p95_ms': 10, 'queries': 4}}}
+        results = {'views': {'index': {'p95_ms': 11, 'queries': 4}}}
+        self.assertEqual(benchmarks.compare(results, baseline), [])
+        results['views']['index'] = {'p95_ms': 20, 'queries': 5}
+        self.assertEqual(len(benchmarks.compare(results, baseline)), 2)
+
+    def test_hydration_cards_allocate_less(self):
+        """Карточки ленты занимают меньше памяти, чем модели."""
+        results = benchmarks.hydration(repeat=2)['hydration']
+        self.assertLess(results['cards']['bytes_per_page'],
+                        results['models']['bytes_per_page'])
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from posts.decorators import QueryBudgetExceeded, query_budget
+from posts.models import Comment, Follow, Group, Post, User
+
+METRICS_MIDDLEWARE = (
+    ['core.middleware.RequestMetricsMiddleware'] + settings.MIDDLEWARE
+)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = mixer.blend(Group)
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.posts = mixer.cycle(15).blend(
+            Post, author=cls.author, group=cls.group, image=''
+        )
+        cls.post = cls.posts[-1]
+        mixer.cycle(5).blend(Comment, post=cls.post, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_read_views_fit_budget(self):
+        """Страницы чтения укладываются в объявленный бюджет запросов."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('posts:follow_index'),
+            reverse('posts:post_create'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_write_views_fit_budget(self):
+        """Записывающие view укладываются в объявленный бюджет запросов."""
+        username = self.author.username
+        self.client.get(reverse('posts:profile_unfollow', args=[username]))
+        self.client.get(reverse('posts:profile_follow', args=[username]))
+        self.client.post(
+            reverse('posts:add_comment', args=[self.post.id]),
+            {'text': 'Комментарий'},
+        )
+        self.author_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Новый пост', 'group': self.group.id},
+        )
+        self.author_client.post(
+            reverse('posts:post_edit', args=[self.post.id]),
+            {'text': 'Правка'},
+        )
+
+    def test_exceeding_budget_fails(self):
+        """Превышение бюджета в строгом режиме вызывает исключение."""
+        @query_budget(0)
+        def greedy_view(request):
+            return list(User.objects.all())
+
+        with self.assertRaises(QueryBudgetExceeded):
+            greedy_view(None)
+
+
+@override_settings(MIDDLEWARE=METRICS_MIDDLEWARE)
+class RequestMetricsTest(TestCase):
+    def test_server_timing_header(self):
+        """Middleware отдаёт метрики в Server-Timing и в лог."""
+        cache.clear()
+        with self.assertLogs('yatube.metrics', level='INFO') as logs:
+            response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for metric in ('db;', 'tpl;', 'cache;', 'total;'):
+            self.assertIn(metric, timing)
+        self.assertIn('"view": "index"', logs.output[0])
+        self.assertIn('"cache_misses": 1', logs.output[0])
+
+
+class StrictRunnerTest(SimpleTestCase):
+    def test_budgets_are_strict_in_tests(self):
+        """Весь прогон тестов идёт со строгими бюджетами запросов."""
+        self.assertTrue(settings.QUERY_BUDGET_STRICT)
@@ -1,9 +1,23 @@
-from django.core.cache import cache
-from django.test import Client, TestCase
+import time
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils.http import http_date
 from mixer.backend.django import mixer
 
-from posts.models import Post, User
+from core.cache import SEQUENCE_KEY
+from posts.models import Comment, Follow, Group, Post, User
+
+
+def rendered(response) -> bool:
+    """Страница собрана заново, а не взята из кеша.
+
+    Дырки core.holes рендерят свои фрагменты и на закешированной
+    странице, поэтому смотрим на шаблон самой страницы.
+    """
+    return 'base.html' in [template.name for template in response.templates]
 
 
 class TestCache(TestCase):
@@ -11,30 +25,293 @@ class TestCache(TestCase):
     def setUpClass(cls) -> None:
         super().setUpClass()
         cls.user = mixer.blend(User)
+        cls.group = mixer.blend(Group)
+        cls.post = mixer.blend(Post, author=cls.user, group=cls.group)
 
     def setUp(self) -> None:
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+        )
+
+    def test_pages_are_cached(self) -> None:
+        """Повторный запрос страницы отдаётся из кеша."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.authorized_client.get(url)
+                response = self.authorized_client.get(url)
+                self.assertFalse(rendered(response))
 
     def test_index_cache(self) -> None:
-        """Проверка доступности кеша index."""
-        new_post = mixer.blend(Post, author=self.user)
+        """Удалённый пост сразу пропадает из кеша index."""
+        new_post = mixer.blend(Post, author=self.user, text='Новый пост')
         response_before_deleting = self.authorized_client.get(
             reverse('posts:index'),
         )
+        self.assertContains(response_before_deleting, new_post.text)
         new_post.delete()
         response_after_deleting = self.authorized_client.get(
             reverse('posts:index'),
         )
-        self.assertEqual(
-            response_before_deleting.content,
-            response_after_deleting.content,
+        self.assertNotContains(response_after_deleting, new_post.text)
+
+    def test_writes_invalidate_pages(self) -> None:
+        """Изменения моделей сразу видны на закешированных страницах."""
+        for url in self.urls:
+            self.authorized_client.get(url)
+        self.post.text = 'Отредактированный текст'
+        self.post.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.authorized_client.get(url), self.post.text
+                )
+        mixer.blend(Comment, post=self.post, text='Свежий комментарий')
+        self.assertContains(
+            self.authorized_client.get(self.urls[-1]), 'Свежий комментарий'
+        )
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertContains(
+            self.authorized_client.get(self.urls[0]), 'Новое название'
         )
+
+
+class TestPerUserCache(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+        cls.author = User.objects.create_user(username='author')
+        cls.stranger = User.objects.create_user(username='stranger')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(author=cls.author, text='Первый')
+        cls.follow_url = reverse('posts:follow_index')
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def assertCached(self, client, url, cached=True) -> None:
+        response = client.get(url)
+        self.assertEqual(rendered(response), not cached)
+        return response
+
+    def test_follow_page_is_per_user(self) -> None:
+        """Лента подписок кешируется отдельно для каждого пользователя."""
+        other_client = Client()
+        other_client.force_login(self.other)
+        self.assertCached(self.reader_client, self.follow_url, False)
+        self.assertCached(self.reader_client, self.follow_url)
+        response = self.assertCached(other_client, self.follow_url, False)
+        self.assertNotContains(response, self.post.text)
+
+    def test_follow_page_invalidation_is_precise(self) -> None:
+        """Ленту сбрасывают только посты и подписки, которые в ней видны."""
+        self.reader_client.get(self.follow_url)
+        Post.objects.create(author=self.stranger, text='Чужой пост')
+        self.assertCached(self.reader_client, self.follow_url)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.assertCached(
+            self.reader_client, self.follow_url, False
+        )
+        self.assertContains(response, 'Новый пост')
+        Follow.objects.create(user=self.reader, author=self.stranger)
+        response = self.assertCached(
+            self.reader_client, self.follow_url, False
+        )
+        self.assertContains(response, 'Чужой пост')
+
+    def test_post_bumps_follower_feeds_at_once(self) -> None:
+        """Ленты всех подписчиков сбрасываются одной записью журнала."""
+        for number in range(5):
+            follower = User.objects.create_user(username=f'follower{number}')
+            Follow.objects.create(user=follower, author=self.author)
+        sequence = caches['shared'].get(SEQUENCE_KEY)
+        Post.objects.create(author=self.author, text='Всем подписчикам')
+        # Кеш объекта поста, области его страниц и счётчик постов автора.
+        self.assertEqual(caches['shared'].get(SEQUENCE_KEY), sequence + 3)
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_celebrity_posts_invalidate_follow_page(self) -> None:
+        """Посты знаменитостей из ленты при чтении тоже сбрасывают её."""
+        self.reader_client.get(self.follow_url)
+        Post.objects.create(author=self.author, text='Пост знаменитости')
+        response = self.assertCached(
+            self.reader_client, self.follow_url, False
+        )
+        self.assertContains(response, 'Пост знаменитости')
+
+    def test_anonymous_profile_is_shared(self) -> None:
+        """Анонимы делят одну копию профиля независимо от cookie."""
+        url = reverse('posts:profile', args=[self.author.username])
+        self.assertCached(Client(), url, False)
+        self.assertCached(Client(), url)
+
+    def test_csrf_token_is_punched(self) -> None:
+        """В кеше лежит дырка, а каждый ответ получает свой CSRF-токен."""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        for cached in (False, True):
+            response = self.assertCached(self.reader_client, url, cached)
+            self.assertNotContains(response, '<!--hole:')
+            self.assertContains(
+                response,
+                'name="csrfmiddlewaretoken" value="',
+            )
+
+    def test_session_fragments_are_punched(self) -> None:
+        """Общая копия страницы поста заполняется для каждого зрителя."""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        edit_url = reverse('posts:post_edit', args=[self.post.id])
+        author_client = Client()
+        author_client.force_login(self.author)
+        response = self.assertCached(author_client, url, False)
+        self.assertContains(response, edit_url)
+        self.assertContains(response, 'Пользователь: author')
+        response = self.assertCached(self.reader_client, url)
+        self.assertNotContains(response, edit_url)
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertContains(response, 'Добавить комментарий')
+        response = self.assertCached(Client(), url)
+        self.assertNotContains(response, 'Пользователь:')
+        self.assertNotContains(response, 'Добавить комментарий')
+        self.assertContains(response, reverse('users:login'))
+        self.assertNotContains(response, '<!--hole:')
+
+    def test_nonce_is_not_sent(self) -> None:
+        """nonce меток хранится с копией, но клиенту не уходит."""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        for cached in (False, True):
+            response = self.assertCached(self.reader_client, url, cached)
+            self.assertFalse(response.has_header('X-Hole-Nonce'))
+
+
+class TestConditionalGet(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = mixer.blend(User)
+        cls.group = mixer.blend(Group)
+        cls.post = mixer.blend(Post, author=cls.user, group=cls.group)
+
+    def setUp(self) -> None:
         cache.clear()
-        response_after_cleaning_cahe = self.authorized_client.get(
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.urls = (
             reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('posts:follow_index'),
         )
-        self.assertNotEqual(
-            response_after_deleting.content,
-            response_after_cleaning_cahe.content,
+
+    def test_unchanged_page_is_not_modified(self) -> None:
+        """Страница с тем же ETag отдаётся как 304 без рендера."""
+        # Личным страницам нужен пользователь: сессия и сам пользователь.
+        queries = {reverse('posts:profile', args=[self.user.username]): 2,
+                   reverse('posts:follow_index'): 2}
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(queries.get(url, 0)):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_changes_change_etag(self) -> None:
+        """После изменения поста старый ETag не подходит."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        mixer.blend(Follow, user=self.user, author=mixer.blend(User))
+        self.post.text = 'Новый текст'
+        self.post.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_viewer(self) -> None:
+        """Гость не получает 304 по ETag авторизованного пользователя."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        response = Client().get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_pages_have_no_last_modified(self) -> None:
+        """Дата изменения не подтверждает копию другого зрителя."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        later = time.time() + 5
+        with mock.patch('posts.cache.time.time', return_value=later):
+            authenticated = self.client.get(url)
+            self.assertNotIn('Last-Modified', authenticated)
+            # Копия вошедшего пользователя после выхода.
+            response = Client().get(
+                url, HTTP_IF_MODIFIED_SINCE=http_date(later)
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        self.assertNotContains(response, 'Пользователь:')
+
+    def test_feed_last_modified(self) -> None:
+        """Лента отдаёт Last-Modified, когда изменение старше секунды."""
+        url = reverse('posts:index_feed', args=['rss'])
+        self.assertNotIn('Last-Modified', Client().get(url))
+        later = time.time() + 5
+        with mock.patch('posts.cache.time.time', return_value=later):
+            response = Client().get(url)
+            self.assertIn('Last-Modified', response)
+            response = Client().get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            )
+        self.assertEqual(response.status_code, 304)
+
+
+class TestViewerIsolation(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.alice = User.objects.create_user(username='alice_author')
+        cls.bob = User.objects.create_user(username='bob_reader')
+        cls.group = mixer.blend(Group)
+        cls.post = Post.objects.create(
+            author=cls.alice, group=cls.group, text='Пост Алисы'
         )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.alice_client = Client()
+        self.alice_client.force_login(self.alice)
+        self.bob_client = Client()
+        self.bob_client.force_login(self.bob)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:post_detail', args=[self.post.id]),
+        )
+
+    def test_page_rendered_for_one_user_is_not_served_to_others(self):
+        """Чужие имя, ссылка выхода и кнопка автора не попадают в кеш."""
+        edit_url = reverse('posts:post_edit', args=[self.post.id])
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.alice_client.get(url)
+                self.assertContains(response, 'Пользователь: alice_author')
+                for client in (Client(), self.bob_client):
+                    response = client.get(url)
+                    self.assertNotContains(response, 'alice_author</a>')
+                    self.assertNotContains(response, edit_url)
+                anonymous = Client().get(url)
+                self.assertNotContains(anonymous, reverse('users:logout'))
+                self.assertNotContains(anonymous, 'Добавить комментарий')
+                self.assertContains(
+                    self.bob_client.get(url), 'Пользователь: bob_reader'
+                )
@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='talker')
+        cls.post = Post.objects.create(author=cls.user, text='Обсуждаемый')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(12)
+        )
+        cls.newest = list(
+            cls.post.comments.order_by('-created', '-id').values_list(
+                'text', flat=True
+            )
+        )
+        cls.detail_url = reverse('posts:post_detail', args=[cls.post.id])
+        cls.comments_url = reverse('posts:post_comments', args=[cls.post.id])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_detail_shows_newest_page(self):
+        """Страница поста показывает только свежую порцию комментариев."""
+        response = self.client.get(self.detail_url)
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments], self.newest[:5]
+        )
+        self.assertContains(response, comments.next_cursor)
+
+    def test_fragment_continues_from_cursor(self):
+        """Фрагмент продолжает список с места курсора без пропусков."""
+        texts = []
+        cursor = ''
+        while cursor is not None:
+            response = self.client.get(self.comments_url, {'cursor': cursor})
+            self.assertTemplateUsed(response, 'includes/comments.html')
+            comments = response.context['comments']
+            texts.extend(comment.text for comment in comments)
+            cursor = comments.next_cursor
+        self.assertEqual(texts, self.newest)
+
+    def test_json_format(self):
+        """?format=json отдаёт порцию и курсор следующей."""
+        response = self.client.get(self.comments_url, {'format': 'json'})
+        data = response.json()
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            self.newest[:5],
+        )
+        self.assertIsNotNone(data['next_cursor'])
+
+    def test_json_keeps_hole_markers_as_text(self):
+        """Метки дырок в тексте комментария в JSON не заполняются."""
+        texts = ['<!--hole:nope-->', '<!--hole:user_nav-->']
+        for text in texts:
+            Comment.objects.create(post=self.post, author=self.user, text=text)
+        client = Client()
+        client.force_login(self.user)
+        for _ in range(2):
+            response = client.get(self.comments_url, {'format': 'json'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                [comment['text'] for comment in response.json()['comments']
+                 if comment['text'].startswith('<!--')],
+                texts[::-1],
+            )
+
+    def test_fragment_queries_are_bounded(self):
+        """Число запросов не зависит от числа комментариев."""
+        with self.assertNumQueries(2):
+            self.client.get(self.comments_url)
+
+    def test_missing_post(self):
+        """Комментарии несуществующего поста — 404."""
+        url = reverse('posts:post_comments', args=[self.post.id + 100])
+        self.assertEqual(self.client.get(url).status_code, 404)
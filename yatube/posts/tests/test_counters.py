@@ -0,0 +1,101 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import AuthorStats, Comment, Post, User
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='counted')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_views_update_counters(self):
+        """Создание поста, комментария и подписки меняют счётчики."""
+        self.client.post(reverse('posts:post_create'), {'text': 'Ещё пост'})
+        self.client.post(
+            reverse('posts:add_comment', args=[self.post.id]),
+            {'text': 'Комментарий'},
+        )
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.stats(self.reader).posts_count, 1)
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_rebuild_counters(self):
+        """Команда rebuild_counters восстанавливает счётчики."""
+        Comment.objects.create(post=self.post, author=self.reader, text='К')
+        AuthorStats.objects.all().delete()
+        Post.objects.update(comments_count=0)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_save_keeps_comments_count(self):
+        """Сохранение старого экземпляра не затирает счётчик комментариев."""
+        stale = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(post=self.post, author=self.reader, text='К')
+        stale.text = 'Новый текст'
+        stale.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, 'Новый текст')
+        self.assertEqual(self.post.comments_count, 1)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, 'Всего постов')
+        return [
+            query['sql'] for query in queries.captured_queries
+            if 'COUNT(' in query['sql']
+        ]
+
+    def test_pages_render_without_count_queries(self):
+        """Профиль и пост отображаются без агрегирующих запросов."""
+        self.assertEqual(
+            self.count_queries(
+                reverse('posts:post_detail', args=[self.post.id])
+            ),
+            [],
+        )
+        # Число постов для пагинатора берётся из кешированного списка id.
+        self.assertEqual(
+            self.count_queries(
+                reverse('posts:profile', args=[self.author.username])
+            ),
+            [],
+        )
+
+    def test_cached_post_page_shows_current_posts_count(self):
+        """Новый пост автора меняет счётчик на уже закешированной
+        странице его старого поста."""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        self.assertContains(self.client.get(url), '<span>1</span>')
+        Post.objects.create(author=self.author, text='Второй пост')
+        self.assertContains(self.client.get(url), '<span>2</span>')
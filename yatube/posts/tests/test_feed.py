@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+
+from posts import feed
+from posts.cache import GLOBAL, INDEX, bump
+from posts.models import Group, Post, User
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='writer', first_name='Иван'
+        )
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        for number in range(12):
+            Post.objects.create(
+                author=cls.author, text=f'Пост {number}',
+                group=cls.group if number % 2 else None,
+            )
+        cls.ids = list(Post.objects.values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hydrate_keeps_order_and_relations(self):
+        """Посты собираются в порядке id с авторами и группами."""
+        posts = feed.hydrate(self.ids)
+        self.assertEqual([post.id for post in posts], self.ids)
+        self.assertEqual(posts[0].author.get_full_name(), 'Иван')
+        grouped = [post for post in posts if post.group_id]
+        self.assertEqual(grouped[0].group.slug, 'group')
+
+    def test_cold_hydrate_is_one_query(self):
+        """Промахи по постам читаются одним запросом с авторами и группами."""
+        with self.assertNumQueries(1):
+            feed.hydrate(self.ids)
+
+    def test_objects_are_shared_between_feeds(self):
+        """Пост, уже загруженный одной лентой, другая берёт из кеша."""
+        feed.hydrate(self.ids)
+        group_ids = list(self.group.posts.values_list('id', flat=True))
+        with self.assertNumQueries(0):
+            feed.hydrate(group_ids)
+
+    def test_changes_are_visible(self):
+        """Правка поста и переименование автора сбрасывают кеш объектов."""
+        feed.hydrate(self.ids)
+        post = Post.objects.get(pk=self.ids[0])
+        post.text = 'Исправленный текст'
+        post.save()
+        self.author.first_name = 'Пётр'
+        self.author.save()
+        hydrated = feed.hydrate(self.ids)[0]
+        self.assertEqual(hydrated.text, 'Исправленный текст')
+        self.assertEqual(hydrated.author.first_name, 'Пётр')
+
+    @override_settings(FEED_IDS_LIMIT=5, PAGINATION=4)
+    def test_pages_beyond_cached_ids(self):
+        """Страницы за пределами кешированного списка читаются из БД."""
+        request = RequestFactory().get('/', {'page': 3})
+        page = feed.paginate(request, [INDEX], Post.objects.all())
+        self.assertEqual(page.paginator.count, 12)
+        self.assertEqual([post.id for post in page], self.ids[8:12])
+
+    def test_global_bump_resets_ids(self):
+        """Общий сброс обновляет и список id, а не только страницы."""
+        posts = feed.QueryFeed(Post.objects.all())
+        self.assertEqual(len(feed.feed_ids([INDEX], posts)), 12)
+        # Запись мимо сигналов, как при загрузке дампа.
+        Post.objects.bulk_create([Post(author=self.author, text='Новый')])
+        bump(GLOBAL)
+        self.assertEqual(len(feed.feed_ids([INDEX], posts)), 13)
@@ -0,0 +1,97 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import follows
+from posts.models import AuthorStats, Follow, Post, FeedEntry, User
+
+
+class FollowsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        cls.post = Post.objects.create(author=cls.authors[0], text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def followers(self, author):
+        return AuthorStats.objects.get(user=author).followers_count
+
+    def test_double_click_is_idempotent(self):
+        """Повторные подписка и отписка не дают ни ошибки, ни дубля."""
+        author = self.authors[0]
+        follow = reverse('posts:profile_follow', args=[author.username])
+        unfollow = reverse('posts:profile_unfollow', args=[author.username])
+        for _ in range(2):
+            self.assertEqual(self.client.get(follow).status_code, 302)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(self.followers(author), 1)
+        for _ in range(2):
+            self.assertEqual(self.client.get(unfollow).status_code, 302)
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(self.followers(author), 0)
+
+    def test_unknown_author_is_404(self):
+        for name in ('posts:profile_follow', 'posts:profile_unfollow'):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, args=['nobody']))
+                self.assertEqual(response.status_code, 404)
+
+    def test_cannot_follow_self(self):
+        self.assertFalse(follows.follow(self.reader, self.reader))
+        self.assertFalse(Follow.objects.exists())
+
+    def check_bulk(self):
+        author_ids = [author.pk for author in self.authors]
+        follows.follow(self.reader, self.authors[0])
+        self.assertEqual(
+            follows.follow_many(self.reader, author_ids), author_ids[1:]
+        )
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 3)
+        self.assertEqual(self.followers(self.authors[2]), 1)
+        # Сигналы отработали: пост автора попал в ленту подписок.
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=self.post
+        ).exists())
+        self.assertEqual(
+            follows.unfollow_many(self.reader, author_ids[:2]),
+            author_ids[:2],
+        )
+        self.assertEqual(follows.unfollow_many(self.reader, author_ids), [
+            author_ids[2]
+        ])
+        self.assertEqual(self.followers(self.authors[0]), 0)
+        self.assertFalse(FeedEntry.objects.filter(
+            user=self.reader
+        ).exists())
+
+    def test_bulk_follow_and_unfollow(self):
+        """Пачки подписок возвращают только действительно изменённые."""
+        self.check_bulk()
+
+    def test_bulk_without_returning(self):
+        """Без RETURNING пачка идёт по запросу на автора."""
+        with mock.patch.object(follows, '_can_return', return_value=False):
+            self.check_bulk()
+
+    def test_following_is_cached(self):
+        """Состояние подписок страницы — один запрос, затем из кеша."""
+        author_ids = [author.pk for author in self.authors]
+        follows.follow(self.reader, self.authors[1])
+        with self.assertNumQueries(1):
+            following = follows.following(self.reader, author_ids)
+        self.assertEqual(following, {self.authors[1].pk})
+        with self.assertNumQueries(0):
+            follows.following(self.reader, author_ids)
+        follows.unfollow(self.reader, self.authors[1])
+        self.assertEqual(follows.following(self.reader, author_ids), set())
@@ -0,0 +1,28 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import explain
+from posts.models import Post
+
+
+class FeedIndexesTest(TestCase):
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент не сканируют таблицы и не сортируют выборку."""
+        for name, run in explain.feed_queries().items():
+            with self.subTest(query=name):
+                plan = explain.plan(run)
+                self.assertTrue(plan)
+                self.assertEqual(explain.problems(plan), [], plan)
+
+    def test_problems_detect_bad_plan(self):
+        """Сортировка по неиндексированному полю считается плохим планом."""
+        plan = explain.explain(Post.objects.order_by('text')[:10])
+        self.assertTrue(explain.problems(plan))
+
+    def test_command(self):
+        """Команда печатает отчёт и не падает на текущей схеме."""
+        out = StringIO()
+        call_command('explain_feeds', stdout=out)
+        self.assertIn('index: cursor: ', out.getvalue())
@@ -0,0 +1,92 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from posts.utils import CursorPage, decode_cursor
+from yatube.settings import PAGINATION
+
+SLUG = 'cursor-slug'
+USERNAME = 'cursor_user'
+
+INDEX_URL = reverse('posts:index')
+GROUP_URL = reverse('posts:group_list', args=[SLUG])
+PROFILE_URL = reverse('posts:profile', args=[USERNAME])
+
+
+class CursorPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=USERNAME)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=SLUG,
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'Пост {i}', group=cls.group)
+            for i in range(PAGINATION * 2 + 3)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def walk(self, url):
+        """Проходит ленту по курсорам next до конца."""
+        seen = []
+        cursor = ''
+        while cursor is not None:
+            page = self.client.get(url, {'cursor': cursor}).context[
+                'page_obj'
+            ]
+            self.assertIsInstance(page, CursorPage)
+            seen.extend(post.id for post in page)
+            cursor = page.next_cursor
+        return seen
+
+    def test_cursor_pages_cover_feed(self):
+        """Курсоры обходят ленту целиком без повторов."""
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+        for url in (INDEX_URL, GROUP_URL, PROFILE_URL):
+            with self.subTest(url=url):
+                self.assertEqual(self.walk(url), expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Курсор previous возвращает предыдущую страницу."""
+        first = self.client.get(PROFILE_URL, {'cursor': ''}).context[
+            'page_obj'
+        ]
+        second = self.client.get(
+            PROFILE_URL, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        back = self.client.get(
+            PROFILE_URL, {'cursor': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            [post.id for post in back], [post.id for post in first]
+        )
+        self.assertFalse(back.has_previous())
+
+    def test_cursor_page_does_not_count(self):
+        """Keyset-страница не выполняет COUNT и OFFSET."""
+        page = self.client.get(GROUP_URL, {'cursor': ''}).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(GROUP_URL, {'cursor': page.next_cursor})
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        self.assertIsNone(decode_cursor('не-курсор'))
+        response = self.client.get(INDEX_URL, {'cursor': 'broken'})
+        self.assertEqual(len(response.context['page_obj']), PAGINATION)
@@ -0,0 +1,111 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from posts.search import SQLiteFTSBackend, get_backend
+
+SEARCH_URL = reverse('posts:search')
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='searcher')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Птички',
+            slug='birds',
+            description='Блог о птичках',
+        )
+        cls.birds = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Снегири прилетели, снегири на рябине',
+        )
+        cls.mention = Post.objects.create(
+            author=cls.other,
+            text='Видел снегиря и синицу',
+        )
+        cls.unrelated = Post.objects.create(
+            author=cls.other,
+            text='Рецепт борща',
+        )
+        for text in ('Погода', 'Новости', 'Футбол', 'Кино', 'Музыка'):
+            Post.objects.create(author=cls.other, text=text)
+
+    def setUp(self):
+        self.client = Client()
+
+    def found(self, **params):
+        response = self.client.get(SEARCH_URL, params)
+        return [post.id for post in response.context['page_obj']]
+
+    def test_search_ranks_results(self):
+        """Поиск находит посты по словам и префиксам, лучшие сверху."""
+        self.assertEqual(
+            self.found(q='снегир'), [self.birds.id, self.mention.id]
+        )
+        self.assertEqual(self.found(q='борщ'), [self.unrelated.id])
+
+    def test_search_filters(self):
+        """Результаты фильтруются по группе и автору."""
+        self.assertEqual(
+            self.found(q='снегир', group=self.group.slug), [self.birds.id]
+        )
+        self.assertEqual(
+            self.found(q='снегир', author=self.other.username),
+            [self.mention.id],
+        )
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        self.unrelated.text = 'Рецепт ухи'
+        self.unrelated.save()
+        self.assertEqual(self.found(q='борщ'), [])
+        self.assertEqual(self.found(q='уха ухи'), [])
+        self.assertEqual(self.found(q='ухи'), [self.unrelated.id])
+        Post.objects.filter(pk=self.mention.pk).delete()
+        self.assertEqual(self.found(q='синицу'), [])
+
+    def test_query_syntax_is_escaped(self):
+        """Спецсимволы запроса не ломают поиск."""
+        self.assertEqual(self.found(q='"снегири*'), [self.birds.id])
+        self.assertEqual(self.found(q='***'), [])
+
+    def test_rebuild_search_index(self):
+        """Команда перестраивает индекс по таблице постов."""
+        get_backend().remove(self.birds.id)
+        self.assertEqual(self.found(q='рябине'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found(q='рябине'), [self.birds.id])
+
+    @override_settings(PAGINATION=1, SEARCH_RESULTS_LIMIT=2)
+    def test_pages_without_count_or_offset(self):
+        """Страницы режутся из ограниченного списка id без COUNT и OFFSET."""
+        Post.objects.create(author=self.other, text='Снегирь на ветке')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(SEARCH_URL, {'q': 'снегир', 'page': 2})
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+        self.assertEqual(response.context['page_obj'].paginator.num_pages, 2)
+        self.assertEqual(
+            [post.id for post in response.context['page_obj']],
+            get_backend().ids('снегир', 2)[1:],
+        )
+        self.assertTrue(response.context['truncated'])
+
+    def test_failed_rebuild_keeps_index(self):
+        """Упавшая перестройка не оставляет индекс пустым."""
+        with mock.patch.object(
+            SQLiteFTSBackend, '_insert', side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            get_backend().rebuild()
+        self.assertEqual(self.found(q='рябине'), [self.birds.id])
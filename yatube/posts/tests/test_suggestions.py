@@ -0,0 +1,128 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import follows, suggestions
+from posts.models import Follow, Suggestion, SuggestionRefresh, User
+
+
+class SuggestionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        names = ('reader', 'friend', 'fof', 'peer', 'cofollowed', 'loner')
+        cls.users = {
+            name: User.objects.create_user(username=name) for name in names
+        }
+        edges = (
+            ('reader', 'friend'),
+            ('friend', 'fof'),
+            ('peer', 'friend'),
+            ('peer', 'cofollowed'),
+        )
+        for user, author in edges:
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author]
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def suggested(self, name):
+        return [
+            author.username
+            for author in suggestions.suggestions_for(self.users[name])
+        ]
+
+    def test_friends_of_friends_and_co_follows(self):
+        """Рекомендуются друзья друзей и совместные подписки."""
+        suggestions.compute()
+        self.assertEqual(self.suggested('reader'), ['fof', 'cofollowed'])
+        self.assertFalse(Suggestion.objects.filter(
+            user=self.users['reader'], author=self.users['friend']
+        ).exists())
+        self.assertFalse(SuggestionRefresh.objects.exists())
+
+    def test_followed_authors_are_hidden(self):
+        """Автор, на которого уже подписались, сразу пропадает."""
+        suggestions.compute()
+        follows.follow(self.users['reader'], self.users['fof'])
+        self.assertEqual(self.suggested('reader'), ['cofollowed'])
+
+    def test_incremental_matches_full(self):
+        """Пересчёт из очереди даёт то же, что и полный."""
+        suggestions.compute()
+        follows.follow(self.users['loner'], self.users['peer'])
+        self.assertTrue(SuggestionRefresh.objects.filter(
+            user_id=self.users['loner'].pk
+        ).exists())
+        self.assertEqual(suggestions.refresh_queued(), 1)
+        incremental = set(Suggestion.objects.values_list(
+            'user_id', 'author_id', 'score'
+        ))
+        suggestions.compute()
+        full = set(Suggestion.objects.values_list(
+            'user_id', 'author_id', 'score'
+        ))
+        self.assertEqual(incremental, full)
+        self.assertFalse(SuggestionRefresh.objects.exists())
+
+    def test_failed_refresh_keeps_queue(self):
+        """Если расчёт упал, пользователь остаётся в очереди."""
+        follows.follow(self.users['loner'], self.users['peer'])
+        with mock.patch.object(
+            suggestions, 'rank', side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            suggestions.refresh_queued()
+        self.assertTrue(SuggestionRefresh.objects.filter(
+            user_id=self.users['loner'].pk
+        ).exists())
+
+    def test_follow_during_refresh_stays_queued(self):
+        """Подписка во время расчёта дождётся следующего запуска."""
+        follows.follow(self.users['loner'], self.users['peer'])
+        co_followed = suggestions.co_followed
+
+        def follow_meanwhile(*args):
+            follows.follow(self.users['loner'], self.users['friend'])
+            return co_followed(*args)
+
+        with mock.patch.object(
+            suggestions, 'co_followed', side_effect=follow_meanwhile
+        ):
+            suggestions.refresh_queued()
+        self.assertEqual(list(SuggestionRefresh.objects.values_list(
+            'user_id', flat=True
+        )), [self.users['loner'].pk])
+        self.assertEqual(suggestions.refresh_queued(), 1)
+        self.assertFalse(SuggestionRefresh.objects.exists())
+
+    def test_incremental_command_respects_top(self):
+        """--incremental учитывает --top и --sample."""
+        suggestions.compute()
+        follows.follow(self.users['loner'], self.users['peer'])
+        call_command(
+            'compute_suggestions', incremental=True, top=1, sample=10,
+            stdout=StringIO(),
+        )
+        self.assertEqual(Suggestion.objects.filter(
+            user=self.users['loner']
+        ).count(), 1)
+
+    def test_newcomer_gets_popular_authors(self):
+        suggestions.compute()
+        self.assertEqual(self.suggested('loner')[0], 'friend')
+
+    def test_follow_page_shows_suggestions(self):
+        call_command('compute_suggestions', stdout=StringIO())
+        client = Client()
+        client.force_login(self.users['reader'])
+        response = client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Кого почитать')
+        self.assertContains(
+            response, reverse('posts:profile_follow', args=['fof'])
+        )
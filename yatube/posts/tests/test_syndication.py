@@ -0,0 +1,98 @@
+import json
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+
+class SyndicationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='writer', first_name='Анна'
+        )
+        cls.group = Group.objects.create(title='Кино & сериалы', slug='kino')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Первый <пост>'
+        )
+        Post.objects.create(author=cls.author, text='Второй пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.urls = {
+            fmt: (
+                reverse('posts:index_feed', args=[fmt]),
+                reverse('posts:group_feed', args=[self.group.slug, fmt]),
+                reverse('posts:profile_feed', args=[self.author.username,
+                                                    fmt]),
+            )
+            for fmt in ('rss', 'atom', 'json')
+        }
+
+    def body(self, response):
+        return b''.join(response.streaming_content) if response.streaming \
+            else response.content
+
+    def test_feeds_are_valid(self):
+        """Ленты разбираются как XML и JSON и содержат посты."""
+        for fmt, urls in self.urls.items():
+            for url in urls:
+                with self.subTest(url=url):
+                    response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    body = self.body(response)
+                    if fmt == 'json':
+                        items = json.loads(body)['items']
+                        self.assertEqual(items[-1]['id'], str(self.post.pk))
+                    else:
+                        ElementTree.fromstring(body)
+                        self.assertIn('Первый &lt;пост&gt;'.encode(), body)
+
+    def test_feed_is_one_query_then_cached(self):
+        """Лента — один запрос, повтор — из кеша без запросов."""
+        url = self.urls['rss'][1]
+        with self.assertNumQueries(1):
+            first = self.body(self.client.get(url))
+        with self.assertNumQueries(0):
+            second = self.body(self.client.get(url))
+        self.assertEqual(first, second)
+
+    def test_conditional_get(self):
+        """Неизменившаяся лента отдаётся как 304, новая запись — нет."""
+        url = self.urls['atom'][2]
+        response = self.client.get(url)
+        self.body(response)
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        Post.objects.create(author=self.author, text='Свежий пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Свежий пост'.encode(), self.body(response))
+
+    def test_unknown_feeds_are_404(self):
+        urls = (
+            reverse('posts:group_feed', args=['nope', 'rss']),
+            reverse('posts:profile_feed', args=['nobody', 'json']),
+            reverse('posts:index_feed', args=['yaml']),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_empty_group_feed(self):
+        Group.objects.create(title='Пусто', slug='empty')
+        response = self.client.get(
+            reverse('posts:group_feed', args=['empty', 'json'])
+        )
+        self.assertEqual(json.loads(self.body(response))['items'], [])
+
+    def test_pages_link_feeds(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.urls['rss'][0])
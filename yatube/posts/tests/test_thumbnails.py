@@ -0,0 +1,139 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post, PostThumbnails, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='painter')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        self.detail_url = reverse('posts:post_detail', args=[self.post.id])
+
+    def test_schedule_generates_declared_sizes(self):
+        """Миниатюры всех объявленных размеров создаются заранее."""
+        thumbnails.schedule(self.post)
+        image_sets = thumbnails.lookup(self.post)
+        self.assertEqual(set(image_sets), set(settings.POST_THUMBNAILS))
+        for image_set in image_sets.values():
+            self.assertIn('/cache/', image_set['src'])
+            self.assertTrue(image_set['src'].endswith('.jpg'))
+
+    def test_variants_cover_widths_and_formats(self):
+        """Для кадра есть варианты всех ширин во всех форматах."""
+        thumbnails.schedule(self.post)
+        image_set = thumbnails.lookup(self.post)['960x339']
+        types = [mime_type for mime_type, _ in image_set['sources']]
+        self.assertEqual(types, ['image/webp', 'image/jpeg'])
+        webp = image_set['sources'][0][1]
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertIn(f'.webp {width}w', webp)
+
+    def test_sets_survive_cache_loss(self):
+        """Наборы хранятся в базе, кеш только ускоряет чтение."""
+        thumbnails.schedule(self.post)
+        image_sets = thumbnails.lookup(self.post)
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(thumbnails.lookup(self.post), image_sets)
+        with self.assertNumQueries(0):
+            thumbnails.lookup(self.post)
+
+    def test_replaced_image_needs_new_sets(self):
+        thumbnails.schedule(self.post)
+        cache.clear()
+        self.post.image.name = 'posts/other.gif'
+        self.assertEqual(thumbnails.lookup(self.post), {})
+
+    def test_feed_page_loads_sets_at_once(self):
+        """Наборы всех постов страницы ленты читаются одним запросом."""
+        posts = [self.post] + [
+            Post.objects.create(
+                author=self.user, text=f'Ещё картинка {number}',
+                image=SimpleUploadedFile(
+                    f'small{number}.gif', SMALL_GIF, 'image/gif'
+                ),
+            )
+            for number in range(2)
+        ]
+        for post in posts:
+            thumbnails.schedule(post)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        lookups = [
+            query for query in queries.captured_queries
+            if PostThumbnails._meta.db_table in query['sql']
+        ]
+        self.assertEqual(len(lookups), 1)
+        self.assertEqual(response.content.count(b'<source type='), 6)
+
+    def test_page_renders_picture(self):
+        """Страница отдаёт picture с srcset и запасным JPEG."""
+        thumbnails.schedule(self.post)
+        response = self.client.get(self.detail_url)
+        image_set = thumbnails.lookup(self.post)['960x339']
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, image_set['sources'][0][1])
+        self.assertContains(response, f'src="{image_set["src"]}"')
+
+    def test_page_view_does_not_decode_images(self):
+        """Страница берёт готовую миниатюру и не вызывает sorl."""
+        thumbnails.schedule(self.post)
+        with mock.patch.object(thumbnails, 'get_thumbnail') as generator:
+            response = self.client.get(self.detail_url)
+        generator.assert_not_called()
+        self.assertContains(
+            response, thumbnails.lookup(self.post)['960x339']['src']
+        )
+
+    def test_missing_thumbnail_falls_back_to_original(self):
+        """Пока миниатюры нет, страница показывает исходную картинку."""
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, self.post.image.url)
+
+    def test_pregenerate_command(self):
+        """Команда создаёт миниатюры для уже загруженных картинок."""
+        call_command('pregenerate_thumbnails', stdout=StringIO())
+        self.assertEqual(
+            set(thumbnails.lookup(self.post)), set(settings.POST_THUMBNAILS)
+        )
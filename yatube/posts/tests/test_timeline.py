@@ -0,0 +1,122 @@
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import FeedEntry, Follow, Post, User
+
+FOLLOW_URL = reverse('posts:follow_index')
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def follow(self):
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+
+    def feed_ids(self):
+        return [
+            post.id
+            for post in self.client.get(FOLLOW_URL).context['page_obj']
+        ]
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        """Подписка заполняет ленту, отписка её очищает."""
+        self.follow()
+        self.assertTrue(
+            FeedEntry.objects.filter(
+                user=self.reader, post=self.old_post
+            ).exists()
+        )
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+    def test_new_post_fans_out(self):
+        """Новый пост раскладывается в ленты подписчиков."""
+        self.follow()
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(self.feed_ids(), [post.id, self.old_post.id])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_celebrity_is_read_on_request(self):
+        """Посты популярных авторов читаются при запросе ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(self.feed_ids(), [post.id, self.old_post.id])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_former_celebrity_is_fanned_out(self):
+        """Когда подписчиков становится не больше лимита, посты,
+        написанные автором-знаменитостью, появляются в лентах."""
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=self.author)
+        self.follow()
+        post = Post.objects.create(author=self.author, text='Для многих')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        Follow.objects.filter(user=fan).delete()
+        self.assertEqual(self.feed_ids(), [post.id, self.old_post.id])
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=1, PAGINATION=2)
+    def test_celebrity_posts_are_merged_in_order(self):
+        """Записи ленты и посты знаменитостей сливаются по дате без дублей
+        и в режиме страниц, и по курсору."""
+        star = User.objects.create_user(username='star')
+        Post.objects.create(author=star, text='До славы')
+        self.follow()
+        self.client.get(reverse('posts:profile_follow', args=['star']))
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=star)
+        # Записи знаменитости остались с тех пор, когда её раскладывали.
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, author=star).exists()
+        )
+        for number in range(3):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+            Post.objects.create(author=star, text=f'Звезда {number}')
+        expected = list(Post.objects.order_by('-pub_date', '-id').values_list(
+            'id', flat=True
+        ))
+        pages = []
+        for number in range(1, 5):
+            response = self.client.get(FOLLOW_URL, {'page': number})
+            pages.extend(post.id for post in response.context['page_obj'])
+        self.assertEqual(pages, expected)
+        cursors = []
+        cursor = ''
+        while cursor is not None:
+            page = self.client.get(
+                FOLLOW_URL, {'cursor': cursor}
+            ).context['page_obj']
+            cursors.extend(post.id for post in page)
+            previous, cursor = page.previous_cursor, page.next_cursor
+        self.assertEqual(cursors, expected)
+        page = self.client.get(
+            FOLLOW_URL, {'cursor': previous}
+        ).context['page_obj']
+        self.assertEqual([post.id for post in page], expected[4:6])
+
+    def test_rebuild(self):
+        """Пересборка восстанавливает ленты по подпискам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        FeedEntry.objects.all().delete()
+        timeline.rebuild()
+        self.assertEqual(self.feed_ids(), [self.old_post.id])
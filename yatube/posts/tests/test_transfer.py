@@ -0,0 +1,144 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import transfer
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class TransferTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.author = User.objects.create_user(username='writer')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(
+                author=self.author, text=f'Пост {i}',
+                group=self.group if i % 2 else None,
+            )
+            for i in range(5)
+        ]
+        self.old_date = timezone.now() - timedelta(days=365)
+        Post.objects.filter(pk=self.posts[0].pk).update(
+            pub_date=self.old_date
+        )
+        Comment.objects.create(
+            post=self.posts[1], author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('id').values_list(
+                'id', 'text', 'pub_date', 'author__username', 'group__slug'
+            )),
+            list(Comment.objects.values_list('post_id', 'author__username')),
+            list(Follow.objects.values_list(
+                'user__username', 'author__username'
+            )),
+        )
+
+    def wipe(self):
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+
+    def round_trip(self, data_format):
+        before = self.snapshot()
+        call_command(
+            'export_posts', self.directory, format=data_format,
+            stdout=StringIO(),
+        )
+        self.wipe()
+        call_command(
+            'import_posts', self.directory, format=data_format,
+            batch_size=2, stdout=StringIO(),
+        )
+        self.assertEqual(self.snapshot(), before)
+
+    def test_ndjson_round_trip(self):
+        """Выгрузка и загрузка NDJSON сохраняют данные и даты."""
+        self.round_trip(transfer.NDJSON)
+        self.assertEqual(
+            Post.objects.get(pk=self.posts[0].pk).pub_date, self.old_date
+        )
+
+    def test_csv_round_trip(self):
+        """Выгрузка и загрузка CSV сохраняют данные."""
+        self.round_trip(transfer.CSV)
+
+    def test_import_rebuilds_derived_data(self):
+        """После загрузки пересчитаны счётчики и ленты."""
+        self.round_trip(transfer.NDJSON)
+        author = User.objects.get(username='writer')
+        reader = User.objects.get(username='reader')
+        self.assertEqual(author.stats.posts_count, 5)
+        self.assertEqual(author.stats.followers_count, 1)
+        self.assertEqual(reader.feed_entries.count(), 5)
+        self.assertEqual(
+            Post.objects.get(pk=self.posts[1].pk).comments_count, 1
+        )
+
+    def test_import_refreshes_cached_feeds(self):
+        """Лента, закешированная до загрузки, показывает новые посты."""
+        call_command('export_posts', self.directory, stdout=StringIO())
+        self.wipe()
+        index = reverse('posts:index')
+        self.assertEqual(len(Client().get(index).context['page_obj']), 0)
+        call_command('import_posts', self.directory, stdout=StringIO())
+        self.assertEqual(len(Client().get(index).context['page_obj']), 5)
+
+    def test_resume_after_failure(self):
+        """Прерванная загрузка продолжается с контрольной точки."""
+        before = self.snapshot()
+        transfer.export(self.directory)
+        self.wipe()
+        original = transfer.Importer.build_post
+        calls = []
+
+        def failing(importer, rows):
+            calls.append(len(rows))
+            if len(calls) == 2:
+                raise RuntimeError('Сбой')
+            return original(importer, rows)
+
+        with mock.patch.object(transfer.Importer, 'build_post', failing):
+            with self.assertRaises(RuntimeError):
+                transfer.Importer(self.directory, batch_size=2).run()
+        self.assertEqual(Post.objects.count(), 2)
+
+        totals = transfer.Importer(
+            self.directory, batch_size=2, resume=True
+        ).run()
+        self.assertEqual(totals['post'], 3)
+        self.assertEqual(self.snapshot(), before)
+
+    def test_taken_ids_stop_import(self):
+        """Загрузка в непустую базу не перезаписывает и не теряет посты."""
+        transfer.export(self.directory)
+        taken = self.posts[3]
+        Post.objects.filter(pk=taken.pk).update(text='Другой пост')
+        with self.assertRaisesMessage(CommandError, f'post {taken.pk}'):
+            call_command(
+                'import_posts', self.directory, batch_size=2,
+                stdout=StringIO(),
+            )
+        self.assertEqual(Post.objects.get(pk=taken.pk).text, 'Другой пост')
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_repeated_import_is_idempotent(self):
+        before = self.snapshot()
+        transfer.export(self.directory)
+        transfer.Importer(self.directory, batch_size=2).run()
+        self.assertEqual(self.snapshot(), before)
@@ -0,0 +1,175 @@
+"""Предварительная генерация миниатюр картинок постов.
+
+Для каждого кадра из POST_THUMBNAILS создаётся набор вариантов шириной
+POST_IMAGE_WIDTHS в форматах POST_IMAGE_FORMATS (последний — запасной
+для старых браузеров). Генерация идёт в пуле потоков сразу после
+сохранения картинки, а готовые наборы сохраняются в PostThumbnails.
+Шаблоны читают их через кеш и никогда не декодируют изображение во время
+запроса. Страница со многими постами загружает наборы заранее (attach):
+один get_many к кешу и один запрос к базе на все промахи.
+"""
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import close_old_connections
+from sorl.thumbnail import get_thumbnail
+
+from .cache import bump, post_scopes
+from .models import Post, PostThumbnails
+
+logger = logging.getLogger(__name__)
+
+PENDING_TIMEOUT = 60
+
+MIME_TYPES = {
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+
+_executor = None
+
+
+def cache_key(post_id, image_name):
+    digest = hashlib.md5(image_name.encode()).hexdigest()
+    return f'thumbs:{post_id}:{digest}'
+
+
+def variant_geometries(geometry):
+    """Геометрии вариантов кадра с теми же пропорциями: {ширина: 'WxH'}."""
+    width, height = map(int, geometry.split('x'))
+    widths = {*settings.POST_IMAGE_WIDTHS, width}
+    return {
+        variant: f'{variant}x{round(variant * height / width)}'
+        for variant in sorted(widths)
+    }
+
+
+def generate_set(image_name, geometry, options):
+    """Все варианты одного кадра в виде набора для тега picture."""
+    width = int(geometry.split('x')[0])
+    fallback = settings.POST_IMAGE_FORMATS[-1]
+    sources = []
+    src = ''
+    for image_format in settings.POST_IMAGE_FORMATS:
+        candidates = []
+        for variant, variant_geometry in variant_geometries(geometry).items():
+            url = get_thumbnail(
+                image_name, variant_geometry, format=image_format, **options
+            ).url
+            candidates.append(f'{url} {variant}w')
+            if image_format == fallback and variant == width:
+                src = url
+        sources.append([MIME_TYPES[image_format], ', '.join(candidates)])
+    return {
+        'src': src,
+        'sources': sources,
+        'sizes': f'(max-width: {width}px) 100vw, {width}px',
+    }
+
+
+def generate(post_id, image_name):
+    """Создаёт варианты всех объявленных кадров и запоминает их адреса."""
+    image_sets = {
+        geometry: generate_set(image_name, geometry, options)
+        for geometry, options in settings.POST_THUMBNAILS.items()
+    }
+    PostThumbnails.objects.update_or_create(post_id=post_id, defaults={
+        'image': image_name, 'image_sets': json.dumps(image_sets),
+    })
+    cache.set(cache_key(post_id, image_name), image_sets, None)
+    return image_sets
+
+
+def _run(post_id, image_name):
+    try:
+        generate(post_id, image_name)
+        # Страницы с исходной картинкой вместо миниатюры устарели.
+        post = Post.objects.filter(pk=post_id).first()
+        if post is not None:
+            bump(*post_scopes(post))
+    except Exception:
+        logger.exception('Не удалось создать миниатюры поста %s', post_id)
+    finally:
+        cache.delete(f'{cache_key(post_id, image_name)}:pending')
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def image_exists(image):
+    try:
+        return image.storage.exists(image.name)
+    except SuspiciousFileOperation:
+        return False
+
+
+def schedule(post):
+    """Ставит генерацию миниатюр поста в очередь пула."""
+    image = post.image
+    if not image or not image_exists(image):
+        return
+    pending = f'{cache_key(post.pk, image.name)}:pending'
+    if not cache.add(pending, True, PENDING_TIMEOUT):
+        return
+    if settings.THUMBNAIL_WORKERS:
+        get_executor().submit(_run, post.pk, image.name)
+    else:
+        _run(post.pk, image.name)
+
+
+def lookup_many(posts):
+    """Готовые наборы вариантов постов: {id поста: {геометрия: набор}}."""
+    keys = {
+        cache_key(post.pk, post.image.name): post
+        for post in posts if post.image
+    }
+    found = cache.get_many(keys)
+    missing = {key: post for key, post in keys.items() if key not in found}
+    if missing:
+        stored = {
+            (post_id, image): image_sets
+            for post_id, image, image_sets in PostThumbnails.objects.filter(
+                post_id__in=[post.pk for post in missing.values()]
+            ).values_list('post_id', 'image', 'image_sets')
+        }
+        ready, pending = {}, {}
+        for key, post in missing.items():
+            image_sets = stored.get((post.pk, post.image.name))
+            if image_sets is None:
+                pending[key] = {}
+            else:
+                ready[key] = json.loads(image_sets)
+        cache.set_many(ready, None)
+        # Пока миниатюр нет, не ходим за ними в базу на каждом показе;
+        # generate заменит эти записи.
+        cache.set_many(pending, PENDING_TIMEOUT)
+        found.update(ready)
+        found.update(pending)
+    return {post.pk: found[key] for key, post in keys.items()}
+
+
+def lookup(post):
+    """Готовые наборы вариантов поста: {геометрия: набор}."""
+    return lookup_many([post]).get(post.pk, {})
+
+
+def attach(posts):
+    """Загружает наборы вариантов всех постов страницы заранее."""
+    found = lookup_many(posts)
+    for post in posts:
+        post.image_sets = found.get(post.pk, {})
+    return posts
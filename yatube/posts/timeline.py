@@ -0,0 +1,160 @@
+"""Материализованная лента подписок (fan-out on write).
+
+При публикации пост раскладывается в FeedEntry каждого подписчика, поэтому
+/follow/ читает один диапазон индекса (user, -pub_date, -post). Авторы с
+числом подписчиков больше FEED_FANOUT_LIMIT не раскладываются: их посты
+подмешиваются при чтении (fan-out on read, follow_sources); когда автор
+опускается до FEED_FANOUT_LIMIT подписчиков, его последние посты
+раскладываются в ленты всех подписчиков.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import AuthorStats, FeedEntry, Follow, Post
+
+
+def is_celebrity(author_id):
+    return AuthorStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).exists()
+
+
+def _entries(post, user_ids):
+    return [
+        FeedEntry(
+            user_id=user_id,
+            post_id=post.id,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in user_ids
+    ]
+
+
+def fan_out(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).iterator()
+    batch = []
+    for user_id in follower_ids:
+        batch.append(user_id)
+        if len(batch) >= settings.FEED_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(
+                _entries(post, batch), ignore_conflicts=True
+            )
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(
+            _entries(post, batch), ignore_conflicts=True
+        )
+
+
+def _recent_posts(author_id):
+    return list(Post.objects.filter(author_id=author_id).only(
+        'id', 'author_id', 'pub_date'
+    ).order_by('-pub_date')[:settings.FEED_BACKFILL_LIMIT])
+
+
+def _backfill(user_id, posts):
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id,
+                post_id=post.id,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for post in posts
+        ],
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if is_celebrity(author_id):
+        return
+    _backfill(user_id, _recent_posts(author_id))
+
+
+def unfollowed(author_id):
+    """Раскладывает посты автора, который перестал быть знаменитостью.
+
+    Посты, написанные при числе подписчиков больше FEED_FANOUT_LIMIT, в
+    ленты не попадали, а теперь ленты автора читаются только из FeedEntry.
+    Счётчик уже уменьшен: ровно FEED_FANOUT_LIMIT означает, что порог
+    пересечён этой отпиской.
+    """
+    crossed = AuthorStats.objects.filter(
+        user_id=author_id, followers_count=settings.FEED_FANOUT_LIMIT
+    ).exists()
+    if not crossed:
+        return
+    posts = _recent_posts(author_id)
+    follower_ids = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    for user_id in follower_ids.iterator():
+        _backfill(user_id, posts)
+
+
+def trim(user_id, author_id):
+    """Убирает посты автора из ленты после отписки."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+@transaction.atomic
+def rebuild():
+    """Пересобирает все ленты по текущим подпискам."""
+    FeedEntry.objects.all().delete()
+    follows = Follow.objects.values_list('user_id', 'author_id').iterator()
+    for user_id, author_id in follows:
+        backfill(user_id, author_id)
+
+
+def followed_celebrities(user_id):
+    """id знаменитостей, на которых подписан пользователь."""
+    return list(
+        Follow.objects.filter(
+            user_id=user_id,
+            author__stats__followers_count__gt=settings.FEED_FANOUT_LIMIT,
+        ).values_list('author_id', flat=True)
+    )
+
+
+def follow_feed(user, celebrity_ids=None):
+    """Посты ленты подписок пользователя, новые сверху."""
+    if celebrity_ids is None:
+        celebrity_ids = followed_celebrities(user.pk)
+    if not celebrity_ids:
+        return Post.objects.filter(feed_entries__user=user).order_by(
+            '-feed_entries__pub_date'
+        )
+    materialized = FeedEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(id__in=materialized) | Q(author_id__in=celebrity_ids)
+    )
+
+
+def follow_sources(user_id, celebrity_ids=()):
+    """Источники ленты подписок для posts.feed.MergedFeed.
+
+    Записи ленты и посты каждой знаменитости — отдельные диапазоны
+    индексов (user, -pub_date, -post) и (author, -pub_date, -id). Записи
+    знаменитостей, оставшиеся с тех пор, когда они раскладывались,
+    исключены, чтобы источники не пересекались.
+    """
+    entries = FeedEntry.objects.filter(user_id=user_id)
+    if celebrity_ids:
+        entries = entries.exclude(author_id__in=celebrity_ids)
+    return [
+        (entries, 'post_id'),
+        *((Post.objects.filter(author_id=author_id), 'id')
+          for author_id in celebrity_ids),
+    ]
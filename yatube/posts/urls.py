@@ -10,6 +10,23 @@ urlpatterns = [
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
+    path('search/', views.search, name='search'),
+    path('feeds/posts.<str:feed_format>', views.index_feed, name='index_feed'),
+    path(
+        'feeds/group/<slug:slug>.<str:feed_format>',
+        views.group_feed,
+        name='group_feed'
+    ),
+    path(
+        'feeds/profile/<str:username>.<str:feed_format>',
+        views.profile_feed,
+        name='profile_feed'
+    ),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
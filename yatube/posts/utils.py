@@ -1,9 +1,147 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+
 from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_PARAM = 'cursor'
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, value, pk):
+    raw = f'{direction}|{value.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Возвращает (направление, значение ключа, pk) или None."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, value, pk = raw.split('|')
+        value = parse_datetime(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or value is None:
+        return None
+    return direction, value, pk
+
+
+class CursorPage:
+    """Страница keyset-пагинации: без COUNT(*) и OFFSET."""
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage {self.previous_cursor}..{self.next_cursor}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по паре (key, pk) в порядке убывания."""
+
+    def __init__(self, queryset, per_page, key='pub_date', pk='id'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.key = key
+        self.pk = pk
+
+    def _value(self, obj, field):
+        if isinstance(obj, dict):
+            return obj[field]
+        return getattr(obj, field)
+
+    def page_queryset(self, decoded=None):
+        """Запрос страницы для разобранного курсора (без LIMIT)."""
+        key, pk = self.key, self.pk
+        if decoded is None:
+            return self.queryset.order_by(f'-{key}', f'-{pk}')
+        direction, value, last = decoded
+        if direction == NEXT:
+            return self.queryset.filter(
+                Q(**{f'{key}__lt': value})
+                | Q(**{key: value, f'{pk}__lt': last})
+            ).order_by(f'-{key}', f'-{pk}')
+        return self.queryset.filter(
+            Q(**{f'{key}__gt': value})
+            | Q(**{key: value, f'{pk}__gt': last})
+        ).order_by(key, pk)
+
+    def rows(self, decoded, limit):
+        """Строки страницы в порядке направления курсора."""
+        return list(self.page_queryset(decoded)[:limit])
+
+    def get_page(self, cursor=None):
+        decoded = decode_cursor(cursor) if cursor else None
+        key = self.key
+        direction = NEXT if decoded is None else decoded[0]
+        rows = self.rows(decoded, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+        if not rows:
+            return CursorPage(rows, None, None)
+        first, last = rows[0], rows[-1]
+        has_next = has_more if direction == NEXT else True
+        has_previous = decoded is not None if direction == NEXT else has_more
+        next_cursor = previous_cursor = None
+        if has_next:
+            next_cursor = encode_cursor(
+                NEXT, self._value(last, key), self._value(last, 'id')
+            )
+        if has_previous:
+            previous_cursor = encode_cursor(
+                PREVIOUS, self._value(first, key), self._value(first, 'id')
+            )
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+
+def is_cursor_request(request):
+    return (
+        request.GET.get(CURSOR_PARAM) is not None
+        or settings.PAGINATION_MODE == 'cursor'
+    )
 
 
 def paginate(request, posts):
+    if is_cursor_request(request):
+        paginator = CursorPaginator(posts, settings.PAGINATION)
+        return paginator.get_page(request.GET.get(CURSOR_PARAM))
     paginator = Paginator(posts, settings.PAGINATION)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def paginate_comments(request, comments):
+    """Свежие комментарии порциями по COMMENTS_PER_PAGE."""
+    paginator = CursorPaginator(
+        comments, settings.COMMENTS_PER_PAGE, key='created'
+    )
+    return paginator.get_page(request.GET.get(CURSOR_PARAM))
@@ -1,26 +1,48 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.db import transaction
+
+from core.ratelimit import ratelimit
 
-from .utils import paginate
-from .models import Post, Group, User, Follow
+from . import (
+    feed, follows, suggestions, syndication, thumbnails, timeline
+)
+from .cache import (
+    INDEX,
+    SUGGESTIONS,
+    cache_per_user,
+    cache_versioned,
+    follow_scopes,
+    followed_celebrities,
+    followed_celebrity_scopes,
+)
+from .decorators import query_budget
+from .search import get_backend as get_search_backend
+from .utils import paginate_comments
+from .models import Post, Group, User
 from .forms import CommentForm, PostForm
 
 
-@cache_page(20)
+@cache_versioned('index')
+@query_budget(4)
 def index(request):
-    posts = Post.objects.select_related('group')
-    page_obj = paginate(request, posts)
+    page_obj = feed.paginate(request, [INDEX], Post.objects.all())
     context = {
         'page_obj': page_obj
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache_versioned('group:{slug}')
+@query_budget(5)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author')
-    page_obj = paginate(request, posts)
+    page_obj = feed.paginate(request, [f'group:{slug}'], group.posts.all())
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -28,13 +50,17 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_per_user('profile:{username}')
+@query_budget(6)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('author', 'group')
-    page_obj = paginate(request, posts)
-    following = False
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(user=request.user, author=author)
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+    page_obj = feed.paginate(
+        request, [f'profile:{username}'], author.posts.all()
+    )
+    following = follows.is_following(request.user, author)
     context = {
         'author': author,
         'page_obj': page_obj,
@@ -43,10 +69,43 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(1)
+def index_feed(request, feed_format):
+    return syndication.feed_response(
+        request, feed_format, [INDEX], Post.objects.all(),
+        syndication.describe_index,
+    )
+
+
+@query_budget(2)
+def group_feed(request, slug, feed_format):
+    return syndication.feed_response(
+        request, feed_format, [f'group:{slug}'],
+        Post.objects.filter(group__slug=slug),
+        syndication.describe_group(slug),
+    )
+
+
+@query_budget(2)
+def profile_feed(request, username, feed_format):
+    return syndication.feed_response(
+        request, feed_format, [f'profile:{username}'],
+        Post.objects.filter(author__username=username),
+        syndication.describe_profile(username),
+    )
+
+
+@cache_versioned('post:{post_id}')
+@query_budget(4)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'),
+        id=post_id
+    )
     form = CommentForm()
-    comments = post.comments.select_related('author')
+    comments = paginate_comments(
+        request, post.comments.select_related('author')
+    )
     context = {
         'post': post,
         'form': form,
@@ -55,7 +114,72 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+@cache_versioned('post:{post_id}')
+@query_budget(2)
+def post_comments(request, post_id):
+    """Следующая порция комментариев: HTML-фрагмент или JSON."""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    comments = paginate_comments(
+        request, post.comments.select_related('author')
+    )
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor,
+        })
+    context = {
+        'post': post,
+        'comments': comments,
+    }
+    return render(request, 'includes/comments.html', context)
+
+
+@query_budget(7)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    group = author = None
+    if request.GET.get('group'):
+        group = get_object_or_404(Group, slug=request.GET['group'])
+    if request.GET.get('author'):
+        author = get_object_or_404(User, username=request.GET['author'])
+    # Результаты идут по релевантности, поэтому курсора по дате нет:
+    # страницы режутся из списка id лучших SEARCH_RESULTS_LIMIT постов,
+    # как у лент, — без COUNT по всем совпадениям и без OFFSET.
+    ids = get_search_backend().ids(
+        query, settings.SEARCH_RESULTS_LIMIT, group=group, author=author
+    )
+    page_obj = Paginator(ids, settings.PAGINATION).get_page(
+        request.GET.get('page')
+    )
+    page_obj.object_list = feed.hydrate(list(page_obj.object_list))
+    thumbnails.attach(page_obj.object_list)
+    params = {
+        key: request.GET[key]
+        for key in ('q', 'group', 'author') if request.GET.get(key)
+    }
+    context = {
+        'query': query,
+        'group': group,
+        'author': author,
+        'page_obj': page_obj,
+        'page_query': urlencode(params) + '&',
+        'truncated': len(ids) == settings.SEARCH_RESULTS_LIMIT,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@ratelimit('post_create')
 @login_required
+@transaction.atomic
+@query_budget(14)
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -75,6 +199,7 @@ def post_create(request):
 
 
 @login_required
+@query_budget(10)
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = PostForm(
@@ -87,7 +212,8 @@ def post_edit(request, post_id):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        # comments_count обновляется отдельно и не перезаписывается.
+        post.save(update_fields=('text', 'group', 'image', 'author'))
         return redirect('posts:post_detail', post_id=post_id)
 
     context = {
@@ -98,7 +224,10 @@ def post_edit(request, post_id):
     return render(request, 'posts/post_create.html', context)
 
 
+@ratelimit('add_comment')
 @login_required
+@transaction.atomic
+@query_budget(4)
 def add_comment(request, post_id):
     form = CommentForm(request.POST or None)
     post = get_object_or_404(Post, pk=post_id)
@@ -111,33 +240,35 @@ def add_comment(request, post_id):
 
 
 @login_required
+@cache_per_user('follow:{user}', SUGGESTIONS, followed_celebrity_scopes)
+@query_budget(5)
 def follow_index(request):
-    post_follow_list = Post.objects.filter(
-        author__following__user=request.user
-    ).select_related(
-        'author',
-        'group'
-    )
-    page_obj = paginate(request, post_follow_list)
+    user_id = request.user.pk
+    posts = feed.MergedFeed(timeline.follow_sources(
+        user_id, followed_celebrities(user_id)
+    ))
+    page_obj = feed.paginate(request, follow_scopes(user_id), posts)
     context = {
         'page_obj': page_obj,
+        'suggestions': suggestions.suggestions_for(request.user),
     }
     return render(request, 'posts/follow.html', context)
 
 
+@ratelimit('follow', methods=('GET', 'POST'))
 @login_required
+@transaction.atomic
+@query_budget(14)
 def profile_follow(request, username):
-    author = User.objects.get(username=username)
-    is_following = Follow.objects.filter(user=request.user.id, author=author)
-    if request.user != author and not is_following.exists():
-        Follow.objects.get_or_create(user=request.user, author=author)
+    author = get_object_or_404(User, username=username)
+    follows.follow(request.user, author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
+@transaction.atomic
+@query_budget(8)
 def profile_unfollow(request, username):
-    Follow.objects.get(
-        user=request.user,
-        author__username=username
-    ).delete()
+    author = get_object_or_404(User, username=username)
+    follows.unfollow(request.user, author)
     return redirect('posts:profile', username=username)
@@ -9,13 +9,25 @@ from django.contrib.auth.views import (
     PasswordResetCompleteView
 
 )
+from django.db import transaction
 from django.urls import path
 
+from core.ratelimit import ratelimit
+
 from . import views
 
 
 app_name = 'users'
 
+# Каждый сброс — письмо: ограничиваем и адрес с косой чертой, который
+# иначе достался бы django.contrib.auth.urls. Письмо ставится в очередь
+# (core.mail) в транзакции запроса.
+password_reset = ratelimit('password_reset')(transaction.atomic(
+    PasswordResetView.as_view(
+        template_name='users/registration/password_reset_form.html'
+    )
+))
+
 urlpatterns = [
     path(
         'signup/',
@@ -44,12 +56,8 @@ urlpatterns = [
             template_name='users/registration/password_change_done.html'
         )
     ),
-    path(
-        'password_reset',
-        PasswordResetView.as_view(
-            template_name='users/registration/password_reset_form.html'
-        )
-    ),
+    path('password_reset', password_reset),
+    path('password_reset/', password_reset),
     path(
         'password_reset/done',
         PasswordResetDoneView.as_view(
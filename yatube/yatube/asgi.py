@@ -0,0 +1,21 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Django 2.2 has no native ASGI support, so the WSGI application is served
+from a thread pool, and the paths in api.asgi.ROUTES are answered by native
+async handlers; see core.asgi for the details.
+
+Run it with any ASGI server, e.g. ``uvicorn yatube.asgi:application``.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+from api.asgi import ROUTES  # noqa: E402
+from core.asgi import Router, WsgiToAsgi  # noqa: E402
+
+application = Router(WsgiToAsgi(get_wsgi_application()), ROUTES)
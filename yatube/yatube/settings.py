@@ -32,12 +32,30 @@ ALLOWED_HOSTS = [
     'testserver',
 ]
 
+# default — L1 в памяти процесса поверх общего кеша 'shared' (core.cache).
+# В бою 'shared' указывает на Redis/Memcached, здесь — локальная замена.
 CACHES = {
     'default': {
+        'BACKEND': 'core.cache.TwoTierCache',
+        'OPTIONS': {
+            'L2': 'shared',
+            'MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 30,
+            'CHECK_INTERVAL': 1,
+            # Версии областей posts.cache: только add, incr и delete.
+            'NO_SET_PREFIXES': ['version:'],
+        },
+    },
+    'shared': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'LOCATION': 'shared',
+    },
 }
 
+# Страницы инвалидируются сигналами моделей (posts.cache), поэтому
+# их можно хранить долго.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 4
+
 
 # Application definition
 
@@ -52,6 +70,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 
 ]
@@ -66,6 +85,34 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Метрики запросов (Server-Timing и лог yatube.metrics) включаются явно.
+REQUEST_METRICS = False
+if REQUEST_METRICS:
+    MIDDLEWARE.insert(0, 'core.middleware.RequestMetricsMiddleware')
+
+# Превышение бюджета SQL-запросов view (posts.decorators.query_budget):
+# False — предупреждение в лог, True — исключение.
+QUERY_BUDGET_STRICT = False
+
+# В тестах превышение бюджета запросов — ошибка.
+TEST_RUNNER = 'core.runner.StrictBudgetRunner'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'yatube.metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
 ROOT_URLCONF = 'yatube.urls'
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
@@ -76,13 +123,35 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Лимиты частоты изменяющих запросов (core.ratelimit): по пользователю
+# и по IP, 'число/период'. Счётчики — в общем кеше, не в двухуровневом.
+RATELIMIT_ENABLE = True
+RATELIMIT_CACHE = 'shared'
+# За обратным прокси — заголовок с адресом клиента, например
+# 'HTTP_X_REAL_IP'.
+RATELIMIT_IP_META = 'REMOTE_ADDR'
+RATELIMITS = {
+    'post_create': {'user': '10/m', 'ip': '30/m'},
+    'add_comment': {'user': '20/m', 'ip': '60/m'},
+    'follow': {'user': '30/m', 'ip': '100/m'},
+    'signup': {'ip': '5/h'},
+    'password_reset': {'user': '3/h', 'ip': '5/h'},
+}
+
+# Письма только ставятся в очередь (core.mail), а отправляет их команда
+# send_queued_mail через OUTBOX_EMAIL_BACKEND.
+EMAIL_BACKEND = 'core.mail.OutboxBackend'
+OUTBOX_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 5
+# Задержка перед повтором после первой ошибки, с; дальше удваивается.
+OUTBOX_RETRY_DELAY = 60
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -98,6 +167,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# Потоки, в которых ASGI-обёртка (yatube.asgi) выполняет Django.
+ASGI_THREADS = 8
 
 
 # Database
@@ -110,6 +181,22 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения (core.routers). Локально реплика — отдельный
+# файл SQLite, который догоняет команда sync_replicas; её интервал и
+# задаёт отставание реплики.
+DATABASE_REPLICAS = []
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'{alias}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+if DATABASE_REPLICAS:
+    MIDDLEWARE.insert(0, 'core.middleware.ReplicaPinMiddleware')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи клиент читает с основной базы.
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -152,6 +239,44 @@ STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Миниатюры картинок постов создаются заранее (posts.thumbnails) в пуле
+# из THUMBNAIL_WORKERS потоков; 0 — синхронно при сохранении (так их
+# запускают тесты, которым нужен детерминированный результат).
+POST_THUMBNAILS = {
+    '960x339': {'crop': 'center', 'upscale': True},
+    '1200x600': {'crop': 'center', 'upscale': True},
+}
+# Каждый кадр нарезается по этим ширинам во всех форматах; последний
+# формат — запасной для браузеров без поддержки остальных.
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+THUMBNAIL_WORKERS = 2
+
 PAGINATION: int = 10
+# Сколько id постов ленты держать в кеше (posts.feed); дальше — из БД.
+FEED_IDS_LIMIT = 1000
+# Размер страницы JSON API (api): по умолчанию и наибольший (?limit=).
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+# Сколько постов отдавать в лентах RSS/Atom/JSON Feed.
+SYNDICATION_ITEMS = 20
+# Сколько свежих комментариев показывать на странице поста за раз.
+COMMENTS_PER_PAGE = 20
+# Для СУБД без FTS5: 'posts.search.SimpleSearchBackend'
+SEARCH_BACKEND = 'posts.search.SQLiteFTSBackend'
+# Сколько лучших результатов поиска листать по страницам.
+SEARCH_RESULTS_LIMIT = 1000
+# 'page' — классическая пагинация, 'cursor' — keyset без COUNT/OFFSET
+PAGINATION_MODE = 'page'
+# Лента подписок: авторы с большим числом подписчиков читаются
+# при запросе, а не раскладываются по лентам при публикации.
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_LIMIT = 1000
+FEED_BATCH_SIZE = 500
+# Рекомендации авторов (posts.suggestions): сколько хранить на
+# пользователя и по скольким последним подписчикам автора искать
+# совместные подписки.
+SUGGESTIONS_TOP = 10
+SUGGESTIONS_SAMPLE = 50
 TEST_POSTS = 13
 TEST_PAGINATOR = 3